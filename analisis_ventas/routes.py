@@ -4,13 +4,12 @@ Rutas del módulo de Análisis de Ventas
 Dashboard principal con métricas comparativas y rankings
 """
 
-import json
 import pandas as pd
 from flask import render_template, request, redirect, url_for
 from datetime import datetime, timedelta
 from config import MAZATLAN_TZ, CANALES_CLASIFICACION
 from database import get_fresh_data
-from utils import agrupar_por, agrupar_condicional, formato_rango, NumpyEncoder
+from utils import agrupar_por, agrupar_condicional, formato_rango, convertir_a_tipos_json
 from radar_comercial.services import get_specific_skus_with_descriptions
 from analisis_ventas.blueprint import bp
 from analisis_ventas.services import (
@@ -297,34 +296,41 @@ def index():
                 ultima_hora_datos = df_main["Fecha"].dt.hour.max()
                 limite_hora = min(hora_actual, ultima_hora_datos)
 
+            # Máscara de cancelados de cada período: se calcula una vez y la
+            # reutilizan las gráficas y el resumen
+            cancelado_main = df_main["estado"].eq("Cancelado").to_numpy()
+            cancelado_compare = df_compare["estado"].eq("Cancelado").to_numpy()
+
             # GENERAR ETIQUETAS SEPARADAS
-            labels_main = list(agrupar_por(df_main, granularidad, limite_hora).index)
-            labels_compare = list(agrupar_por(df_compare, granularidad, limite_hora).index)
+            brutas_main = agrupar_por(df_main, granularidad, limite_hora)
+            brutas_compare = agrupar_por(df_compare, granularidad, limite_hora)
+            labels_main = list(brutas_main.index)
+            labels_compare = list(brutas_compare.index)
 
             # Generar datasets
             datasets = {
                 "Ventas brutas": {
-                    "main": list(agrupar_por(df_main, granularidad, limite_hora).values),
-                    "compare": list(agrupar_por(df_compare, granularidad, limite_hora).values),
+                    "main": list(brutas_main.values),
+                    "compare": list(brutas_compare.values),
                     "labels_main": labels_main,
                     "labels_compare": labels_compare
                 },
                 "Cancelaciones": {
-                    "main": list(agrupar_condicional(df_main, granularidad, "cancelado", limite_hora).values),
-                    "compare": list(agrupar_condicional(df_compare, granularidad, "cancelado", limite_hora).values),
+                    "main": list(agrupar_condicional(df_main, granularidad, "cancelado", limite_hora, cancelado_main).values),
+                    "compare": list(agrupar_condicional(df_compare, granularidad, "cancelado", limite_hora, cancelado_compare).values),
                     "labels_main": labels_main,
                     "labels_compare": labels_compare
                 },
                 "Ingreso Neto": {
-                    "main": list(agrupar_condicional(df_main, granularidad, "neto", limite_hora).values),
-                    "compare": list(agrupar_condicional(df_compare, granularidad, "neto", limite_hora).values),
+                    "main": list(agrupar_condicional(df_main, granularidad, "neto", limite_hora, cancelado_main).values),
+                    "compare": list(agrupar_condicional(df_compare, granularidad, "neto", limite_hora, cancelado_compare).values),
                     "labels_main": labels_main,
                     "labels_compare": labels_compare
                 }
             }
 
             labels = labels_main
-            resumen = resumen_periodo(df_main, df_compare, granularidad)
+            resumen = resumen_periodo(df_main, df_compare, granularidad, cancelado_main, cancelado_compare)
             comparacion = formato_rango(fc1, fc2 - timedelta(seconds=1))
 
         except Exception as e:
@@ -410,7 +416,7 @@ def index():
     return render_template("index.html",
                          resumen=resumen,
                          labels=labels,
-                         datasets=json.loads(json.dumps(datasets, cls=NumpyEncoder)),
+                         datasets=convertir_a_tipos_json(datasets),
                          unidad=unidad,
                          comparacion=comparacion,
                          active_tab="analisis",
@@ -5,6 +5,7 @@ Lógica de negocio para rankings, métricas y resúmenes
 """
 
 import pandas as pd
+from utils import totales_por_cancelacion
 
 
 # ====== CONFIGURACIÓN DE PRODUCTOS UNIFICADOS ======
@@ -187,7 +188,7 @@ def unificar_productos_para_ranking(lista_skus):
 
 # ====== FUNCIONES DE RESUMEN Y MÉTRICAS ======
 
-def resumen_periodo(df_periodo, df_comparado, granularidad=None):
+def resumen_periodo(df_periodo, df_comparado, granularidad=None, cancelado_periodo=None, cancelado_comparado=None):
     """
     Genera resumen de métricas comparando dos períodos
 
@@ -195,12 +196,18 @@ def resumen_periodo(df_periodo, df_comparado, granularidad=None):
         df_periodo: DataFrame del período principal
         df_comparado: DataFrame del período de comparación
         granularidad: Granularidad temporal (opcional, no se usa actualmente)
+        cancelado_periodo: Máscara estado == "Cancelado" de df_periodo (opcional)
+        cancelado_comparado: Máscara estado == "Cancelado" de df_comparado (opcional)
 
     Returns:
         list: Lista de diccionarios con métricas comparativas
     """
     resumen = []
 
+    # Cancelaciones e ingreso neto: una sola pasada por DataFrame
+    canc_main, net_main = totales_por_cancelacion(df_periodo, cancelado_periodo)
+    canc_compare, net_compare = totales_por_cancelacion(df_comparado, cancelado_comparado)
+
     # Ventas brutas
     total_main = df_periodo["Total"].sum()
     total_compare = df_comparado["Total"].sum()
@@ -214,8 +221,6 @@ def resumen_periodo(df_periodo, df_comparado, granularidad=None):
     })
 
     # Cancelaciones
-    canc_main = df_periodo[df_periodo["estado"] == "Cancelado"]["Total"].sum()
-    canc_compare = df_comparado[df_comparado["estado"] == "Cancelado"]["Total"].sum()
     delta = canc_main - canc_compare
     pct = (delta / canc_compare * 100) if canc_compare else 0
     resumen.append({
@@ -226,8 +231,6 @@ def resumen_periodo(df_periodo, df_comparado, granularidad=None):
     })
 
     # Ingreso Neto
-    net_main = df_periodo[df_periodo["estado"] != "Cancelado"]["Total"].sum()
-    net_compare = df_comparado[df_comparado["estado"] != "Cancelado"]["Total"].sum()
     delta = net_main - net_compare
     pct = (delta / net_compare * 100) if net_compare else 0
     resumen.append({
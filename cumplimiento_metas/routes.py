@@ -12,7 +12,7 @@ from io import BytesIO
 from cumplimiento_metas.blueprint import bp
 from config import MAZATLAN_TZ as mazatlan_tz, CANALES_CLASIFICACION
 from database import get_fresh_data, get_fresh_metas, obtener_mes_actual
-from utils import formato_periodo_texto, clean_data_for_json
+from utils import formato_periodo_texto, clean_data_for_json, respuesta_json
 from cumplimiento_metas.services import (
     calcular_cumplimiento_metas,
     get_default_resumen_general
@@ -481,7 +481,7 @@ def cumplimiento_metas_ajax():
         df = df[df["Fecha"].dt.month == mes_seleccionado].copy()
 
         if df.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': False,
                 'error': 'No se encontraron datos para el filtro aplicado'
             })
@@ -547,10 +547,13 @@ def cumplimiento_metas_ajax():
                 not canal.get('es_subfila', False)):  # Filtro adicional de seguridad
                 gauge_configs.append(canal['gauge_config'])
 
-        return jsonify({
+        # Las configuraciones de gauge ya salen listas para JSON de
+        # crear_gauge_config: se serializan directamente, sin recorrerlas
+        # con clean_data_for_json
+        return respuesta_json({
             'success': True,
             'html': html_content,
-            'gauge_configs': clean_data_for_json(gauge_configs),  # Configuraciones limpias para JSON
+            'gauge_configs': gauge_configs,
             'tipo_meta': tipo_meta  # Para debugging
         })
 
@@ -558,7 +561,7 @@ def cumplimiento_metas_ajax():
         print(f"Error en AJAX cumplimiento metas: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': f'Error procesando datos: {str(e)}'
         })
@@ -4,26 +4,120 @@ Módulo de acceso a base de datos
 Funciones compartidas para conexión y carga de datos desde ClickHouse
 """
 
+import logging
+import threading
 import pandas as pd
 from datetime import datetime, date
 import calendar
 import clickhouse_connect
+from clickhouse_connect import common as clickhouse_common
+from clickhouse_connect.driver import httputil as clickhouse_httputil
+from clickhouse_connect.driver.exceptions import OperationalError
 from config import CLICKHOUSE_CONFIG, MAZATLAN_TZ, CANALES_CLASIFICACION
+from utils import cache_con_ttl
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se reutiliza el resultado de las consultas del radar comercial
+# (radar y competencia lo piden en el mismo request); los DataFrames vacíos
+# (sin datos o error de conexión) no se guardan
+RADAR_DB_CACHE_TTL = 120
+
+# Segundos que se reutiliza la distribución semanal de inventario por mes
+# (reparto y distribución la piden en cada AJAX); guardar_distribucion_manual,
+# revertir_a_distribucion_automatica y crear_snapshot_mensual la invalidan,
+# pero solo en su worker: el TTL es corto porque el usuario edita estos datos
+# y los demás workers sirven su copia hasta que vence
+DISTRIBUCION_SEMANAL_CACHE_TTL = 30
+
+# Segundos que se reutilizan los cupos manuales originales por mes (la tabla
+# manual solo cambia con las escrituras de este módulo, que la invalidan en
+# su worker; el TTL es corto porque los demás workers sirven su copia hasta
+# que vence). Los meses sin cupos manuales también se guardan
+CUPOS_MANUALES_CACHE_TTL = 30
+COLUMNAS_CUPOS = ['sku', 'canal', 'cupo_manual']
+
+# Columnas de get_distribucion_semanal_inventario que se entregan como float64
+COLUMNAS_FLOAT_DISTRIBUCION = ['asignacion_canal', 'ventas_reales_informativas', 'inventario_inicial']
+
+# Cliente de ClickHouse compartido por el proceso (ver get_db_connection)
+CLIENTE_COMPARTIDO = None
+CLIENTE_LOCK = threading.Lock()
+
+# Conexiones HTTPS que el cliente compartido mantiene abiertas para reutilizar;
+# debe cubrir los hilos de gunicorn más las consultas paralelas de un request
+CLICKHOUSE_MAX_OPEN_CONNECTIONS = 25
+
+
+def resultado_a_dataframe(result):
+    """
+    Convierte el resultado de una consulta de ClickHouse a DataFrame a partir
+    de sus columnas (result_columns), sin pasar por la lista de filas: pandas
+    recibe un arreglo por columna y no tiene que transponer tuplas.
+    Los tipos resultantes son los mismos que con result_rows.
+
+    Args:
+        result: QueryResult de clickhouse_connect
+
+    Returns:
+        DataFrame: Una columna por cada columna de la consulta
+    """
+    return pd.DataFrame(
+        dict(zip(result.column_names, result.result_columns)),
+        columns=result.column_names
+    )
 
 
 def get_db_connection():
     """
     Establece conexión con ClickHouse
 
+    El cliente se crea una sola vez por proceso y se comparte entre requests
+    e hilos: get_client hace consultas iniciales al servidor (versión y
+    settings) y las conexiones HTTPS quedan abiertas en el pool de
+    clickhouse_connect. Para poder compartirlo entre hilos se desactiva la
+    sesión autogenerada (una sesión no admite consultas concurrentes).
+
     Returns:
         clickhouse_connect.Client: Cliente de ClickHouse o None si falla
     """
-    try:
-        client = clickhouse_connect.get_client(**CLICKHOUSE_CONFIG)
-        return client
-    except Exception as e:
-        print(f"Error conectando a la base de datos: {e}")
-        return None
+    global CLIENTE_COMPARTIDO
+
+    if CLIENTE_COMPARTIDO is not None:
+        return CLIENTE_COMPARTIDO
+
+    with CLIENTE_LOCK:
+        if CLIENTE_COMPARTIDO is None:
+            try:
+                clickhouse_common.set_setting('autogenerate_session_id', False)
+                pool_mgr = clickhouse_httputil.get_pool_manager(
+                    maxsize=CLICKHOUSE_MAX_OPEN_CONNECTIONS
+                )
+                CLIENTE_COMPARTIDO = clickhouse_connect.get_client(
+                    **CLICKHOUSE_CONFIG, compress='lz4', pool_mgr=pool_mgr
+                )
+            except Exception as e:
+                print(f"Error conectando a la base de datos: {e}")
+                return None
+        return CLIENTE_COMPARTIDO
+
+
+def descartar_conexion_si_caida(error):
+    """
+    Descarta el cliente compartido si el error es de conexión con el servidor,
+    para que la siguiente llamada a get_db_connection cree uno nuevo en lugar
+    de seguir usando un cliente cuyas conexiones ya no responden.
+
+    Args:
+        error: Excepción capturada al consultar ClickHouse
+    """
+    global CLIENTE_COMPARTIDO
+
+    if not isinstance(error, OperationalError):
+        return
+
+    with CLIENTE_LOCK:
+        CLIENTE_COMPARTIDO = None
 
 
 def load_data_improved(mes_filtro=None, incluir_comparacion=False, año_especifico=None):
@@ -142,7 +236,7 @@ def load_data_improved(mes_filtro=None, incluir_comparacion=False, año_especifi
 
         print(f"Query ejecutada: {query}")
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
         print(f"DATOS: Cargados {len(df)} registros exitosamente")
 
         # Convertir columna de fecha
@@ -256,7 +350,7 @@ def load_metas_diarias():
         """
         print(f"INFO: Ejecutando query: {query}")
         result = client.query(query)
-        df_metas = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df_metas = resultado_a_dataframe(result)
 
         print(f"INFO: Query ejecutado exitosamente. Filas obtenidas: {len(df_metas)}")
         if not df_metas.empty:
@@ -408,7 +502,7 @@ def get_catalogo_productos_bf():
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: Catalogo BF cargado: {len(df)} productos")
 
@@ -455,7 +549,7 @@ def get_inventario_bf():
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: Inventario BF cargado: {len(df)} registros")
 
@@ -577,7 +671,7 @@ def get_ventas_producto_compra_periodo(fecha_inicio, fecha_fin=None, filtro_cana
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: Ventas producto compra cargadas: {len(df)} SKUs con venta")
 
@@ -705,7 +799,7 @@ def cargar_ultimos_3_meses_rentabilidad():
 
         # Convertir a DataFrame
         tiempo_dataframe_inicio = time.time()
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
         df['Fecha'] = pd.to_datetime(df['Fecha'])
 
         # IMPORTANTE: Convertir cantidad a numérico desde el inicio
@@ -1041,7 +1135,7 @@ def get_ventas_individual_vs_combo_periodo(fecha_inicio, fecha_fin=None, filtro_
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: Ventas individual vs combo cargadas: {len(df)} registros")
 
@@ -1060,6 +1154,7 @@ def get_ventas_individual_vs_combo_periodo(fecha_inicio, fecha_fin=None, filtro_
         return pd.DataFrame()
 
 
+@cache_con_ttl(RADAR_DB_CACHE_TTL, cachear_si=lambda df: not df.empty)
 def get_radar_comercial_data():
     """
     Obtiene datos del radar comercial comparando precios e IR por canal
@@ -1071,6 +1166,8 @@ def get_radar_comercial_data():
 
     Canales analizados: Mercado Libre, CrediTienda, Walmart, Shein
 
+    Resultado memorizado por RADAR_DB_CACHE_TTL segundos (no modificarlo).
+
     Returns:
         DataFrame: Comparativa de precios con columnas:
                   sku, descripcion, precio_ML, %IR_ML, inv_asignado_ML, precio_CT, %IR_CT, inv_asignado_CT,
@@ -1078,11 +1175,11 @@ def get_radar_comercial_data():
     """
     client = get_db_connection()
     if not client:
-        print("ERROR: No se pudo conectar a la base de datos para radar comercial")
+        logger.error("No se pudo conectar a la base de datos para radar comercial")
         return pd.DataFrame()
 
     try:
-        print("INFO: [RADAR COMERCIAL] Ejecutando query de análisis de competencia...")
+        logger.info("[RADAR COMERCIAL] Ejecutando query de análisis de competencia...")
 
         # Obtener mes actual en formato "Mes YYYY" (ej: "Diciembre 2025")
         from datetime import datetime
@@ -1099,7 +1196,7 @@ def get_radar_comercial_data():
         año = ahora.year
         mes_actual = f"{mes_nombre} {año}"
 
-        print(f"INFO: [RADAR COMERCIAL] Obteniendo inventario asignado para: {mes_actual}")
+        logger.info("[RADAR COMERCIAL] Obteniendo inventario asignado para: %s", mes_actual)
 
         query = f"""
         WITH lista_productos AS (
@@ -1267,34 +1364,23 @@ def get_radar_comercial_data():
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
-        print(f"OK: [RADAR COMERCIAL] Datos cargados: {len(df)} productos analizados")
+        logger.info("[RADAR COMERCIAL] Datos cargados: %d productos analizados", len(df))
 
-        if not df.empty:
-            # Calcular estadísticas
-            productos_en_ml = df['precio_ML'].notna().sum()
-            productos_en_ct = df['precio_CT'].notna().sum()
-            productos_en_wm = df['precio_WM'].notna().sum()
-            productos_en_sh = df['precio_SH'].notna().sum()
-            productos_en_tk = df['precio_TK'].notna().sum()
-            productos_en_lp = df['precio_LP'].notna().sum()
-            productos_en_yh = df['precio_YH'].notna().sum()
-
-            print(f"   - Productos en Mercado Libre: {productos_en_ml}")
-            print(f"   - Productos en CrediTienda: {productos_en_ct}")
-            print(f"   - Productos en Walmart: {productos_en_wm}")
-            print(f"   - Productos en Shein: {productos_en_sh}")
-            print(f"   - Productos en TikTok Shop: {productos_en_tk}")
-            print(f"   - Productos en Liverpool: {productos_en_lp}")
-            print(f"   - Productos en Yuhu: {productos_en_yh}")
+        if not df.empty and logger.isEnabledFor(logging.DEBUG):
+            # Presencia por canal (solo se calcula si se va a mostrar)
+            nombres_canales = {
+                'ML': 'Mercado Libre', 'CT': 'CrediTienda', 'WM': 'Walmart', 'SH': 'Shein',
+                'TK': 'TikTok Shop', 'LP': 'Liverpool', 'YH': 'Yuhu'
+            }
+            for canal, nombre in nombres_canales.items():
+                logger.debug("   - Productos en %s: %d", nombre, df[f'precio_{canal}'].notna().sum())
 
         return df
 
     except Exception as e:
-        print(f"ERROR: [RADAR COMERCIAL] Error ejecutando query: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[RADAR COMERCIAL] Error ejecutando query: %s", e)
         return pd.DataFrame()
 
 
@@ -1323,62 +1409,63 @@ def get_radar_comercial_datos_semanales(mes_nombre=None, semana_num=None):
             ahora = datetime.now()
             mes_nombre = f"{meses_es[ahora.month]} {ahora.year}"
 
-        print(f"INFO: [RADAR SEMANAL] Solicitando datos para mes: {mes_nombre}")
+        logger.info("[RADAR SEMANAL] Solicitando datos para mes: %s", mes_nombre)
 
         # Obtener datos semanales completos (SIN FILTRAR - todos los SKUs)
         df_semanal = get_distribucion_semanal_inventario(mes_nombre)
 
         if df_semanal.empty:
-            print(f"WARN: [RADAR SEMANAL] No hay datos semanales para {mes_nombre}")
+            logger.warning("[RADAR SEMANAL] No hay datos semanales para %s", mes_nombre)
             return pd.DataFrame()
 
-        print(f"DEBUG: [RADAR SEMANAL] Datos totales obtenidos: {len(df_semanal)} registros, {df_semanal['sku'].nunique()} SKUs")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[RADAR SEMANAL] Datos totales obtenidos: %d registros, %d SKUs", len(df_semanal), df_semanal['sku'].nunique())
 
         # Determinar semana actual si no se especifica
         if semana_num is None:
             semana_num = 1
 
-        print(f"INFO: [RADAR SEMANAL] Filtrando por Semana del mes {semana_num}")
-        print(f"DEBUG: [RADAR SEMANAL] Semanas disponibles en datos: {sorted(df_semanal['semana'].unique())}")
+        logger.info("[RADAR SEMANAL] Filtrando por Semana del mes %s", semana_num)
 
         # MAPEAR semana del mes (1-4) a semana del año (según el mes)
         # Obtener las semanas únicas ordenadas
         semanas_disponibles = sorted(df_semanal['semana'].unique())
+        logger.debug("[RADAR SEMANAL] Semanas disponibles en datos: %s", semanas_disponibles)
 
         if len(semanas_disponibles) == 0:
-            print(f"ERROR: [RADAR SEMANAL] No hay semanas disponibles en los datos")
+            logger.error("[RADAR SEMANAL] No hay semanas disponibles en los datos")
             return pd.DataFrame()
 
         # Mapear: semana 1 del mes = primera semana disponible, etc.
         if 1 <= semana_num <= len(semanas_disponibles):
             semana_real = semanas_disponibles[semana_num - 1]  # Índice 0-based
-            print(f"INFO: [RADAR SEMANAL] Mapeando Semana {semana_num} del mes → Semana {semana_real} del año")
+            logger.info("[RADAR SEMANAL] Mapeando Semana %s del mes → Semana %s del año", semana_num, semana_real)
         else:
-            print(f"ERROR: [RADAR SEMANAL] Semana {semana_num} fuera de rango (hay {len(semanas_disponibles)} semanas)")
+            logger.error("[RADAR SEMANAL] Semana %s fuera de rango (hay %d semanas)", semana_num, len(semanas_disponibles))
             return pd.DataFrame()
 
         # Filtrar por la semana específica del año
         df_semana = df_semanal[df_semanal['semana'] == semana_real].copy()
 
         if df_semana.empty:
-            print(f"WARN: [RADAR SEMANAL] No hay datos para semana {semana_num}")
+            logger.warning("[RADAR SEMANAL] No hay datos para semana %s", semana_num)
             return pd.DataFrame()
 
-        print(f"DEBUG: [RADAR SEMANAL] Registros en Semana {semana_num}: {len(df_semana)}, SKUs únicos: {df_semana['sku'].nunique()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[RADAR SEMANAL] Registros en Semana %s: %d, SKUs únicos: %d", semana_num, len(df_semana), df_semana['sku'].nunique())
 
         # Preparar datos en formato para el Radar Comercial
         df_resultado = df_semana[['sku', 'canal', 'asignacion_canal', 'ventas_reales_informativas']].copy()
         df_resultado.columns = ['sku', 'canal', 'inv_asignado_semana', 'ventas_semana']
 
-        print(f"OK: [RADAR SEMANAL] Retornando {len(df_resultado)} registros para {df_resultado['sku'].nunique()} SKUs")
-        print(f"DEBUG: [RADAR SEMANAL] Primeros SKUs: {sorted(df_resultado['sku'].unique())[:10]}")
+        logger.info("[RADAR SEMANAL] Retornando %d registros", len(df_resultado))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[RADAR SEMANAL] SKUs: %d, primeros: %s", df_resultado['sku'].nunique(), sorted(df_resultado['sku'].unique())[:10])
 
         return df_resultado
 
     except Exception as e:
-        print(f"ERROR: [RADAR SEMANAL] Error obteniendo datos semanales: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[RADAR SEMANAL] Error obteniendo datos semanales: %s", e)
         return pd.DataFrame()
 
 
@@ -1386,6 +1473,7 @@ def get_radar_comercial_datos_semanales(mes_nombre=None, semana_num=None):
 
 
 
+@cache_con_ttl(RADAR_DB_CACHE_TTL, cachear_si=lambda df: not df.empty)
 def get_analisis_competencia_ml():
     """
     Obtiene el análisis de competencia de Mercado Libre
@@ -1398,16 +1486,18 @@ def get_analisis_competencia_ml():
     - Almacenamiento
     - Score total de competitividad
 
+    Resultado memorizado por RADAR_DB_CACHE_TTL segundos (no modificarlo).
+
     Returns:
         DataFrame: Análisis de competencia con todas las métricas
     """
     client = get_db_connection()
     if not client:
-        print("ERROR: No se pudo conectar a la base de datos para análisis de competencia")
+        logger.error("No se pudo conectar a la base de datos para análisis de competencia")
         return pd.DataFrame()
 
     try:
-        print("INFO: [ANÁLISIS COMPETENCIA ML] Obteniendo datos de competidores...")
+        logger.info("[ANÁLISIS COMPETENCIA ML] Obteniendo datos de competidores...")
 
         query = """
         SELECT
@@ -1438,21 +1528,18 @@ def get_analisis_competencia_ml():
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
-        print(f"OK: [ANÁLISIS COMPETENCIA ML] Datos cargados: {len(df)} registros de competencia")
+        logger.info("[ANÁLISIS COMPETENCIA ML] Datos cargados: %d registros de competencia", len(df))
 
-        if not df.empty:
-            skus_unicos = df['sku'].nunique()
-            print(f"   - SKUs analizados: {skus_unicos}")
-            print(f"   - Total de competidores: {len(df)}")
+        if not df.empty and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("   - SKUs analizados: %d", df['sku'].nunique())
+            logger.debug("   - Total de competidores: %d", len(df))
 
         return df
 
     except Exception as e:
-        print(f"ERROR: [ANÁLISIS COMPETENCIA ML] Error ejecutando query: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ANÁLISIS COMPETENCIA ML] Error ejecutando query: %s", e)
         return pd.DataFrame()
 
 
@@ -1672,7 +1759,7 @@ def get_distribucion_inventario(mes_nombre='Diciembre 2025'):
             """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: [DISTRIBUCIÓN INVENTARIO] Datos cargados: {len(df)} registros")
 
@@ -1699,9 +1786,12 @@ def get_distribucion_inventario(mes_nombre='Diciembre 2025'):
         return pd.DataFrame()
 
 
+@cache_con_ttl(DISTRIBUCION_SEMANAL_CACHE_TTL, cachear_si=lambda df: not df.empty)
 def get_distribucion_semanal_inventario(mes_nombre='Diciembre 2025'):
     """
     Obtiene la distribución semanal de inventario para un mes específico
+    (memorizada por mes durante DISTRIBUCION_SEMANAL_CACHE_TTL segundos;
+    el DataFrame devuelto no debe modificarse)
 
     Algoritmo secuencial que respeta:
     - Inventario físico disponible cada semana
@@ -1877,7 +1967,7 @@ def get_distribucion_semanal_inventario(mes_nombre='Diciembre 2025'):
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         print(f"OK: [DISTRIBUCIÓN SEMANAL] Datos cargados: {len(df)} registros")
 
@@ -1885,6 +1975,10 @@ def get_distribucion_semanal_inventario(mes_nombre='Diciembre 2025'):
             # Calcular asignación semanal con algoritmo secuencial
             df = calcular_asignacion_semanal_secuencial(df, config)
 
+            # Columnas numéricas como float64 desde aquí (la asignación sale
+            # entera del redondeo): los consumidores no necesitan convertir
+            df = df.astype({col: 'float64' for col in COLUMNAS_FLOAT_DISTRIBUCION if col in df.columns})
+
             skus_unicos = df['sku'].nunique()
             print(f"   - SKUs: {skus_unicos}")
             print(f"   - Semanas: {len(config['semanas'])}")
@@ -2145,6 +2239,51 @@ def calcular_asignacion_semanal_secuencial(df, config):
 
 
 
+@cache_con_ttl(CUPOS_MANUALES_CACHE_TTL, cachear_si=lambda df: df is not None)
+def obtener_cupos_manuales_originales(mes):
+    """
+    Consulta directa a la tabla Silver.Distribucion_Mensual_Canal_Manual
+    para obtener los valores de cupo_manual originales (solo para mostrar en UI).
+    Memorizada por mes durante CUPOS_MANUALES_CACHE_TTL segundos; las
+    escrituras a la tabla la invalidan
+
+    Returns:
+        DataFrame: Columnas sku, canal, cupo_manual (una fila por sku/canal;
+                   vacío si el mes no tiene cupos manuales), o None si la
+                   consulta falla (no se memoriza)
+    """
+    try:
+        client = get_db_connection()
+
+        # El mes (ej: "Diciembre 2025") viaja como parámetro: clickhouse-connect
+        # lo escapa y el texto de la consulta es siempre el mismo
+        query = """
+        SELECT
+            sku,
+            Channel,
+            cupo_manual
+        FROM Silver.Distribucion_Mensual_Canal_Manual
+        WHERE mes = %(mes)s
+          AND activo = 1
+        """
+
+        result = client.query(query, parameters={'mes': mes})
+
+        # Una fila por (sku, canal); si hubiera varias activas gana la última
+        df_cupos = resultado_a_dataframe(result).rename(columns={'Channel': 'canal'})
+        df_cupos['cupo_manual'] = df_cupos['cupo_manual'].astype(float)
+        df_cupos = df_cupos.drop_duplicates(['sku', 'canal'], keep='last')
+
+        print(f"OK: [CUPOS MANUALES] Cargados {len(df_cupos)} registros de cupos manuales para {mes}")
+        return df_cupos
+
+    except Exception as e:
+        print(f"ERROR: [CUPOS MANUALES] Error obteniendo cupos manuales: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
 def guardar_distribucion_manual(sku, mes, distribuciones_canales, disponible_total_manual=0, disponible_total_automatico=0, usuario='sistema', comentario=''):
     """
     Guarda la distribución manual de un SKU para un mes específico
@@ -2208,6 +2347,8 @@ def guardar_distribucion_manual(sku, mes, distribuciones_canales, disponible_tot
             client.command(insert_query)
             registros_insertados += 1
 
+        get_distribucion_semanal_inventario.cache_clear(mes)
+        obtener_cupos_manuales_originales.cache_clear(mes)
         print(f"OK: {registros_insertados} distribuciones manuales guardadas para SKU {sku}")
 
         return {
@@ -2335,7 +2476,7 @@ def obtener_distribucion_por_sku_para_edicion(sku, mes):
         """
 
         result = client.query(query)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         if df.empty:
             return {'success': False, 'message': f'No se encontró el SKU {sku}'}
@@ -2403,6 +2544,8 @@ def revertir_a_distribucion_automatica(sku, mes):
         """
 
         client.command(deactivate_query)
+        get_distribucion_semanal_inventario.cache_clear(mes)
+        obtener_cupos_manuales_originales.cache_clear(mes)
         print(f"OK: Distribución manual revertida para SKU {sku}, mes {mes}")
 
         return {
@@ -2485,7 +2628,7 @@ def crear_snapshot_mensual(mes_nombre):
         """
 
         result = client.query(query_snapshot)
-        df = pd.DataFrame(result.result_rows, columns=result.column_names)
+        df = resultado_a_dataframe(result)
 
         if df.empty:
             return {
@@ -2547,6 +2690,9 @@ def crear_snapshot_mensual(mes_nombre):
             client.command(insert_query)
             registros_insertados += 1
 
+        get_distribucion_semanal_inventario.cache_clear(mes_nombre)
+        obtener_cupos_manuales_originales.cache_clear(mes_nombre)
+
         # Paso 5: Calcular estadísticas finales
         total_skus = df['sku'].nunique()
         total_disponible = df.groupby('sku')['Disponible_Para_Vender'].first().sum()
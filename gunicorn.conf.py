@@ -0,0 +1,14 @@
+"""
+Configuración de gunicorn para producción.
+
+gunicorn lee este archivo automáticamente desde el directorio de trabajo,
+por lo que basta con ``gunicorn app:app``. Los flags de línea de comandos
+siguen teniendo prioridad sobre estos valores.
+"""
+import os
+
+# Workers con hilos: mientras un request espera a ClickHouse, otros hilos del
+# mismo worker pueden atender requests (los endpoints son I/O y luego pandas).
+# El cliente ClickHouse compartido de database.py es seguro entre hilos.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
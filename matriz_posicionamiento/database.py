@@ -6,10 +6,24 @@ Abstracción para acceso a ClickHouse con fallback al módulo principal
 import pandas as pd
 from datetime import datetime
 
+try:
+    from utils import cache_con_ttl
+except ImportError:
+    # Hub sin utils.py: sin caché de la carga
+    def cache_con_ttl(segundos, cachear_si=None):
+        return lambda func: func
+
 # ============================================================================
 # CONSTANTES
 # ============================================================================
 
+# Segundos que se reutiliza la carga de cargar_acumulado_mensual entre
+# requests: la vista acumulada se consulta, prepara (columnas de fecha y
+# categoría, tipos reducidos, índice de fechas) y versiona una vez por
+# período, y los resultados memorizados por versión pueden reutilizarse.
+# Las cargas vacías (sin datos o error) no se guardan
+MATRIZ_DATOS_CACHE_TTL = 300
+
 # Canales oficiales para clasificación
 CANALES_CLASIFICACION = [
     'CrediTienda',
@@ -105,18 +119,40 @@ class MatrizDatabaseManager:
                 except:
                     pass
 
+    @cache_con_ttl(MATRIZ_DATOS_CACHE_TTL, cachear_si=lambda resultado: not resultado[0].empty)
     def cargar_acumulado_mensual(self):
         """
         Carga datos acumulados mensuales
         Intenta usar app.py primero, si falla usa query directa
 
+        La carga se comparte entre requests durante MATRIZ_DATOS_CACHE_TTL
+        segundos: quien la reciba no debe modificar el DataFrame ni las listas.
+
         Returns:
             tuple: (df, channels, warehouses)
         """
+        # Cada carga agrega la columna de mes y la categoría limpia, convierte
+        # el texto repetitivo a category, reduce sus columnas numéricas y
+        # recibe una versión nueva para la caché de resultados. Todo se hace
+        # aquí porque la carga se comparte entre requests (e hilos): las
+        # funciones de services no deben convertir columnas del df compartido
+        from matriz_posicionamiento.services_legacy import convertir_columnas_categoricas
+        from matriz_posicionamiento.services import (
+            agregar_columna_categoria,
+            agregar_columnas_fecha,
+            reducir_columnas_numericas,
+            registrar_dataframe
+        )
+
         # OPCIÓN 1: Intentar usar la función del app.py (si existe)
         try:
             from app import cargar_acumulado_mensual_matriz
             df, channels, warehouses = cargar_acumulado_mensual_matriz()
+            agregar_columnas_fecha(df)
+            agregar_columna_categoria(df)
+            convertir_columnas_categoricas(df)
+            reducir_columnas_numericas(df)
+            registrar_dataframe(df)
             print(f"✅ [DATABASE] Loaded {len(df)} records from app.py")
             return df, channels, warehouses
         except ImportError:
@@ -162,7 +198,7 @@ class MatrizDatabaseManager:
                 'Activo' AS estado
             FROM Silver.RPT_Ventas_Acumulado_Mensual_SKU_Canal_MT
             WHERE toYear(Fecha) = toYear(today())
-            ORDER BY Fecha DESC, sku ASC
+            ORDER BY Fecha ASC, sku ASC
             """
 
             result = client.query(query)
@@ -175,6 +211,16 @@ class MatrizDatabaseManager:
             df = pd.DataFrame(result.result_rows, columns=result.column_names)
             df['Fecha'] = pd.to_datetime(df['Fecha'])
 
+            # Índice de fechas ordenado (una vez por carga cacheada): los filtros
+            # por mes cortan por búsqueda binaria
+            from matriz_posicionamiento.services import indexar_por_fecha
+            df = indexar_por_fecha(df)
+            agregar_columnas_fecha(df)
+            agregar_columna_categoria(df)
+            convertir_columnas_categoricas(df)
+            reducir_columnas_numericas(df)
+            registrar_dataframe(df)
+
             # Obtener listas
             channels_disponibles = sorted(df['Channel'].unique().tolist())
             warehouses_disponibles = []  # No disponible en esta vista
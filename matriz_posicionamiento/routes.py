@@ -37,6 +37,19 @@ except ImportError as e:
     SERVICES_AVAILABLE = False
     raise  # No podemos continuar sin services
 
+# ============================================================================
+# RESPUESTAS JSON (orjson si está disponible, HUB-COMPATIBLE)
+# ============================================================================
+
+try:
+    from utils import respuesta_json
+except ImportError:
+    # Hub sin utils.py: mismas respuestas con jsonify
+    def respuesta_json(datos, status=200):
+        respuesta = jsonify(datos)
+        respuesta.status_code = status
+        return respuesta
+
 # ============================================================================
 # HELPER FUNCTIONS - HUB COMPATIBILITY
 # ============================================================================
@@ -226,17 +239,17 @@ def actualizar():
             # TODO: Implementar niveles de detalle por SKU y Categoría
             matriz_data = {'datasets': [], 'canales': [], 'estadisticas': {}}
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'data': matriz_data
         })
 
     except Exception as e:
         print(f"❌ ERROR actualizando matriz: {e}")
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @matriz_bp.route("/actualizar-categorias", methods=["POST"])
@@ -274,7 +287,7 @@ def actualizar_categorias():
             categorias_filtro=categorias_filtro
         )
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'data': matriz_data
         })
@@ -283,10 +296,10 @@ def actualizar_categorias():
         print(f"❌ ERROR actualizando matriz categorías: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @matriz_bp.route("/obtener-skus", methods=["POST"])
@@ -305,7 +318,7 @@ def obtener_skus():
         # Obtener lista de SKUs
         skus_lista = obtener_lista_skus(df, mes_filtro=mes_filtro)
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'skus': skus_lista
         })
@@ -314,10 +327,10 @@ def obtener_skus():
         print(f"❌ ERROR obteniendo SKUs: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @matriz_bp.route("/actualizar-clasificacion", methods=["POST"])
@@ -358,7 +371,7 @@ def actualizar_clasificacion():
             skus_seleccionados=skus_filtro
         )
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'data': matriz_data
         })
@@ -367,10 +380,10 @@ def actualizar_clasificacion():
         print(f"❌ ERROR actualizando matriz clasificación: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @matriz_bp.route("/comparar-3-meses", methods=["POST"])
@@ -400,28 +413,28 @@ def comparar_3_meses():
         print(f"📥 [COMPARAR] Parámetros recibidos - mes_actual_str: '{mes_actual_str}', skus: {skus_filtro}, canales: {canales_filtro}")
 
         if not mes_actual_str or not skus_filtro:
-            return jsonify({
+            return respuesta_json({
                 'success': False,
                 'error': 'Se requiere mes y SKUs'
-            }), 400
+            }, 400)
 
         # Validar formato de mes
         mes_actual_str = str(mes_actual_str).strip()
         if len(mes_actual_str) < 6:
-            return jsonify({
+            return respuesta_json({
                 'success': False,
                 'error': f'Formato de mes inválido: {mes_actual_str}. Debe ser YYYYMM (ej: 202410)'
-            }), 400
+            }, 400)
 
         # Convertir mes_actual a fecha
         try:
             año_actual = int(mes_actual_str[:4])
             mes_actual = int(mes_actual_str[4:6])
         except ValueError as e:
-            return jsonify({
+            return respuesta_json({
                 'success': False,
                 'error': f'Error al procesar mes: {mes_actual_str} - {str(e)}'
-            }), 400
+            }, 400)
         fecha_actual = datetime(año_actual, mes_actual, 1)
 
         # Calcular meses anteriores
@@ -463,7 +476,7 @@ def comparar_3_meses():
             mes_2, mes_1, mes_0
         )
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'data': comparacion
         })
@@ -472,10 +485,10 @@ def comparar_3_meses():
         print(f"❌ ERROR en comparar-3-meses: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 def procesar_comparacion_3_meses(datos_mes_2, datos_mes_1, datos_mes_0, mes_2, mes_1, mes_0):
@@ -15,20 +15,42 @@ En el futuro, se puede refactorizar en submódulos especializados.
 from matriz_posicionamiento.services_legacy import (
     # Core functions
     clasificar_zona,
+    clasificar_zona_vec,
+    indice_zona,
     calcular_metricas_canal,
+    calcular_metricas_agrupadas,
     calcular_metricas_categoria,
+    calcular_porcentaje,
     escalar_radio_burbuja,
+    escalar_radios_burbuja,
+    calcular_posiciones_burbujas,
     escalar_tamano_marcador,
+    escalar_tamanos_marcador,
 
     # Data filtering
     filtrar_por_mes,
+    filtrar_por_yyyymm,
+    filtrar_por_mes_entero,
     filtrar_por_rango_dias,
+    filtrar_por_intervalo,
+    indexar_por_fecha,
+    agregar_columnas_fecha,
+    tomar_ultimo_registro,
+    normalizar_clasificacion,
+    normalizar_categoria,
+    agregar_columna_categoria,
+    reducir_columnas_numericas,
+
+    # Result cache
+    registrar_dataframe,
+    memoizar_por_version,
 
     # Matrix generators
     generar_datos_matriz,
     generar_datos_matriz_categorias,
     generar_datos_matriz_clasificacion,
     generar_datos_matriz_clasificacion_con_rango_dias,
+    construir_datos_matriz_clasificacion,
 
     # SKU functions
     obtener_lista_skus
@@ -43,20 +65,42 @@ print("✅ [SERVICES] All functions imported from legacy module")
 __all__ = [
     # Core functions
     'clasificar_zona',
+    'clasificar_zona_vec',
+    'indice_zona',
     'calcular_metricas_canal',
+    'calcular_metricas_agrupadas',
     'calcular_metricas_categoria',
+    'calcular_porcentaje',
     'escalar_radio_burbuja',
+    'escalar_radios_burbuja',
+    'calcular_posiciones_burbujas',
     'escalar_tamano_marcador',
+    'escalar_tamanos_marcador',
 
     # Data filtering
     'filtrar_por_mes',
+    'filtrar_por_yyyymm',
+    'filtrar_por_mes_entero',
     'filtrar_por_rango_dias',
+    'filtrar_por_intervalo',
+    'indexar_por_fecha',
+    'agregar_columnas_fecha',
+    'tomar_ultimo_registro',
+    'normalizar_clasificacion',
+    'normalizar_categoria',
+    'agregar_columna_categoria',
+    'reducir_columnas_numericas',
+
+    # Result cache
+    'registrar_dataframe',
+    'memoizar_por_version',
 
     # Matrix generators
     'generar_datos_matriz',
     'generar_datos_matriz_categorias',
     'generar_datos_matriz_clasificacion',
     'generar_datos_matriz_clasificacion_con_rango_dias',
+    'construir_datos_matriz_clasificacion',
 
     # SKU functions
     'obtener_lista_skus'
@@ -3,8 +3,74 @@ Servicios de Matriz de Posicionamiento
 Lógica de negocio y cálculos
 """
 
+import copy
+import functools
+import itertools
+import logging
+import math
+from operator import itemgetter
+import numpy as np
 import pandas as pd
 import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+# Zonas de la matriz, indexadas por indice_zona():
+# 0 = Crítico, 1 = Eficiente, 2 = A Desarrollar, 3 = Ideal
+ZONAS_NOMBRE = np.array(['Crítico', 'Eficiente', 'A Desarrollar', 'Ideal'], dtype=object)
+ZONAS_COLOR_FONDO = np.array(['#ffcccc', '#cce5ff', '#e6e6e6', '#d4edda'], dtype=object)
+ZONAS_COLOR_TEXTO = np.array(['#dc3545', '#0056b3', '#6c757d', '#28a745'], dtype=object)
+ZONAS_ICONO = np.array(['🔴', '🔵', '🟡', '🟢'], dtype=object)
+
+# Abreviaciones de canales para las etiquetas de las matrices
+ABREVIACIONES_CANALES = {
+    'Mercado Libre': 'ML',
+    'Walmart': 'WM',
+    'Liverpool': 'LV',
+    'Shein': 'SH',
+    'CrediTienda': 'CT',
+    'Yuhu': 'YH',
+    'Aliexpress': 'AE',
+    'Coppel': 'CP',
+    'TikTok Shop': 'TT',
+    'Temu': 'TM'
+}
+
+# Colores por canal (PRINCIPAL - usado para graficar en todas las matrices)
+COLORES_CANALES = {
+    'Mercado Libre': '#FFE135',  # Amarillo
+    'Walmart': '#0071CE',        # Azul
+    'Liverpool': '#E4002B',      # Rojo
+    'Shein': '#FF6B35',          # Naranja vibrante (diferenciado de ML)
+    'CrediTienda': '#00A650',    # Verde
+    'Yuhu': '#9B59B6',           # Morado
+    'Aliexpress': '#E62129',     # Rojo oscuro
+    'Coppel': '#003DA5',         # Azul oscuro
+    'TikTok Shop': '#25F4EE',    # Cyan/Turquesa (color distintivo de TikTok)
+    'Temu': '#FF6C00'            # Naranja Temu (color oficial de la marca)
+}
+
+# Color de canal cuando no está en COLORES_CANALES
+COLOR_CANAL_DEFAULT = '#6c757d'
+
+
+def indice_zona(ingreso_real_pct, roi_pct):
+    """
+    Calcula el índice de zona (0-3) sin ramas; acepta escalares o arrays
+
+    Se usa "no menor que" en lugar de ">=" para que NaN caiga en la misma
+    zona que con la comparación original (ir < 20 / roi < 40).
+
+    Args:
+        ingreso_real_pct: % Ingreso Real (escalar o array)
+        roi_pct: % ROI (escalar o array)
+
+    Returns:
+        int o np.ndarray: Índice para ZONAS_NOMBRE, ZONAS_COLOR_FONDO, etc.
+    """
+    return 3 - 2 * np.less(ingreso_real_pct, 20).astype(np.int8) - np.less(roi_pct, 40).astype(np.int8)
 
 
 def clasificar_zona(ingreso_real_pct, roi_pct):
@@ -24,16 +90,23 @@ def clasificar_zona(ingreso_real_pct, roi_pct):
     Returns:
         tuple: (nombre_zona, color_fondo, color_texto, icono)
     """
-    if ingreso_real_pct < 20:
-        if roi_pct < 40:
-            return 'Crítico', '#ffcccc', '#dc3545', '🔴'
-        else:
-            return 'Eficiente', '#cce5ff', '#0056b3', '🔵'
-    else:  # ingreso_real_pct >= 20
-        if roi_pct < 40:
-            return 'A Desarrollar', '#e6e6e6', '#6c757d', '🟡'
-        else:
-            return 'Ideal', '#d4edda', '#28a745', '🟢'
+    i = int(not ingreso_real_pct < 20) * 2 + int(not roi_pct < 40)
+    return ZONAS_NOMBRE[i], ZONAS_COLOR_FONDO[i], ZONAS_COLOR_TEXTO[i], ZONAS_ICONO[i]
+
+
+def clasificar_zona_vec(ingreso_real_pct, roi_pct):
+    """
+    Versión vectorizada de clasificar_zona para arrays completos
+
+    Args:
+        ingreso_real_pct (np.ndarray): % Ingreso Real por punto
+        roi_pct (np.ndarray): % ROI por punto
+
+    Returns:
+        tuple: (nombres_zona, colores_fondo, colores_texto, iconos) como arrays
+    """
+    idx = indice_zona(ingreso_real_pct, roi_pct)
+    return ZONAS_NOMBRE[idx], ZONAS_COLOR_FONDO[idx], ZONAS_COLOR_TEXTO[idx], ZONAS_ICONO[idx]
 
 
 def calcular_metricas_canal(df_canal):
@@ -67,6 +140,58 @@ def calcular_metricas_canal(df_canal):
     }
 
 
+def calcular_metricas_agrupadas(df, claves, ordenar=False):
+    """
+    Calcula las mismas métricas que calcular_metricas_canal para todos los
+    grupos a la vez, con un único groupby en lugar de un filtro por grupo
+
+    Args:
+        df: DataFrame con datos de ventas
+        claves: Columna (str) o lista de columnas por las que agrupar
+        ordenar: True para ordenar los grupos por sus claves (como iterar
+                 un groupby normal); False para dejarlos en orden de aparición
+
+    Returns:
+        DataFrame: Una fila por grupo con las columnas de agrupación y las
+                   métricas calculadas
+    """
+    metricas = df.groupby(claves, sort=ordenar, observed=True).agg(
+        ventas_reales=('Total', 'sum'),
+        costo_venta=('Costo de venta', 'sum'),
+        gastos_directos=('Gastos_directos', 'sum'),
+        ingreso_real=('Ingreso real', 'sum'),
+        num_transacciones=('Total', 'size')
+    ).reset_index()
+
+    ventas_reales = metricas['ventas_reales'].to_numpy(dtype=np.float64)
+    costo_venta = metricas['costo_venta'].to_numpy(dtype=np.float64)
+    ingreso_real = metricas['ingreso_real'].to_numpy(dtype=np.float64)
+
+    # Calcular porcentajes (0 cuando el denominador no es positivo)
+    metricas['ingreso_real_pct'] = calcular_porcentaje(ingreso_real, ventas_reales)
+    metricas['roi_pct'] = calcular_porcentaje(ingreso_real, costo_venta)
+
+    return metricas
+
+
+def calcular_porcentaje(numerador, denominador):
+    """
+    Calcula numerador / denominador * 100 elemento a elemento, con 0 donde el
+    denominador no es positivo. La división solo se evalúa donde aplica y se
+    escribe sobre un único buffer (sin temporales de np.where ni errstate).
+
+    Args:
+        numerador: Array de float64
+        denominador: Array de float64 del mismo tamaño
+
+    Returns:
+        np.ndarray: Porcentajes
+    """
+    resultado = np.divide(numerador, denominador, out=np.zeros_like(denominador), where=denominador > 0)
+    resultado *= 100
+    return resultado
+
+
 def escalar_radio_burbuja(ventas, min_ventas, max_ventas, radio_min=12, radio_max=28):
     """
     Escala el tamaño del radio de la burbuja usando escala LOGARÍTMICA.
@@ -91,24 +216,77 @@ def escalar_radio_burbuja(ventas, min_ventas, max_ventas, radio_min=12, radio_ma
     Returns:
         float: Radio escalado entre radio_min y radio_max
     """
-    if max_ventas > min_ventas and min_ventas > 0:
-        # Importar math si no está disponible
-        import math
+    return float(escalar_radios_burbuja(ventas, min_ventas, max_ventas, radio_min, radio_max))
+
+
+def escalar_radios_burbuja(ventas, min_ventas, max_ventas, radio_min=12, radio_max=28):
+    """
+    Versión vectorizada de escalar_radio_burbuja: escala todos los radios
+    con un solo np.log1p sobre el array de ventas
+
+    Args:
+        ventas: Array (o lista) con las ventas de cada burbuja
+        min_ventas: Ventas mínimas de todos los canales
+        max_ventas: Ventas máximas de todos los canales
+        radio_min: Radio mínimo de burbuja (px)
+        radio_max: Radio máximo de burbuja (px)
 
+    Returns:
+        np.ndarray: Radios escalados entre radio_min y radio_max
+    """
+    ventas = np.asarray(ventas, dtype=np.float64)
+
+    if max_ventas > min_ventas and min_ventas > 0:
         # Aplicar logaritmo natural para comprimir diferencias extremas
-        # +1 para evitar log(0) en casos edge
-        log_ventas = math.log(ventas + 1)
-        log_min = math.log(min_ventas + 1)
-        log_max = math.log(max_ventas + 1)
+        # log1p (+1) para evitar log(0) en casos edge.
+        # Los extremos se calculan una sola vez por llamada, no por burbuja
+        log_min = math.log1p(min_ventas)
+        log_max = math.log1p(max_ventas)
 
         # Normalizar proporción logarítmica (0 a 1)
-        proporcion = (log_ventas - log_min) / (log_max - log_min)
+        proporcion = (np.log1p(ventas) - log_min) / (log_max - log_min)
 
         # Calcular radio final
         return radio_min + proporcion * (radio_max - radio_min)
     else:
         # Si todas las ventas son iguales o min_ventas=0, usar tamaño medio
-        return (radio_min + radio_max) / 2
+        return np.full(ventas.shape, (radio_min + radio_max) / 2)
+
+
+def calcular_posiciones_burbujas(ventas, costo, ingreso_real, radio_min=12, radio_max=28):
+    """
+    Calcula en un solo paso la posición y tamaño de cada burbuja:
+    % Ingreso Real, % ROI, índice de zona y radio escalado.
+
+    Los porcentajes salen de calcular_porcentaje (sin divisiones por cero);
+    el índice de zona sirve para ZONAS_NOMBRE, ZONAS_COLOR_FONDO, etc.
+
+    Args:
+        ventas: Array con las ventas de cada burbuja
+        costo: Array con el costo de venta
+        ingreso_real: Array con el ingreso real
+        radio_min: Radio mínimo de burbuja (px)
+        radio_max: Radio máximo de burbuja (px)
+
+    Returns:
+        tuple: (ingreso_real_pct, roi_pct, zona_idx, radios) como np.ndarray
+    """
+    ventas = np.asarray(ventas, dtype=np.float64)
+    costo = np.asarray(costo, dtype=np.float64)
+    ingreso_real = np.asarray(ingreso_real, dtype=np.float64)
+
+    # Porcentajes (0 cuando el denominador no es positivo)
+    ingreso_real_pct = calcular_porcentaje(ingreso_real, ventas)
+    roi_pct = calcular_porcentaje(ingreso_real, costo)
+
+    zona_idx = indice_zona(ingreso_real_pct, roi_pct)
+
+    if ventas.size:
+        radios = escalar_radios_burbuja(ventas, ventas.min(), ventas.max(), radio_min, radio_max)
+    else:
+        radios = np.empty(0)
+
+    return ingreso_real_pct, roi_pct, zona_idx, radios
 
 
 def filtrar_por_mes(df, mes_filtro):
@@ -122,15 +300,108 @@ def filtrar_por_mes(df, mes_filtro):
     Returns:
         DataFrame filtrado
     """
-    mes_filtro_str = str(mes_filtro)
+    mes_int = int(mes_filtro)
+    if mes_int > 12:  # Formato YYYYMM (202410)
+        return filtrar_por_yyyymm(df, mes_int)
+    return filtrar_por_mes_entero(df, mes_int)  # Formato antiguo (1-12)
+
+
+def filtrar_por_yyyymm(df, ym):
+    """
+    Filtra DataFrame por año y mes ya resueltos como entero YYYYMM.
+    Úsese directamente cuando el llamador ya sabe el formato.
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+        ym (int): Mes en formato YYYYMM (ej: 202410)
+
+    Returns:
+        DataFrame filtrado
+    """
+    año, mes = divmod(ym, 100)
+    inicio = pd.Timestamp(año, mes, 1)
+    return filtrar_por_intervalo(df, inicio, inicio + pd.offsets.MonthBegin(1))
+
+
+def indexar_por_fecha(df):
+    """
+    Ordena el DataFrame por Fecha y usa esa fecha como índice (DatetimeIndex),
+    conservando también la columna 'Fecha'. Se hace al cargar los datos para
+    que filtrar_por_intervalo pueda cortar por búsqueda binaria; como la carga
+    se comparte entre requests (ver MatrizDatabaseManager.cargar_acumulado_mensual),
+    el orden y el índice se construyen una vez por carga. Si la consulta ya
+    trae las filas ordenadas por Fecha no se reordena.
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+
+    Returns:
+        DataFrame ordenado con índice de fechas (sin nombre, para no chocar
+        con la columna 'Fecha' en groupby/sort_values)
+    """
+    if not df['Fecha'].is_monotonic_increasing:
+        df = df.sort_values('Fecha', kind='stable')
+    return df.set_axis(pd.DatetimeIndex(df['Fecha']).rename(None), axis=0)
+
+
+def filtrar_por_intervalo(df, inicio, fin):
+    """
+    Filtra las filas con inicio <= Fecha < fin
+
+    Si el DataFrame viene de indexar_por_fecha (índice de fechas ordenado) se
+    usa búsqueda binaria sobre el índice y un slice, sin recorrer la columna.
+    Si no, se aplica la máscara sobre la columna 'Fecha'.
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+        inicio (pd.Timestamp): Fecha inicial (incluida)
+        fin (pd.Timestamp): Fecha final (excluida)
+
+    Returns:
+        DataFrame filtrado (sin copia: quien necesite escribir sobre el
+        resultado debe copiarlo una vez)
+    """
+    indice = df.index
+    if isinstance(indice, pd.DatetimeIndex) and indice.is_monotonic_increasing:
+        i, j = indice.searchsorted([inicio, fin])
+        return df.iloc[i:j]
+
+    fechas = df['Fecha']
+    return df[(fechas >= inicio) & (fechas < fin)]
+
+
+def filtrar_por_mes_entero(df, mes):
+    """
+    Filtra DataFrame por número de mes (1-12) sin importar el año
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+        mes (int): Mes (1-12)
+
+    Returns:
+        DataFrame filtrado
+    """
+    if '_mes' in df.columns:
+        return df[df['_mes'] == mes]
+    return df[df['Fecha'].dt.month == mes]
 
-    if len(mes_filtro_str) == 6:  # Formato YYYYMM (202410)
-        año = int(mes_filtro_str[:4])
-        mes = int(mes_filtro_str[4:6])
-        return df[(df['Fecha'].dt.year == año) & (df['Fecha'].dt.month == mes)].copy()
-    else:  # Formato antiguo (1-12)
-        mes = int(mes_filtro_str)
-        return df[df['Fecha'].dt.month == mes].copy()
+
+def agregar_columnas_fecha(df):
+    """
+    Agrega la columna entera angosta '_mes' (int8) con el mes de 'Fecha'.
+    Se hace al cargar los datos (la carga se comparte entre requests, ver
+    MatrizDatabaseManager.cargar_acumulado_mensual) para que los filtros por
+    número de mes comparen enteros de 1 byte en lugar de recalcular
+    df['Fecha'].dt.month en cada llamada. La conversión es in-place.
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+
+    Returns:
+        DataFrame: El mismo df, con la columna agregada
+    """
+    df['_mes'] = df['Fecha'].dt.month.astype(np.int8)
+    return df
 
 
 def filtrar_por_rango_dias(df, mes_filtro, dia_maximo=None):
@@ -147,30 +418,288 @@ def filtrar_por_rango_dias(df, mes_filtro, dia_maximo=None):
     Returns:
         DataFrame filtrado
     """
-    mes_filtro_str = str(mes_filtro)
+    ym = int(mes_filtro)
 
-    if len(mes_filtro_str) != 6:
+    if ym <= 12:
         # Si no es formato YYYYMM, usar filtro normal
-        return filtrar_por_mes(df, mes_filtro)
-
-    año = int(mes_filtro_str[:4])
-    mes = int(mes_filtro_str[4:6])
-
-    # Filtrar por año y mes
-    df_mes = df[(df['Fecha'].dt.year == año) & (df['Fecha'].dt.month == mes)].copy()
+        return filtrar_por_mes_entero(df, ym)
 
     # Si no se especifica día máximo, devolver todo el mes
     if dia_maximo is None:
-        return df_mes
+        return filtrar_por_yyyymm(df, ym)
 
-    # Filtrar por rango de días (1 hasta dia_maximo)
-    df_filtrado = df_mes[df_mes['Fecha'].dt.day <= dia_maximo].copy()
+    # Filtrar por rango de días (1 hasta dia_maximo) con una sola máscara:
+    # comparar Fecha contra [inicio, fin) evita extraer año/mes/día por separado
+    año, mes = divmod(ym, 100)
+    inicio = pd.Timestamp(año, mes, 1)
+    fin = min(inicio + pd.Timedelta(days=dia_maximo), inicio + pd.offsets.MonthBegin(1))
+    df_filtrado = filtrar_por_intervalo(df, inicio, fin)
 
-    print(f"📅 [FILTRO] Mes {mes_filtro}: Días 1-{dia_maximo} → {len(df_filtrado)} registros")
+    logger.debug("📅 [FILTRO] Mes %s: Días 1-%s → %s registros", mes_filtro, dia_maximo, len(df_filtrado))
 
     return df_filtrado
 
 
+# Columnas de texto con muchos valores repetidos que se comparan y agrupan
+# constantemente; como 'category' las comparaciones e isin operan sobre códigos
+COLUMNAS_CATEGORICAS = ('Channel', 'estado', 'sku', 'Clasificacion', 'Marca')
+
+
+def convertir_columnas_categoricas(df):
+    """
+    Convierte a dtype 'category' las columnas de COLUMNAS_CATEGORICAS que
+    aún sean texto (object). La conversión es in-place y se hace al cargar
+    los datos (MatrizDatabaseManager.cargar_acumulado_mensual), así que las
+    funciones generar_* ya reciben las columnas como 'category'.
+
+    Args:
+        df: DataFrame con datos de ventas
+
+    Returns:
+        DataFrame: El mismo df, con las columnas convertidas
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# Montos que se devuelven tal cual en las respuestas JSON: se mantienen en
+# float64 para no agregar ruido de float32 a los centavos
+COLUMNAS_MONTOS = ('Total', 'Costo de venta', 'Ingreso real', 'Gastos_directos')
+
+
+def reducir_columnas_numericas(df):
+    """
+    Reduce el ancho de las columnas numéricas que la matriz no devuelve
+    (porcentajes de la vista, comisiones, cantidades, órdenes): float64 a
+    float32 y enteros al tipo más pequeño que los contenga. Así cada máscara
+    e iloc sobre el DataFrame mueve menos bytes. Las columnas de
+    COLUMNAS_MONTOS solo se convierten a float64 si llegan como object
+    (ej: Decimal de ClickHouse). La conversión es in-place y se hace al
+    cargar los datos: como la carga se comparte entre requests (ver
+    MatrizDatabaseManager.cargar_acumulado_mensual), se paga una vez por
+    carga y no en cada request.
+
+    Args:
+        df: DataFrame con datos de ventas
+
+    Returns:
+        DataFrame: El mismo df, con las columnas reducidas
+    """
+    for col in COLUMNAS_MONTOS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = pd.to_numeric(df[col]).astype(np.float64)
+
+    for col in df.select_dtypes(include='number').columns:
+        if col in COLUMNAS_MONTOS:
+            continue
+        tipo = 'float' if df[col].dtype.kind == 'f' else 'integer'
+        df[col] = pd.to_numeric(df[col], downcast=tipo)
+    return df
+
+
+def tomar_ultimo_registro(df, claves):
+    """
+    Toma el registro más reciente (mayor Fecha) de cada combinación de claves.
+    Como los datos son acumulados, ese registro ya contiene el total del mes.
+
+    Usa groupby().idxmax() sobre Fecha: una sola pasada sin ordenar todo el
+    DataFrame, y un único take de las filas ganadoras. Trabaja con
+    posiciones, así que el índice puede tener repetidos (ej: índice de fechas).
+
+    Args:
+        df: DataFrame con columna 'Fecha'
+        claves: Lista de columnas que identifican el grupo (ej: ['sku', 'Channel'])
+
+    Returns:
+        DataFrame con una fila por grupo, ordenado por las claves
+    """
+    columnas = df[claves + ['Fecha']].reset_index(drop=True)
+    posiciones = columnas.groupby(claves, observed=True)['Fecha'].idxmax()
+    return df.iloc[posiciones.to_numpy()].reset_index(drop=True)
+
+
+# Caché de resultados de la matriz: cada carga de datos recibe una versión
+# (df.attrs['version']) y los resultados se memorizan por (versión, filtros).
+# El registro guarda referencias débiles: no mantiene vivo ningún DataFrame.
+_dataframes_por_version = weakref.WeakValueDictionary()
+_contador_versiones = itertools.count(1)
+
+
+def registrar_dataframe(df):
+    """
+    Asigna una nueva versión a un DataFrame recién cargado y lo registra
+    para que las funciones memorizadas puedan reutilizar sus resultados.
+
+    Args:
+        df: DataFrame con datos de ventas
+
+    Returns:
+        int: Versión asignada (también queda en df.attrs['version'])
+    """
+    version = next(_contador_versiones)
+    df.attrs['version'] = version
+    _dataframes_por_version[version] = df
+    return version
+
+
+class DataFrameVersionado:
+    """
+    Llave de caché para un DataFrame registrado: se compara por versión y
+    conserva la referencia al propio DataFrame, así el cálculo no tiene que
+    buscarlo en el registro (donde pudo haber sido descartado).
+    """
+    __slots__ = ('df', 'version')
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __eq__(self, otro):
+        return isinstance(otro, DataFrameVersionado) and self.version == otro.version
+
+
+def memoizar_por_version(func):
+    """
+    Decorador LRU para las funciones generar_datos_matriz*: la llave es la
+    versión del DataFrame más los filtros (listas convertidas a tuplas).
+
+    Solo se usa la caché si el df es exactamente el registrado para su
+    versión; los DataFrames derivados (que heredan attrs) o sin versión se
+    calculan siempre. Al llegar una versión nueva se descartan los
+    resultados de las anteriores (y con ellos la referencia a su DataFrame).
+    En cada llamada se devuelve una copia profunda para que el llamador
+    pueda modificar el resultado sin alterar la caché.
+    """
+    @functools.lru_cache(maxsize=64)
+    def calcular(clave, args, kwargs):
+        return func(clave.df, *args, **dict(kwargs))
+
+    ultima_version = [None]
+
+    @functools.wraps(func)
+    def envoltura(df, *args, **kwargs):
+        version = df.attrs.get('version')
+        if version is None or _dataframes_por_version.get(version) is not df:
+            return func(df, *args, **kwargs)
+
+        args_clave = tuple(tuple(a) if isinstance(a, (list, set)) else a for a in args)
+        kwargs_clave = tuple(sorted(
+            (k, tuple(v) if isinstance(v, (list, set)) else v) for k, v in kwargs.items()
+        ))
+        try:
+            hash((args_clave, kwargs_clave))
+        except TypeError:
+            # Algún filtro no es hashable: calcular sin caché
+            return func(df, *args, **kwargs)
+
+        if ultima_version[0] != version:
+            calcular.cache_clear()
+            ultima_version[0] = version
+
+        resultado = calcular(DataFrameVersionado(df, version), args_clave, kwargs_clave)
+        return copy.deepcopy(resultado)
+
+    envoltura.cache_clear = calcular.cache_clear
+    envoltura.cache_info = calcular.cache_info
+    return envoltura
+
+
+def normalizar_clasificacion(df):
+    """
+    Devuelve la columna Clasificacion con None, NaN o '' como 'Sin Clasificar'
+    (todo 'Sin Clasificar' si la columna no existe).
+
+    Si la columna es categórica se normalizan solo las categorías y se
+    expanden por código (la entrada final cubre los nulos, código -1).
+
+    Args:
+        df: DataFrame con (o sin) columna 'Clasificacion'
+
+    Returns:
+        pd.Series: Clasificación normalizada (object), con el índice de df
+    """
+    if 'Clasificacion' not in df.columns:
+        return pd.Series('Sin Clasificar', index=df.index, dtype=object)
+
+    columna = df['Clasificacion']
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        por_codigo = np.array(
+            [c if c != '' else 'Sin Clasificar' for c in columna.cat.categories] + ['Sin Clasificar'], dtype=object
+        )
+        return pd.Series(por_codigo[columna.cat.codes.to_numpy()], index=df.index)
+
+    return columna.astype(object).replace('', None).fillna('Sin Clasificar')
+
+
+def normalizar_categoria(df):
+    """
+    Devuelve la categoría de cada fila como 'category', con None, NaN o
+    textos vacíos (solo espacios) como 'Sin Categoría'. Usa
+    'Categoria_Catalogo' si existe, si no 'Categoria' (todo 'Sin Categoría'
+    si no hay ninguna).
+
+    La limpieza se hace sobre las categorías (valores únicos), no fila por
+    fila; las categorías quedan ordenadas alfabéticamente.
+
+    Args:
+        df: DataFrame con (o sin) columnas 'Categoria_Catalogo' / 'Categoria'
+
+    Returns:
+        pd.Series: Categoría normalizada (category), con el índice de df
+    """
+    if 'Categoria_Catalogo' in df.columns:
+        columna = df['Categoria_Catalogo']
+        logger.debug("✅ [MATRIZ CAT] Columna 'Categoria_Catalogo' encontrada y mapeada a 'Categoria'")
+    elif 'Categoria' in df.columns:
+        columna = df['Categoria']
+    else:
+        logger.warning("⚠️ [MATRIZ CAT] No existe columna 'Categoria' ni 'Categoria_Catalogo', usando categoría genérica")
+        return pd.Series('Sin Categoría', index=df.index, dtype='category')
+
+    categorias = columna.astype('category')
+    nombres = categorias.cat.categories
+    vacias = nombres[nombres.astype(str).str.strip() == '']
+    if len(vacias) > 0:
+        categorias = categorias.cat.remove_categories(vacias)
+
+    if categorias.hasnans:
+        if 'Sin Categoría' not in categorias.cat.categories:
+            categorias = categorias.cat.add_categories('Sin Categoría')
+        categorias = categorias.fillna('Sin Categoría')
+
+    return categorias.cat.set_categories(categorias.cat.categories.sort_values())
+
+
+def agregar_columna_categoria(df):
+    """
+    Agrega la columna '_categoria' (normalizar_categoria) al cargar los
+    datos, para que la matriz de categorías no limpie la columna en cada
+    request. Como la carga se comparte entre requests (ver
+    MatrizDatabaseManager.cargar_acumulado_mensual), la limpieza se hace una
+    vez por carga. La conversión es in-place.
+
+    Args:
+        df: DataFrame con columnas 'Categoria_Catalogo' / 'Categoria'
+
+    Returns:
+        DataFrame: El mismo df, con la columna agregada
+    """
+    df['_categoria'] = normalizar_categoria(df)
+    return df
+
+
+# Orden de las clasificaciones en la lista de SKUs
+ORDEN_CLASIFICACION_SKUS = pd.CategoricalDtype(
+    ['Estrellas', 'Prometedores', 'Potenciales', 'Revision', 'Remover', 'Sin Clasificar'],
+    ordered=True
+)
+
+
 def obtener_lista_skus(df, mes_filtro=None):
     """
     Obtiene la lista de SKUs disponibles con su descripción y clasificación
@@ -182,7 +711,7 @@ def obtener_lista_skus(df, mes_filtro=None):
     Returns:
         list: Lista de dicts con {sku, descripcion, clasificacion}
     """
-    print(f"🔍 [CLASIFICACION] Obteniendo lista de SKUs para mes {mes_filtro}...")
+    logger.debug("🔍 [CLASIFICACION] Obteniendo lista de SKUs para mes %s...", mes_filtro)
 
     if df.empty:
         return []
@@ -190,65 +719,52 @@ def obtener_lista_skus(df, mes_filtro=None):
     # Filtrar por mes si se especifica
     if mes_filtro:
         df = filtrar_por_mes(df, mes_filtro)
-        print(f"🔍 [CLASIFICACION] Filtrado por mes {mes_filtro}: {len(df)} registros")
+        logger.debug("🔍 [CLASIFICACION] Filtrado por mes %s: %s registros", mes_filtro, len(df))
 
     # Verificar si existe la columna Clasificacion
     if 'Clasificacion' not in df.columns:
-        print(f"⚠️  [CLASIFICACION] Columna 'Clasificacion' NO encontrada en el DataFrame")
-        print(f"📋 [CLASIFICACION] Columnas disponibles: {df.columns.tolist()}")
-    else:
-        print(f"✅ [CLASIFICACION] Columna 'Clasificacion' encontrada")
+        logger.warning("⚠️  [CLASIFICACION] Columna 'Clasificacion' NO encontrada en el DataFrame")
+        logger.debug("📋 [CLASIFICACION] Columnas disponibles: %s", list(df.columns))
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("✅ [CLASIFICACION] Columna 'Clasificacion' encontrada")
         clasificaciones_unicas = df['Clasificacion'].unique()
-        print(f"📊 [CLASIFICACION] Clasificaciones únicas: {clasificaciones_unicas}")
+        logger.debug("📊 [CLASIFICACION] Clasificaciones únicas: %s", clasificaciones_unicas)
 
     # Tomar el último registro por SKU para obtener la info más reciente
-    df_sorted = df.sort_values('Fecha', ascending=False)
-    df_ultimo = df_sorted.groupby('sku').first().reset_index()
-
-    # Crear lista de SKUs
-    skus_lista = []
-    for _, row in df_ultimo.iterrows():
-        # Intentar obtener clasificación de diferentes formas
-        clasificacion = None
-        if 'Clasificacion' in row:
-            clasificacion = row['Clasificacion']
-
-        # Si el valor es None, vacío o NaN, usar 'Sin Clasificar'
-        if clasificacion is None or pd.isna(clasificacion) or clasificacion == '':
-            clasificacion = 'Sin Clasificar'
-
-        # Debug: imprimir las primeras 3 clasificaciones
-        if len(skus_lista) < 3:
-            print(f"🔍 [CLASIFICACION DEBUG] SKU: {row['sku']}, Clasificacion: '{clasificacion}'")
-
-        skus_lista.append({
-            'sku': row['sku'],
-            'descripcion': row['Descripcion'],
-            'clasificacion': clasificacion
-        })
-
-    # Definir orden de clasificaciones
-    orden_clasificacion = {
-        'Estrellas': 1,
-        'Prometedores': 2,
-        'Potenciales': 3,
-        'Revision': 4,
-        'Remover': 5,
-        'Sin Clasificar': 6
-    }
-
-    # Ordenar por clasificación (según orden definido) y luego por SKU alfabéticamente
-    skus_lista = sorted(skus_lista, key=lambda x: (orden_clasificacion.get(x['clasificacion'], 999), x['sku']))
+    df_ultimo = tomar_ultimo_registro(df, ['sku'])
+
+    # Clasificación: si el valor es None, vacío o NaN, usar 'Sin Clasificar'
+    clasificacion = normalizar_clasificacion(df_ultimo)
+
+    # Crear lista de SKUs con operaciones de columna
+    df_skus = pd.DataFrame({
+        'sku': df_ultimo['sku'],
+        'descripcion': df_ultimo['Descripcion'],
+        'clasificacion': clasificacion
+    })
+
+    # Debug: imprimir las primeras 3 clasificaciones
+    if logger.isEnabledFor(logging.DEBUG):
+        for sku, clasif in zip(df_skus['sku'][:3], df_skus['clasificacion'][:3]):
+            logger.debug("🔍 [CLASIFICACION DEBUG] SKU: %s, Clasificacion: '%s'", sku, clasif)
+
+    # Ordenar por clasificación (según ORDEN_CLASIFICACION_SKUS, las desconocidas
+    # al final) y luego por SKU alfabéticamente, sobre los códigos de la categoría
+    df_skus = df_skus.sort_values(
+        ['clasificacion', 'sku'],
+        key=lambda col: col.astype(ORDEN_CLASIFICACION_SKUS) if col.name == 'clasificacion' else col.astype(object)
+    )
+    skus_lista = df_skus.to_dict('records')
 
     # Contar clasificaciones
-    from collections import Counter
-    clasificaciones_count = Counter([s['clasificacion'] for s in skus_lista])
-    print(f"✅ [CLASIFICACION] {len(skus_lista)} SKUs encontrados")
-    print(f"📊 [CLASIFICACION] Distribución: {dict(clasificaciones_count)}")
+    clasificaciones_count = df_skus['clasificacion'].value_counts().to_dict()
+    logger.debug("✅ [CLASIFICACION] %s SKUs encontrados", len(skus_lista))
+    logger.debug("📊 [CLASIFICACION] Distribución: %s", clasificaciones_count)
 
     return skus_lista
 
 
+@memoizar_por_version
 def generar_datos_matriz_clasificacion_con_rango_dias(df, mes_filtro=None, canal_filtro=None, skus_seleccionados=None, dia_maximo=None):
     """
     Genera datos para la matriz de clasificación con filtro por rango de días
@@ -265,7 +781,7 @@ def generar_datos_matriz_clasificacion_con_rango_dias(df, mes_filtro=None, canal
         dict: {datasets, skus, estadisticas}
     """
     tiempo_inicio = time.time()
-    print(f"🔍 [CLASIFICACION-RANGO] Generando datos - Mes: {mes_filtro}, Canal: {canal_filtro}, SKUs: {skus_seleccionados}, Día máximo: {dia_maximo}")
+    logger.debug("🔍 [CLASIFICACION-RANGO] Generando datos - Mes: %s, Canal: %s, SKUs: %s, Día máximo: %s", mes_filtro, canal_filtro, skus_seleccionados, dia_maximo)
 
     if df.empty:
         return {
@@ -282,7 +798,7 @@ def generar_datos_matriz_clasificacion_con_rango_dias(df, mes_filtro=None, canal
 
     # Si no hay SKUs seleccionados, devolver datos vacíos
     if not skus_seleccionados or len(skus_seleccionados) == 0:
-        print(f"⚠️  [CLASIFICACION-RANGO] No hay SKUs seleccionados, retornando vacío")
+        logger.warning("⚠️  [CLASIFICACION-RANGO] No hay SKUs seleccionados, retornando vacío")
         return {
             'datasets': [],
             'skus': [],
@@ -298,27 +814,21 @@ def generar_datos_matriz_clasificacion_con_rango_dias(df, mes_filtro=None, canal
     # Filtrar por mes Y rango de días si se especifica
     if mes_filtro:
         df = filtrar_por_rango_dias(df, mes_filtro, dia_maximo)
-        print(f"📊 [CLASIFICACION-RANGO] Registros después de filtrar por mes {mes_filtro} (días 1-{dia_maximo or 'fin'}): {len(df)}")
+        logger.debug("📊 [CLASIFICACION-RANGO] Registros después de filtrar por mes %s (días 1-%s): %s", mes_filtro, dia_maximo or 'fin', len(df))
 
-    # Filtrar por canal si se especifica (y no es "Todos")
+    # Filtrar por SKUs seleccionados, estado y canal (si no es "Todos")
+    # con una sola máscara, materializando el DataFrame una única vez
+    mascara = df['sku'].isin(skus_seleccionados) & (df['estado'] != 'Cancelado')
     if canal_filtro and canal_filtro != 'Todos':
         # Soportar tanto string como lista
-        if isinstance(canal_filtro, list):
-            df = df[df['Channel'].isin(canal_filtro)].copy()
-            print(f"📊 [CLASIFICACION-RANGO] Registros después de filtrar por canales {canal_filtro}: {len(df)}")
-        else:
-            df = df[df['Channel'] == canal_filtro].copy()
-            print(f"📊 [CLASIFICACION-RANGO] Registros después de filtrar por canal {canal_filtro}: {len(df)}")
-
-    # Filtrar por SKUs seleccionados
-    df = df[df['sku'].isin(skus_seleccionados)].copy()
-    print(f"📊 [CLASIFICACION-RANGO] Registros después de filtrar por SKUs: {len(df)}")
+        canales = canal_filtro if isinstance(canal_filtro, (list, tuple)) else [canal_filtro]
+        mascara &= df['Channel'].isin(canales)
 
-    # Filtrar por estado
-    df_filtrado = df[df['estado'] != 'Cancelado'].copy()
+    df_filtrado = df[mascara]
+    logger.debug("📊 [CLASIFICACION-RANGO] Registros después de filtrar por canal %s, SKUs y estado: %s", canal_filtro, len(df_filtrado))
 
     if df_filtrado.empty:
-        print(f"⚠️  [CLASIFICACION-RANGO] No hay datos después de aplicar filtros")
+        logger.warning("⚠️  [CLASIFICACION-RANGO] No hay datos después de aplicar filtros")
         return {
             'datasets': [],
             'skus': [],
@@ -332,15 +842,15 @@ def generar_datos_matriz_clasificacion_con_rango_dias(df, mes_filtro=None, canal
         }
 
     # IMPORTANTE: Tomar el último registro de cada SKU + Channel (datos acumulados)
-    df_filtrado = df_filtrado.sort_values('Fecha', ascending=False)
-    df_ultimo_registro = df_filtrado.groupby(['sku', 'Channel']).first().reset_index()
+    df_ultimo_registro = tomar_ultimo_registro(df_filtrado, ['sku', 'Channel'])
 
-    print(f"📊 [CLASIFICACION-RANGO] Registros después de tomar último por SKU-Canal: {len(df_ultimo_registro)}")
+    logger.debug("📊 [CLASIFICACION-RANGO] Registros después de tomar último por SKU-Canal: %s", len(df_ultimo_registro))
 
-    # Llamar a la función original con df ya filtrado (sin mes_filtro para evitar doble filtro)
-    return generar_datos_matriz_clasificacion(df_ultimo_registro, mes_filtro=None, canal_filtro=None, skus_seleccionados=skus_seleccionados)
+    # Construir la matriz directamente: el df ya está filtrado y deduplicado
+    return construir_datos_matriz_clasificacion(df_ultimo_registro, tiempo_inicio)
 
 
+@memoizar_por_version
 def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, skus_seleccionados=None):
     """
     Genera datos para la matriz de clasificación (% Ingreso Real vs % ROI por SKU-Canal)
@@ -359,8 +869,8 @@ def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, s
         }
     """
     tiempo_inicio = time.time()
-    print(f"🔍 [CLASIFICACION] Generando datos para matriz de clasificación...")
-    print(f"📥 [CLASIFICACION] Filtros - Mes: {mes_filtro}, Canal: {canal_filtro}, SKUs: {skus_seleccionados}")
+    logger.debug("🔍 [CLASIFICACION] Generando datos para matriz de clasificación...")
+    logger.debug("📥 [CLASIFICACION] Filtros - Mes: %s, Canal: %s, SKUs: %s", mes_filtro, canal_filtro, skus_seleccionados)
 
     if df.empty:
         return {
@@ -377,7 +887,7 @@ def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, s
 
     # Si no hay SKUs seleccionados, devolver datos vacíos
     if not skus_seleccionados or len(skus_seleccionados) == 0:
-        print(f"⚠️  [CLASIFICACION] No hay SKUs seleccionados, retornando vacío")
+        logger.warning("⚠️  [CLASIFICACION] No hay SKUs seleccionados, retornando vacío")
         return {
             'datasets': [],
             'skus': [],
@@ -393,27 +903,21 @@ def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, s
     # Filtrar por mes si se especifica
     if mes_filtro:
         df = filtrar_por_mes(df, mes_filtro)
-        print(f"📊 [CLASIFICACION] Registros después de filtrar por mes {mes_filtro}: {len(df)}")
+        logger.debug("📊 [CLASIFICACION] Registros después de filtrar por mes %s: %s", mes_filtro, len(df))
 
-    # Filtrar por canal si se especifica (y no es "Todos")
+    # Filtrar por SKUs seleccionados, estado y canal (si no es "Todos")
+    # con una sola máscara, materializando el DataFrame una única vez
+    mascara = df['sku'].isin(skus_seleccionados) & (df['estado'] != 'Cancelado')
     if canal_filtro and canal_filtro != 'Todos':
         # Soportar tanto string como lista
-        if isinstance(canal_filtro, list):
-            df = df[df['Channel'].isin(canal_filtro)].copy()
-            print(f"📊 [CLASIFICACION] Registros después de filtrar por canales {canal_filtro}: {len(df)}")
-        else:
-            df = df[df['Channel'] == canal_filtro].copy()
-            print(f"📊 [CLASIFICACION] Registros después de filtrar por canal {canal_filtro}: {len(df)}")
-
-    # Filtrar por SKUs seleccionados
-    df = df[df['sku'].isin(skus_seleccionados)].copy()
-    print(f"📊 [CLASIFICACION] Registros después de filtrar por SKUs: {len(df)}")
+        canales = canal_filtro if isinstance(canal_filtro, (list, tuple)) else [canal_filtro]
+        mascara &= df['Channel'].isin(canales)
 
-    # Filtrar por estado
-    df_filtrado = df[df['estado'] != 'Cancelado'].copy()
+    df_filtrado = df[mascara]
+    logger.debug("📊 [CLASIFICACION] Registros después de filtrar por canal %s, SKUs y estado: %s", canal_filtro, len(df_filtrado))
 
     if df_filtrado.empty:
-        print(f"⚠️  [CLASIFICACION] No hay datos después de aplicar filtros")
+        logger.warning("⚠️  [CLASIFICACION] No hay datos después de aplicar filtros")
         return {
             'datasets': [],
             'skus': [],
@@ -427,39 +931,26 @@ def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, s
         }
 
     # IMPORTANTE: Tomar el último registro de cada SKU + Channel (datos acumulados)
-    df_filtrado = df_filtrado.sort_values('Fecha', ascending=False)
-    df_ultimo_registro = df_filtrado.groupby(['sku', 'Channel']).first().reset_index()
-
-    print(f"📊 [CLASIFICACION] Registros después de tomar último por SKU-Canal: {len(df_ultimo_registro)}")
-
-    # Diccionario de abreviaciones de canales
-    abreviaciones_canales = {
-        'Mercado Libre': 'ML',
-        'Walmart': 'WM',
-        'Liverpool': 'LV',
-        'Shein': 'SH',
-        'CrediTienda': 'CT',
-        'Yuhu': 'YH',
-        'Aliexpress': 'AE',
-        'Coppel': 'CP',
-        'TikTok Shop': 'TT',
-        'Temu': 'TM'
-    }
+    df_ultimo_registro = tomar_ultimo_registro(df_filtrado, ['sku', 'Channel'])
 
-    # Colores por canal (PRINCIPAL - usado para graficar)
-    colores_canales = {
-        'Mercado Libre': '#FFE135',  # Amarillo
-        'Walmart': '#0071CE',        # Azul
-        'Liverpool': '#E4002B',      # Rojo
-        'Shein': '#FF6B35',          # Naranja vibrante (diferenciado de ML)
-        'CrediTienda': '#00A650',    # Verde
-        'Yuhu': '#9B59B6',           # Morado
-        'Aliexpress': '#E62129',     # Rojo oscuro
-        'Coppel': '#003DA5',         # Azul oscuro
-        'TikTok Shop': '#25F4EE',    # Cyan/Turquesa (color distintivo de TikTok)
-        'Temu': '#FF6C00'            # Naranja Temu (color oficial de la marca)
-    }
+    logger.debug("📊 [CLASIFICACION] Registros después de tomar último por SKU-Canal: %s", len(df_ultimo_registro))
+
+    return construir_datos_matriz_clasificacion(df_ultimo_registro, tiempo_inicio)
+
+
+def construir_datos_matriz_clasificacion(df_ultimo_registro, tiempo_inicio):
+    """
+    Construye datasets, lista de SKUs y estadísticas de la matriz de
+    clasificación a partir del último registro de cada SKU-Canal, sin volver
+    a filtrar ni deduplicar (eso lo hacen las funciones generar_*)
+
+    Args:
+        df_ultimo_registro: DataFrame (no vacío) con una fila por SKU-Canal
+        tiempo_inicio: time.time() al iniciar la generación (para el log)
 
+    Returns:
+        dict: {datasets, skus, estadisticas}
+    """
     # Colores por clasificación (solo para información adicional en tooltips)
     colores_clasificacion = {
         'Estrellas': '#FFD700',      # Dorado
@@ -470,157 +961,135 @@ def generar_datos_matriz_clasificacion(df, mes_filtro=None, canal_filtro=None, s
         'Sin Clasificar': '#6c757d'  # Gris
     }
 
-    # Procesar cada SKU-Canal
-    datasets = []
-    skus_info = []
-    ventas_list = []
-
-    print(f"📋 [CLASIFICACION] Columnas disponibles: {df_ultimo_registro.columns.tolist()}")
-
-    for idx, row in df_ultimo_registro.iterrows():
-        try:
-            sku = row['sku']
-            descripcion = row['Descripcion']
-            marca = row['Marca']
-            categoria = row['Categoria']
-            canal = row['Channel']
-
-            # Obtener abreviación del canal
-            canal_abrev = abreviaciones_canales.get(canal, canal[:2].upper())
-
-            # Obtener clasificación
-            clasificacion = row.get('Clasificacion', 'Sin Clasificar')
-            # Si es None o NaN, usar 'Sin Clasificar'
-            if pd.isna(clasificacion) or clasificacion == '' or clasificacion is None:
-                clasificacion = 'Sin Clasificar'
-
-            # Debug: imprimir las primeras 3
-            if len(skus_info) < 3:
-                print(f"🔍 [MATRIZ CLASIF DEBUG] SKU: {sku}, Canal: {canal}, Clasificacion: '{clasificacion}'")
-
-            ventas = float(row['Total'])
-            costo = float(row['Costo de venta'])
-            ingreso_real = float(row['Ingreso real'])
-        except Exception as e:
-            print(f"❌ [CLASIFICACION] Error procesando fila {idx}: {e}")
-            print(f"   Row keys: {row.index.tolist()}")
-            import traceback
-            traceback.print_exc()
-            continue
-
-        # Calcular porcentajes
-        ingreso_real_pct = (ingreso_real / ventas * 100) if ventas > 0 else 0
-        roi_pct = (ingreso_real / costo * 100) if costo > 0 else 0
+    # Procesar todos los SKU-Canal con operaciones de columna (sin iterrows)
+    logger.debug("📋 [CLASIFICACION] Columnas disponibles: %s", df_ultimo_registro.columns)
 
-        # Clasificar zona
-        zona, color_fondo, color_texto, icono = clasificar_zona(ingreso_real_pct, roi_pct)
+    ventas = df_ultimo_registro['Total'].to_numpy(dtype=np.float64)
+    costo = df_ultimo_registro['Costo de venta'].to_numpy(dtype=np.float64)
+    ingreso_real = df_ultimo_registro['Ingreso real'].to_numpy(dtype=np.float64)
 
-        # Guardar para escalar radios después
-        ventas_list.append(ventas)
-
-        # Información del SKU-Canal
-        skus_info.append({
-            'sku': sku,
-            'descripcion': descripcion,
-            'marca': marca,
-            'categoria': categoria,
-            'canal': canal,
-            'canal_abrev': canal_abrev,  # Agregar abreviación
-            'clasificacion': clasificacion,
-            'ingreso_real_pct': round(ingreso_real_pct, 2),
-            'roi_pct': round(roi_pct, 2),
-            'ventas': ventas,
-            'ingreso_real': ingreso_real,
-            'zona': zona,
-            'color_zona': color_fondo,
-            'color_texto': color_texto,
-            'icono': icono,
-            'color_clasificacion': colores_clasificacion.get(clasificacion, '#6c757d'),
-            'color_canal': colores_canales.get(canal, '#6c757d')
-        })
+    # Porcentajes, zona y radio de cada burbuja en un solo paso
+    ingreso_real_pct, roi_pct, zona_idx, radios = calcular_posiciones_burbujas(ventas, costo, ingreso_real)
 
-    # Escalar radios
-    min_ventas = min(ventas_list) if ventas_list else 0
-    max_ventas = max(ventas_list) if ventas_list else 0
-
-    # Crear datasets por clasificación (agrupar burbujas por color de clasificación)
-    datasets_temp = []
-
-    for sku_info in skus_info:
-        radio = escalar_radio_burbuja(
-            sku_info['ventas'],
-            min_ventas,
-            max_ventas
-        )
-
-        # Dataset para Chart.js (un punto por SKU-Canal)
-        # IMPORTANTE: Usar color de CANAL, no de clasificación
-        # Label formato: "ABREV - SKU" (ej: "ML - 2000005")
-        datasets_temp.append({
-            'label': f"{sku_info['canal_abrev']} - {sku_info['sku']}",
-            'data': [{
-                'x': sku_info['ingreso_real_pct'],
-                'y': sku_info['roi_pct'],
-                'r': radio
-            }],
-            'backgroundColor': sku_info['color_canal'],  # Cambio: usar color de canal
-            'borderColor': sku_info['color_canal'],      # Cambio: usar color de canal
+    # Abreviación y color del canal: tablas indexadas por código de categoría,
+    # con una entrada extra al final para los nulos (código -1)
+    canal_cat = df_ultimo_registro['Channel'].astype('category').cat
+    abrev_por_codigo = np.array(
+        [ABREVIACIONES_CANALES.get(c, c[:2].upper()) for c in canal_cat.categories] + [np.nan], dtype=object
+    )
+    color_por_codigo = np.array(
+        [COLORES_CANALES.get(c, COLOR_CANAL_DEFAULT) for c in canal_cat.categories] + [COLOR_CANAL_DEFAULT], dtype=object
+    )
+    codigos_canal = canal_cat.codes.to_numpy()
+    canales = df_ultimo_registro['Channel'].astype(object)
+
+    # Clasificación: None, NaN o vacío -> 'Sin Clasificar'
+    clasificacion = normalizar_clasificacion(df_ultimo_registro)
+
+    ingreso_real_pct = np.round(ingreso_real_pct, 2)
+    roi_pct = np.round(roi_pct, 2)
+
+    # Información de cada SKU-Canal
+    df_skus_info = pd.DataFrame({
+        'sku': df_ultimo_registro['sku'],
+        'descripcion': df_ultimo_registro['Descripcion'],
+        'marca': df_ultimo_registro['Marca'],
+        'categoria': df_ultimo_registro['Categoria'],
+        'canal': canales,
+        'canal_abrev': abrev_por_codigo[codigos_canal],  # Agregar abreviación
+        'clasificacion': clasificacion,
+        'ingreso_real_pct': ingreso_real_pct,
+        'roi_pct': roi_pct,
+        'ventas': ventas,
+        'ingreso_real': ingreso_real,
+        'zona': ZONAS_NOMBRE[zona_idx],
+        'color_zona': ZONAS_COLOR_FONDO[zona_idx],
+        'color_texto': ZONAS_COLOR_TEXTO[zona_idx],
+        'icono': ZONAS_ICONO[zona_idx],
+        'color_clasificacion': clasificacion.map(colores_clasificacion).fillna('#6c757d'),
+        'color_canal': color_por_codigo[codigos_canal]
+    })
+    skus_info = df_skus_info.to_dict('records')
+
+    # Debug: imprimir las primeras 3
+    if logger.isEnabledFor(logging.DEBUG):
+        for sku_info in skus_info[:3]:
+            logger.debug("🔍 [MATRIZ CLASIF DEBUG] SKU: %s, Canal: %s, Clasificacion: '%s'", sku_info['sku'], sku_info['canal'], sku_info['clasificacion'])
+
+    # Ordenar de menor a mayor radio sobre las columnas (orden estable)
+    df_ds = df_skus_info.assign(radio=radios).iloc[np.argsort(radios, kind='stable')]
+
+    # Label formato: "ABREV - SKU" (ej: "ML - 2000005")
+    labels = df_ds['canal_abrev'] + ' - ' + df_ds['sku'].astype(str)
+
+    # Un dataset de Chart.js por SKU-Canal, materializado en una sola pasada
+    # IMPORTANTE: Usar color de CANAL, no de clasificación
+    datasets = [
+        {
+            'label': label,
+            'data': [{'x': x, 'y': y, 'r': radio}],
+            'backgroundColor': color,  # Cambio: usar color de canal
+            'borderColor': color,      # Cambio: usar color de canal
             'borderWidth': 2,
             'pointStyle': 'cross',  # Cambio: usar 'cross' (X) en lugar de círculo
             'pointRadius': radio,   # Tamaño del punto
-            '_radio': radio,  # Para ordenar
-            '_sku': sku_info['sku'],
-            '_descripcion': sku_info['descripcion'],
-            '_canal': sku_info['canal'],
-            '_clasificacion': sku_info['clasificacion'],
-            '_ventas': sku_info['ventas'],
-            '_ingreso_real': sku_info['ingreso_real']
-        })
-
-    # Ordenar datasets de menor a mayor radio
-    datasets = sorted(datasets_temp, key=lambda d: d['_radio'], reverse=False)
-
-    # Remover campos temporales
-    for ds in datasets:
-        del ds['_radio']
+            '_sku': sku,
+            '_descripcion': descripcion,
+            '_canal': canal,
+            '_clasificacion': clasificacion,
+            '_ventas': venta,
+            '_ingreso_real': ingreso
+        }
+        for label, x, y, radio, color, sku, descripcion, canal, clasificacion, venta, ingreso in zip(
+            labels.tolist(),
+            df_ds['ingreso_real_pct'].tolist(),
+            df_ds['roi_pct'].tolist(),
+            df_ds['radio'].tolist(),
+            df_ds['color_canal'].tolist(),
+            df_ds['sku'].tolist(),
+            df_ds['descripcion'].tolist(),
+            df_ds['canal'].tolist(),
+            df_ds['clasificacion'].tolist(),
+            df_ds['ventas'].tolist(),
+            df_ds['ingreso_real'].tolist()
+        )
+    ]
 
     # Calcular ROI máximo para ajustar el eje Y dinámicamente
-    roi_max = max([s['roi_pct'] for s in skus_info]) if skus_info else 100
-    import math
+    roi_max = float(roi_pct.max())
     eje_y_max = max(100, math.ceil(roi_max * 1.1 / 10) * 10)
 
-    print(f"📊 [CLASIFICACION] ROI máximo encontrado: {roi_max:.1f}%")
-    print(f"📊 [CLASIFICACION] Eje Y ajustado a: 0% - {eje_y_max}%")
+    logger.debug("📊 [CLASIFICACION] ROI máximo encontrado: %.1f%%", roi_max)
+    logger.debug("📊 [CLASIFICACION] Eje Y ajustado a: 0%% - %s%%", eje_y_max)
 
-    # Estadísticas generales
-    total_ventas = sum(s['ventas'] for s in skus_info)
-    total_ingreso_real = sum(s['ingreso_real'] for s in skus_info)
-    ingreso_promedio = sum(s['ingreso_real_pct'] for s in skus_info) / len(skus_info) if skus_info else 0
-    roi_promedio = sum(s['roi_pct'] for s in skus_info) / len(skus_info) if skus_info else 0
+    # Estadísticas generales: reducciones de numpy sobre las columnas
+    # y conteo por zona con un solo bincount (orden de ZONAS_NOMBRE)
+    critico, eficiente, a_desarrollar, ideal = np.bincount(zona_idx, minlength=4).tolist()
 
     estadisticas = {
         'total_skus': len(skus_info),
-        'ventas_totales': total_ventas,
-        'ingreso_real_total': total_ingreso_real,
-        'ingreso_promedio': round(ingreso_promedio, 2),
-        'roi_promedio': round(roi_promedio, 2),
-        'critico': sum(1 for s in skus_info if s['zona'] == 'Crítico'),
-        'eficiente': sum(1 for s in skus_info if s['zona'] == 'Eficiente'),
-        'a_desarrollar': sum(1 for s in skus_info if s['zona'] == 'A Desarrollar'),
-        'ideal': sum(1 for s in skus_info if s['zona'] == 'Ideal'),
+        'ventas_totales': float(ventas.sum()),
+        'ingreso_real_total': float(ingreso_real.sum()),
+        'ingreso_promedio': round(float(ingreso_real_pct.mean()), 2),
+        'roi_promedio': round(float(roi_pct.mean()), 2),
+        'critico': critico,
+        'eficiente': eficiente,
+        'a_desarrollar': a_desarrollar,
+        'ideal': ideal,
         'eje_y_max': eje_y_max
     }
 
     tiempo_fin = time.time()
-    print(f"✅ [CLASIFICACION] Datos generados: {len(datasets)} SKU-Canal en {tiempo_fin - tiempo_inicio:.3f}s")
+    logger.info("✅ [CLASIFICACION] Datos generados: %s SKU-Canal en %.3fs", len(datasets), tiempo_fin - tiempo_inicio)
 
     return {
         'datasets': datasets,
-        'skus': sorted(skus_info, key=lambda x: x['ingreso_real'], reverse=True),  # Ordenar por $ IR
+        'skus': sorted(skus_info, key=itemgetter('ingreso_real'), reverse=True),  # Ordenar por $ IR
         'estadisticas': estadisticas
     }
 
 
+@memoizar_por_version
 def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clasificacion=None):
     """
     Genera datos para la matriz de posicionamiento (% Ingreso Real vs % ROI)
@@ -639,7 +1108,7 @@ def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clas
         }
     """
     tiempo_inicio = time.time()
-    print(f"🔍 [MATRIZ] Generando datos para matriz de posicionamiento... (Marca: {marca_filtro})")
+    logger.debug("🔍 [MATRIZ] Generando datos para matriz de posicionamiento... (Marca: %s)", marca_filtro)
 
     if df.empty:
         return {
@@ -657,71 +1126,57 @@ def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clas
     if mes_filtro:
         df = filtrar_por_mes(df, mes_filtro)
 
-    # Filtrar por marca si se especifica (y no es "Ambos")
-    if marca_filtro and marca_filtro != 'Ambos':
-        print(f"🏷️  [MATRIZ] Filtrando por marca: {marca_filtro}")
-        df = df[df['Marca'] == marca_filtro].copy()
-        print(f"📊 [MATRIZ] Registros después de filtrar por marca: {len(df)}")
-
     # Filtrar por canales oficiales y estado
-    print(f"🔍 [MATRIZ DEBUG] Canales en clasificación: {canales_clasificacion}")
-    print(f"🔍 [MATRIZ DEBUG] Canales únicos en DataFrame ANTES de filtrar: {sorted(df['Channel'].unique().tolist())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 [MATRIZ DEBUG] Canales en clasificación: %s", canales_clasificacion)
+        logger.debug("🔍 [MATRIZ DEBUG] Canales únicos en DataFrame ANTES de filtrar: %s", sorted(df['Channel'].unique().tolist()))
+
+    mascara = (df['estado'] != 'Cancelado') & (df['Channel'].isin(canales_clasificacion))
+
+    # Filtrar por marca si se especifica (y no es "Ambos"), en la misma máscara
+    if marca_filtro and marca_filtro != 'Ambos':
+        logger.debug("🏷️  [MATRIZ] Filtrando por marca: %s", marca_filtro)
+        mascara &= df['Marca'] == marca_filtro
 
-    df_filtrado = df[
-        (df['estado'] != 'Cancelado') &
-        (df['Channel'].isin(canales_clasificacion))
-    ].copy()
+    df_filtrado = df[mascara]
 
-    print(f"🔍 [MATRIZ DEBUG] Canales únicos DESPUÉS de filtrar: {sorted(df_filtrado['Channel'].unique().tolist())}")
-    print(f"🔍 [MATRIZ DEBUG] Total registros filtrados: {len(df_filtrado)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 [MATRIZ DEBUG] Canales únicos DESPUÉS de filtrar: %s", sorted(df_filtrado['Channel'].unique().tolist()))
+        logger.debug("🔍 [MATRIZ DEBUG] Total registros filtrados: %s", len(df_filtrado))
 
     if df_filtrado.empty:
         return {'datasets': [], 'canales': [], 'estadisticas': {}}
 
     # IMPORTANTE: Como los datos son acumulados, solo tomar el último registro de cada SKU
-    # Ordenar por fecha y tomar el último registro de cada SKU + Channel
-    df_filtrado = df_filtrado.sort_values('Fecha', ascending=False)
-    df_ultimo_registro = df_filtrado.groupby(['sku', 'Channel']).first().reset_index()
-
-    print(f"📊 [MATRIZ] Registros después de tomar último por SKU: {len(df_ultimo_registro)} (antes: {len(df_filtrado)})")
-    print(f"🔍 [MATRIZ DEBUG] Canales únicos en df_ultimo_registro: {sorted(df_ultimo_registro['Channel'].unique().tolist())}")
-
-    # Contar registros por canal
-    canales_count = df_ultimo_registro['Channel'].value_counts()
-    print(f"🔍 [MATRIZ DEBUG] Distribución de registros por canal:")
-    for canal, count in canales_count.items():
-        print(f"   - {canal}: {count} registros")
-
-    # Colores por canal
-    colores_canales = {
-        'Mercado Libre': '#FFE135',  # Amarillo
-        'Walmart': '#0071CE',        # Azul
-        'Liverpool': '#E4002B',      # Rojo
-        'Shein': '#FF6B35',          # Naranja vibrante (diferenciado de ML)
-        'CrediTienda': '#00A650',    # Verde
-        'Yuhu': '#9B59B6',           # Morado
-        'Aliexpress': '#E62129',     # Rojo oscuro
-        'Coppel': '#003DA5',         # Azul oscuro
-        'TikTok Shop': '#25F4EE',    # Cyan/Turquesa (color distintivo de TikTok)
-        'Temu': '#FF6C00'            # Naranja Temu (color oficial de la marca)
-    }
+    # Tomar el último registro de cada SKU + Channel
+    df_ultimo_registro = tomar_ultimo_registro(df_filtrado, ['sku', 'Channel'])
+
+    logger.debug("📊 [MATRIZ] Registros después de tomar último por SKU: %s (antes: %s)", len(df_ultimo_registro), len(df_filtrado))
+
+    # Canales únicos y distribución por canal (solo si el nivel DEBUG está activo)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 [MATRIZ DEBUG] Canales únicos en df_ultimo_registro: %s", sorted(df_ultimo_registro['Channel'].unique().tolist()))
+        canales_count = df_ultimo_registro['Channel'].value_counts()
+        logger.debug("🔍 [MATRIZ DEBUG] Distribución de registros por canal:")
+        for canal, count in canales_count.items():
+            logger.debug("   - %s: %s registros", canal, count)
 
     # Agrupar por canal y calcular métricas
     datasets = []
     canales_info = []
     ventas_list = []
 
-    for canal in df_ultimo_registro['Channel'].unique():
-        df_canal = df_ultimo_registro[df_ultimo_registro['Channel'] == canal]
+    # Calcular métricas de todos los canales en un solo groupby
+    # (ahora suma los últimos registros de cada SKU)
+    metricas_canales = calcular_metricas_agrupadas(df_ultimo_registro, 'Channel')
 
-        # Calcular métricas (ahora suma los últimos registros de cada SKU)
-        metricas = calcular_metricas_canal(df_canal)
+    # Clasificar zona de todos los canales a la vez (índice para ZONAS_*)
+    zona_idx = indice_zona(
+        metricas_canales['ingreso_real_pct'].to_numpy(), metricas_canales['roi_pct'].to_numpy()
+    )
 
-        # Clasificar zona
-        zona, color_fondo, color_texto, icono = clasificar_zona(
-            metricas['ingreso_real_pct'],
-            metricas['roi_pct']
-        )
+    for metricas, z in zip(metricas_canales.to_dict('records'), zona_idx.tolist()):
+        canal = metricas['Channel']
 
         # Guardar para escalar radios después
         ventas_list.append(metricas['ventas_reales'])
@@ -734,30 +1189,26 @@ def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clas
             'ventas': metricas['ventas_reales'],
             'ingreso_real': metricas['ingreso_real'],
             'costo_venta': metricas['costo_venta'],  # AGREGADO para cálculo correcto
-            'zona': zona,
-            'color_zona': color_fondo,
-            'color_texto': color_texto,
-            'icono': icono,
+            'zona': ZONAS_NOMBRE[z],
+            'color_zona': ZONAS_COLOR_FONDO[z],
+            'color_texto': ZONAS_COLOR_TEXTO[z],
+            'icono': ZONAS_ICONO[z],
             'num_transacciones': metricas['num_transacciones'],
-            'color_canal': colores_canales.get(canal, '#6c757d')
+            'color_canal': COLORES_CANALES.get(canal, COLOR_CANAL_DEFAULT)
         })
 
     # Escalar radios
     min_ventas = min(ventas_list) if ventas_list else 0
     max_ventas = max(ventas_list) if ventas_list else 0
 
-    # Lista temporal para ordenar por tamaño
-    datasets_temp = []
+    radios = escalar_radios_burbuja(ventas_list, min_ventas, max_ventas)
 
-    for canal_info in canales_info:
-        radio = escalar_radio_burbuja(
-            canal_info['ventas'],
-            min_ventas,
-            max_ventas
-        )
-
-        # Dataset para Chart.js (un punto por canal)
-        datasets_temp.append({
+    # Ordenar datasets de menor a mayor radio (burbujas pequeñas primero/atrás, grandes al final/adelante)
+    # Esto asegura que las burbujas pequeñas siempre sean visibles encima de las grandes.
+    # El orden sale de un argsort estable sobre los radios, sin lista temporal
+    orden = np.argsort(radios, kind='stable')
+    datasets = [
+        {
             'label': canal_info['canal'],
             'data': [{
                 'x': canal_info['ingreso_real_pct'],
@@ -766,35 +1217,30 @@ def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clas
             }],
             'backgroundColor': canal_info['color_canal'],
             'borderColor': canal_info['color_canal'],
-            'borderWidth': 2,
-            '_radio': radio  # Para ordenar
-        })
-
-    # Ordenar datasets de menor a mayor radio (burbujas pequeñas primero/atrás, grandes al final/adelante)
-    # Esto asegura que las burbujas pequeñas siempre sean visibles encima de las grandes
-    datasets = sorted(datasets_temp, key=lambda d: d['_radio'], reverse=False)
-
-    # Remover el campo temporal
-    for ds in datasets:
-        del ds['_radio']
+            'borderWidth': 2
+        }
+        for canal_info, radio in zip([canales_info[i] for i in orden.tolist()], radios[orden].tolist())
+    ]
 
-    # Estadísticas generales
-    total_ventas = sum(c['ventas'] for c in canales_info)
-    total_ingreso_real = sum(c['ingreso_real'] for c in canales_info)
-    total_costo_venta = sum(c['costo_venta'] for c in canales_info)
+    # Estadísticas generales: los tres totales en una sola reducción
+    total_ventas, total_ingreso_real, total_costo_venta = (
+        metricas_canales[['ventas_reales', 'ingreso_real', 'costo_venta']].sum().tolist()
+    )
 
     # CORREGIDO: Calcular porcentajes sobre totales, NO promedio de porcentajes
     ingreso_promedio = (total_ingreso_real / total_ventas * 100) if total_ventas > 0 else 0
     roi_promedio = (total_ingreso_real / total_costo_venta * 100) if total_costo_venta > 0 else 0
 
     # Calcular ROI máximo para ajustar el eje Y dinámicamente
-    roi_max = max([c['roi_pct'] for c in canales_info]) if canales_info else 100
+    roi_max = float(np.round(metricas_canales['roi_pct'].to_numpy(), 2).max())
     # Calcular el máximo del eje Y: al menos 100, o ROI_max * 1.1 redondeado al siguiente múltiplo de 10
-    import math
     eje_y_max = max(100, math.ceil(roi_max * 1.1 / 10) * 10)
 
-    print(f"📊 [MATRIZ] ROI máximo encontrado: {roi_max:.1f}%")
-    print(f"📊 [MATRIZ] Eje Y ajustado a: 0% - {eje_y_max}%")
+    logger.debug("📊 [MATRIZ] ROI máximo encontrado: %.1f%%", roi_max)
+    logger.debug("📊 [MATRIZ] Eje Y ajustado a: 0%% - %s%%", eje_y_max)
+
+    # Conteo por zona con un solo bincount sobre el índice de zona de cada canal
+    critico, eficiente, a_desarrollar, ideal = np.bincount(zona_idx, minlength=4).tolist()
 
     estadisticas = {
         'total_canales': len(canales_info),
@@ -802,19 +1248,19 @@ def generar_datos_matriz(df, mes_filtro=None, marca_filtro='Ambos', canales_clas
         'ingreso_real_total': total_ingreso_real,
         'ingreso_promedio': round(ingreso_promedio, 2),
         'roi_promedio': round(roi_promedio, 2),
-        'critico': sum(1 for c in canales_info if c['zona'] == 'Crítico'),
-        'eficiente': sum(1 for c in canales_info if c['zona'] == 'Eficiente'),
-        'a_desarrollar': sum(1 for c in canales_info if c['zona'] == 'A Desarrollar'),
-        'ideal': sum(1 for c in canales_info if c['zona'] == 'Ideal'),
+        'critico': critico,
+        'eficiente': eficiente,
+        'a_desarrollar': a_desarrollar,
+        'ideal': ideal,
         'eje_y_max': eje_y_max  # ← NUEVO: Para usar en el frontend
     }
 
     tiempo_fin = time.time()
-    print(f"✅ [MATRIZ] Datos generados: {len(datasets)} canales en {tiempo_fin - tiempo_inicio:.3f}s")
+    logger.info("✅ [MATRIZ] Datos generados: %s canales en %.3fs", len(datasets), tiempo_fin - tiempo_inicio)
 
     return {
         'datasets': datasets,
-        'canales': sorted(canales_info, key=lambda x: x['ingreso_real'], reverse=True),  # Ordenar por $ IR
+        'canales': sorted(canales_info, key=itemgetter('ingreso_real'), reverse=True),  # Ordenar por $ IR
         'estadisticas': estadisticas
     }
 
@@ -868,12 +1314,40 @@ def escalar_tamano_marcador(ventas, min_ventas, max_ventas, tamano_min=8, tamano
     Returns:
         float: Tamaño escalado
     """
+    return float(escalar_tamanos_marcador(ventas, min_ventas, max_ventas, tamano_min, tamano_max))
+
+
+def escalar_tamanos_marcador(ventas, min_ventas, max_ventas, tamano_min=8, tamano_max=20):
+    """
+    Versión vectorizada de escalar_tamano_marcador: escala todos los
+    marcadores con una sola expresión sobre el array de ventas
+
+    Args:
+        ventas: Array (o lista) con las ventas de cada grupo
+        min_ventas: Ventas mínimas de todos los grupos
+        max_ventas: Ventas máximas de todos los grupos
+        tamano_min: Tamaño mínimo del marcador
+        tamano_max: Tamaño máximo del marcador
+
+    Returns:
+        np.ndarray: Tamaños escalados
+    """
+    ventas = np.asarray(ventas, dtype=np.float64)
+
     if max_ventas > min_ventas:
         return tamano_min + ((ventas - min_ventas) / (max_ventas - min_ventas)) * (tamano_max - tamano_min)
     else:
-        return (tamano_min + tamano_max) / 2
+        return np.full(ventas.shape, (tamano_min + tamano_max) / 2)
+
+
+# Columnas que necesita la matriz de categorías
+COLUMNAS_MATRIZ_CATEGORIAS = (
+    'Fecha', 'sku', 'Channel', 'Categoria', 'Categoria_Catalogo', '_categoria',
+    'Total', 'Costo de venta', 'Gastos_directos', 'Ingreso real'
+)
 
 
+@memoizar_por_version
 def generar_datos_matriz_categorias(df, mes_filtro=None, canales_clasificacion=None, canales_filtro=None, categorias_filtro=None):
     """
     Genera datos para la matriz de categorías (% Ingreso Real vs % ROI)
@@ -893,24 +1367,10 @@ def generar_datos_matriz_categorias(df, mes_filtro=None, canales_clasificacion=N
             'estadisticas': Estadísticas generales
         }
     """
-    # Diccionario de abreviaciones de canales
-    abreviaciones_canales = {
-        'Mercado Libre': 'ML',
-        'Walmart': 'WM',
-        'Liverpool': 'LV',
-        'Shein': 'SH',
-        'CrediTienda': 'CT',
-        'Yuhu': 'YH',
-        'Aliexpress': 'AE',
-        'Coppel': 'CP',
-        'TikTok Shop': 'TT',
-        'Temu': 'TM'
-    }
-
     tiempo_inicio = time.time()
-    print("🔍 [MATRIZ CAT] Generando datos para matriz de categorías...")
-    print(f"📋 [MATRIZ CAT] Filtros aplicados - Canales: {canales_filtro}, Categorías: {categorias_filtro}")
-    print(f"📋 [MATRIZ CAT] Total filas recibidas: {len(df)}")
+    logger.debug("🔍 [MATRIZ CAT] Generando datos para matriz de categorías...")
+    logger.debug("📋 [MATRIZ CAT] Filtros aplicados - Canales: %s, Categorías: %s", canales_filtro, categorias_filtro)
+    logger.debug("📋 [MATRIZ CAT] Total filas recibidas: %s", len(df))
 
     if df.empty:
         return {
@@ -932,44 +1392,44 @@ def generar_datos_matriz_categorias(df, mes_filtro=None, canales_clasificacion=N
     if mes_filtro:
         df = filtrar_por_mes(df, mes_filtro)
 
-    # Verificar que exista la columna 'Categoria_Catalogo' y crear alias 'Categoria'
-    if 'Categoria_Catalogo' in df.columns:
-        df['Categoria'] = df['Categoria_Catalogo']
-        print(f"✅ [MATRIZ CAT] Columna 'Categoria_Catalogo' encontrada y mapeada a 'Categoria'")
-    elif 'Categoria' not in df.columns:
-        print("⚠️ [MATRIZ CAT] No existe columna 'Categoria' ni 'Categoria_Catalogo', usando categoría genérica")
-        df['Categoria'] = 'Sin Categoría'
-
     # Filtrar por canales oficiales y estado
-    df_filtrado = df[
-        (df['estado'] != 'Cancelado') &
-        (df['Channel'].isin(canales_clasificacion))
-    ].copy()
+    mascara = (df['estado'] != 'Cancelado') & df['Channel'].isin(canales_clasificacion)
 
-    if df_filtrado.empty:
+    if not mascara.any():
         return {'datasets': [], 'categorias': [], 'estadisticas': {}}
 
-    # Reemplazar valores vacíos o nulos en Categoria
-    df_filtrado['Categoria'] = df_filtrado['Categoria'].fillna('Sin Categoría')
-    df_filtrado.loc[df_filtrado['Categoria'].str.strip() == '', 'Categoria'] = 'Sin Categoría'
+    # El filtro de canales es parte de la llave (sku, Channel), así que se
+    # aplica antes de deduplicar; el de categorías depende del último registro
+    if canales_filtro and len(canales_filtro) > 0:
+        mascara &= df['Channel'].isin(canales_filtro)
+        logger.debug("🔍 [MATRIZ CAT] Filtrado por canales %s: %s registros", canales_filtro, int(mascara.sum()))
+
+    # Solo las filas y columnas que usa la matriz; no se escribe sobre ellas
+    columnas = [col for col in COLUMNAS_MATRIZ_CATEGORIAS if col in df.columns]
+    df_filtrado = df.loc[mascara, columnas]
 
     # IMPORTANTE: Como los datos son acumulados, solo tomar el último registro de cada SKU
-    df_filtrado = df_filtrado.sort_values('Fecha', ascending=False)
-    df_ultimo_registro = df_filtrado.groupby(['sku', 'Channel']).first().reset_index()
+    # (el resultado es un DataFrame nuevo, así que la categoría se asigna
+    # aquí, sobre una fila por SKU-Canal, sin copiar el DataFrame filtrado)
+    df_ultimo_registro = tomar_ultimo_registro(df_filtrado, ['sku', 'Channel'])
 
-    print(f"📊 [MATRIZ CAT] Registros después de tomar último por SKU: {len(df_ultimo_registro)}")
+    logger.debug("📊 [MATRIZ CAT] Registros después de tomar último por SKU: %s", len(df_ultimo_registro))
 
-    # Aplicar filtros adicionales de Canales y/o Categorías (múltiples)
-    if canales_filtro and len(canales_filtro) > 0:
-        df_ultimo_registro = df_ultimo_registro[df_ultimo_registro['Channel'].isin(canales_filtro)].copy()
-        print(f"🔍 [MATRIZ CAT] Filtrado por canales {canales_filtro}: {len(df_ultimo_registro)} registros")
+    # Categoria limpia como 'category' (ya calculada al cargar si existe
+    # '_categoria'): el filtro por categorías y el groupby Canal + Categoría
+    # operan sobre códigos enteros (Channel ya lo es)
+    if '_categoria' in df_ultimo_registro.columns:
+        df_ultimo_registro['Categoria'] = df_ultimo_registro['_categoria']
+    else:
+        df_ultimo_registro['Categoria'] = normalizar_categoria(df_ultimo_registro)
 
+    # Aplicar filtro adicional de Categorías (múltiples)
     if categorias_filtro and len(categorias_filtro) > 0:
-        df_ultimo_registro = df_ultimo_registro[df_ultimo_registro['Categoria'].isin(categorias_filtro)].copy()
-        print(f"🔍 [MATRIZ CAT] Filtrado por categorías {categorias_filtro}: {len(df_ultimo_registro)} registros")
+        df_ultimo_registro = df_ultimo_registro[df_ultimo_registro['Categoria'].isin(categorias_filtro)]
+        logger.debug("🔍 [MATRIZ CAT] Filtrado por categorías %s: %s registros", categorias_filtro, len(df_ultimo_registro))
 
     if df_ultimo_registro.empty:
-        print(f"⚠️ [MATRIZ CAT] No hay datos después de aplicar filtros")
+        logger.warning("⚠️ [MATRIZ CAT] No hay datos después de aplicar filtros")
         return {'datasets': [], 'categorias': [], 'estadisticas': {
             'total_combinaciones': 0,
             'ventas_totales': 0,
@@ -977,133 +1437,104 @@ def generar_datos_matriz_categorias(df, mes_filtro=None, canales_clasificacion=N
             'roi_promedio': 0
         }}
 
-    # Colores por canal (mismos que matriz de posicionamiento)
-    colores_canales = {
-        'Mercado Libre': '#FFE135',
-        'Walmart': '#0071CE',
-        'Liverpool': '#E4002B',
-        'Shein': '#FF6B35',
-        'CrediTienda': '#00A650',
-        'Yuhu': '#9B59B6',
-        'Aliexpress': '#E62129',
-        'Coppel': '#003DA5',
-        'TikTok Shop': '#25F4EE',
-        'Temu': '#FF6C00'
-    }
+    # Agrupar por Canal + Categoría: métricas de todos los grupos en una sola agregación
+    df_metricas = calcular_metricas_agrupadas(df_ultimo_registro, ['Channel', 'Categoria'], ordenar=True)
 
-    # Agrupar por Canal + Categoría
-    categorias_info = []
-    ventas_list = []
-
-    grupos = df_ultimo_registro.groupby(['Channel', 'Categoria'])
-
-    for (canal, categoria), df_grupo in grupos:
-        metricas = calcular_metricas_categoria(df_grupo)
-
-        zona, color_fondo, color_texto, icono = clasificar_zona(
-            metricas['ingreso_real_pct'],
-            metricas['roi_pct']
-        )
-
-        ventas_list.append(metricas['ventas_reales'])
-        canal_abrev = abreviaciones_canales.get(canal, canal)
-        label = f"{canal_abrev} - {categoria}"
+    # Clasificar zona de todos los grupos a la vez (índice para ZONAS_*)
+    zona_idx = indice_zona(
+        df_metricas['ingreso_real_pct'].to_numpy(), df_metricas['roi_pct'].to_numpy()
+    )
 
-        categorias_info.append({
-            'canal': canal,
-            'canal_abrev': canal_abrev,
-            'categoria': categoria,
+    # Escalar tamaños de todos los grupos en una sola expresión
+    ventas = df_metricas['ventas_reales'].to_numpy(dtype=np.float64)
+    tamanos = escalar_tamanos_marcador(ventas, ventas.min(), ventas.max())
+
+    # Abreviación, color y etiqueta de todos los grupos con un map vectorizado
+    canales_grupo = df_metricas['Channel'].astype(object)
+    canal_abrev = canales_grupo.map(ABREVIACIONES_CANALES).fillna(canales_grupo)
+
+    # Un solo DataFrame con la información de cada grupo: de él salen tanto
+    # los datasets de Chart.js como la lista de categorías
+    df_categorias = pd.DataFrame({
+        'canal': canales_grupo,
+        'canal_abrev': canal_abrev,
+        'categoria': df_metricas['Categoria'].astype(object),
+        'label': canal_abrev + ' - ' + df_metricas['Categoria'].astype(str),
+        'ingreso_real_pct': [round(v, 2) for v in df_metricas['ingreso_real_pct'].tolist()],
+        'roi_pct': [round(v, 2) for v in df_metricas['roi_pct'].tolist()],
+        'ventas': df_metricas['ventas_reales'],
+        'ingreso_real': df_metricas['ingreso_real'],
+        'costo_venta': df_metricas['costo_venta'],  # AGREGADO para cálculo correcto
+        'zona': ZONAS_NOMBRE[zona_idx],
+        'color_zona': ZONAS_COLOR_FONDO[zona_idx],
+        'color_texto': ZONAS_COLOR_TEXTO[zona_idx],
+        'icono': ZONAS_ICONO[zona_idx],
+        'num_transacciones': df_metricas['num_transacciones'],
+        'color_canal': canales_grupo.map(COLORES_CANALES).fillna(COLOR_CANAL_DEFAULT)
+    }).reset_index(drop=True)
+
+    # Datasets de menor a mayor tamaño (orden estable)
+    orden = np.argsort(tamanos, kind='stable')
+    df_datasets = df_categorias.take(orden)
+    datasets = [
+        {
             'label': label,
-            'ingreso_real_pct': round(metricas['ingreso_real_pct'], 2),
-            'roi_pct': round(metricas['roi_pct'], 2),
-            'ventas': metricas['ventas_reales'],
-            'ingreso_real': metricas['ingreso_real'],
-            'costo_venta': metricas['costo_venta'],  # AGREGADO para cálculo correcto
-            'zona': zona,
-            'color_zona': color_fondo,
-            'color_texto': color_texto,
-            'icono': icono,
-            'num_transacciones': metricas['num_transacciones'],
-            'color_canal': colores_canales.get(canal, '#6c757d')
-        })
-
-    # Escalar radios
-    min_ventas = min(ventas_list) if ventas_list else 0
-    max_ventas = max(ventas_list) if ventas_list else 0
-
-    datasets_temp = []
-
-    for cat_info in categorias_info:
-        tamano = escalar_tamano_marcador(
-            cat_info['ventas'],
-            min_ventas,
-            max_ventas
-        )
-
-        datasets_temp.append({
-            'label': cat_info['label'],
             'data': [{
-                'x': cat_info['ingreso_real_pct'],
-                'y': cat_info['roi_pct']
+                'x': x,
+                'y': y
             }],
-            'backgroundColor': cat_info['color_canal'],
-            'borderColor': cat_info['color_canal'],
+            'backgroundColor': color,
+            'borderColor': color,
             'borderWidth': 2,
             'pointRadius': tamano,
             'pointHoverRadius': tamano + 3,
-            'pointStyle': 'crossRot',
-            '_tamano': tamano
-        })
-
-    datasets = sorted(datasets_temp, key=lambda d: d['_tamano'], reverse=False)
-
-    for ds in datasets:
-        del ds['_tamano']
+            'pointStyle': 'crossRot'
+        }
+        for label, x, y, color, tamano in zip(
+            df_datasets['label'].tolist(), df_datasets['ingreso_real_pct'].tolist(),
+            df_datasets['roi_pct'].tolist(), df_datasets['color_canal'].tolist(), tamanos[orden].tolist()
+        )
+    ]
 
-    # Estadísticas generales
-    total_ventas = sum(c['ventas'] for c in categorias_info)
-    total_ingreso_real = sum(c['ingreso_real'] for c in categorias_info)
-    total_costo_venta = sum(c['costo_venta'] for c in categorias_info)
+    # Estadísticas generales: los tres totales en una sola reducción
+    total_ventas, total_ingreso_real, total_costo_venta = (
+        df_metricas[['ventas_reales', 'ingreso_real', 'costo_venta']].sum().tolist()
+    )
     # CORREGIDO: Calcular porcentajes sobre totales, NO promedio de porcentajes
     ingreso_promedio = (total_ingreso_real / total_ventas * 100) if total_ventas > 0 else 0
     roi_promedio = (total_ingreso_real / total_costo_venta * 100) if total_costo_venta > 0 else 0
 
-    roi_max = max([c['roi_pct'] for c in categorias_info]) if categorias_info else 100
-    import math
+    roi_max = float(np.round(df_metricas['roi_pct'].to_numpy(), 2).max())
     eje_y_max = max(100, math.ceil(roi_max * 1.1 / 10) * 10)
 
+    # Conteo por zona con un solo bincount sobre el índice de zona de cada grupo
+    critico, eficiente, a_desarrollar, ideal = np.bincount(zona_idx, minlength=4).tolist()
+
     estadisticas = {
-        'total_combinaciones': len(categorias_info),
+        'total_combinaciones': len(df_categorias),
         'ventas_totales': total_ventas,
         'ingreso_real_total': total_ingreso_real,
         'ingreso_promedio': round(ingreso_promedio, 2),
         'roi_promedio': round(roi_promedio, 2),
-        'critico': sum(1 for c in categorias_info if c['zona'] == 'Crítico'),
-        'eficiente': sum(1 for c in categorias_info if c['zona'] == 'Eficiente'),
-        'a_desarrollar': sum(1 for c in categorias_info if c['zona'] == 'A Desarrollar'),
-        'ideal': sum(1 for c in categorias_info if c['zona'] == 'Ideal'),
+        'critico': critico,
+        'eficiente': eficiente,
+        'a_desarrollar': a_desarrollar,
+        'ideal': ideal,
         'eje_y_max': eje_y_max
     }
 
-    # Calcular el $ IR total por canal para ordenar
-    ingreso_real_por_canal = {}
-    for cat_info in categorias_info:
-        canal = cat_info['canal']
-        if canal not in ingreso_real_por_canal:
-            ingreso_real_por_canal[canal] = 0
-        ingreso_real_por_canal[canal] += cat_info['ingreso_real']
-
-    # Ordenar categorías
-    categorias_ordenadas = sorted(
-        categorias_info,
-        key=lambda x: (
-            -ingreso_real_por_canal[x['canal']],
-            -x['ingreso_real']
-        )
+    # Ordenar categorías por $ IR total del canal y luego por $ IR propio:
+    # el total por canal se difunde a cada grupo y se ordena una sola vez
+    categorias_ordenadas = (
+        df_categorias
+        .assign(canal_total=df_categorias.groupby('canal')['ingreso_real'].transform('sum'))
+        .sort_values(['canal_total', 'ingreso_real'], ascending=[False, False])
+        .drop(columns='canal_total')
+        .to_dict('records')
     )
 
     tiempo_fin = time.time()
-    print(f"✅ [MATRIZ CAT] Datos generados: {len(datasets)} combinaciones en {tiempo_fin - tiempo_inicio:.3f}s")
+    logger.info("✅ [MATRIZ CAT] Datos generados: %s combinaciones en %.3fs", len(datasets), tiempo_fin - tiempo_inicio)
 
     return {
         'datasets': datasets,
@@ -3,16 +3,20 @@
 Rutas del módulo de Radar Comercial
 """
 
-from flask import render_template, request, jsonify
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import render_template, request
 from radar_comercial.blueprint import bp
 from radar_comercial.services import (
     procesar_datos_radar,
     filtrar_productos,
     clasificar_ir,
     procesar_analisis_competencia,
-    procesar_datos_semanales
+    obtener_datos_semanales
 )
-from database import get_radar_comercial_datos_semanales
+from utils import respuesta_json
+
+logger = logging.getLogger(__name__)
 
 
 @bp.route("/radar-comercial", methods=["GET"])
@@ -27,25 +31,28 @@ def radar_comercial():
     - Shein
     """
     try:
-        print("INFO: [RADAR COMERCIAL] Cargando datos...")
-
-        # Procesar datos del radar
-        productos, estadisticas = procesar_datos_radar()
+        logger.info("[RADAR COMERCIAL] Cargando datos...")
 
-        # Procesar análisis de competencia
-        competencia = procesar_analisis_competencia()
+        # Datos del radar y análisis de competencia son independientes: se
+        # procesan en paralelo (el tiempo lo dominan las consultas a ClickHouse,
+        # que liberan el GIL mientras esperan la respuesta)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futuro_radar = executor.submit(procesar_datos_radar)
+            futuro_competencia = executor.submit(procesar_analisis_competencia)
+            productos, estadisticas = futuro_radar.result()
+            competencia = futuro_competencia.result()
 
         # Aplicar filtro de búsqueda si existe
         filtro_busqueda = request.args.get('buscar', '').strip()
         if filtro_busqueda:
             productos = filtrar_productos(productos, filtro_busqueda)
 
-        print(f"INFO: [RADAR COMERCIAL] Mostrando {len(productos)} productos")
-        print(f"INFO: [RADAR COMERCIAL] Análisis de competencia para {len(competencia)} SKUs")
+        logger.info("[RADAR COMERCIAL] Mostrando %d productos", len(productos))
+        logger.info("[RADAR COMERCIAL] Análisis de competencia para %d SKUs", len(competencia))
 
         return render_template(
             "radar_comercial.html",
-            productos=productos,
+            productos=productos.to_dict('records'),
             estadisticas=estadisticas,
             competencia=competencia,
             filtro_busqueda=filtro_busqueda,
@@ -54,9 +61,7 @@ def radar_comercial():
         )
 
     except Exception as e:
-        print(f"ERROR: [RADAR COMERCIAL] {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[RADAR COMERCIAL] %s", e)
 
         return render_template(
             "radar_comercial.html",
@@ -85,19 +90,19 @@ def radar_comercial_ajax():
         if filtro_busqueda:
             productos = filtrar_productos(productos, filtro_busqueda)
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
-            'productos': productos,
+            'productos': productos.to_dict('records'),
             'estadisticas': estadisticas,
             'total_resultados': len(productos)
         })
 
     except Exception as e:
-        print(f"ERROR: [RADAR COMERCIAL AJAX] {e}")
-        return jsonify({
+        logger.error("[RADAR COMERCIAL AJAX] %s", e)
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @bp.route("/radar-comercial-datos-semanales", methods=["GET"])
@@ -109,43 +114,25 @@ def radar_comercial_datos_semanales():
         # Obtener parámetros
         semana_num = request.args.get('semana', type=int)
 
-        print(f"INFO: [RADAR SEMANAL AJAX] Solicitando datos para semana {semana_num if semana_num else 'actual'}")
-
-        # Obtener datos semanales
-        df_semanal = get_radar_comercial_datos_semanales(semana_num=semana_num)
-
-        print(f"DEBUG: [RADAR AJAX] DataFrame recibido: {len(df_semanal)} filas")
-        if not df_semanal.empty:
-            print(f"DEBUG: [RADAR AJAX] Columnas: {df_semanal.columns.tolist()}")
-            print(f"DEBUG: [RADAR AJAX] Primeras 3 filas:\n{df_semanal.head(3)}")
-
-        if df_semanal.empty:
-            print(f"WARN: [RADAR AJAX] DataFrame vacío, retornando datos vacíos")
-            return jsonify({
-                'success': True,
-                'datos_semanales': {},
-                'semana_actual': semana_num if semana_num else 1
-            })
+        logger.info("[RADAR SEMANAL AJAX] Solicitando datos para semana %s", semana_num if semana_num else 'actual')
 
-        # Procesar datos para formato JSON
-        datos_procesados = procesar_datos_semanales(df_semanal)
+        # Obtener y procesar datos semanales (memorizados por semana)
+        datos_procesados = obtener_datos_semanales(semana_num)
 
-        print(f"DEBUG: [RADAR AJAX] Datos procesados: {len(datos_procesados)} SKUs")
-        if datos_procesados:
-            primer_sku = list(datos_procesados.keys())[0]
-            print(f"DEBUG: [RADAR AJAX] Ejemplo SKU {primer_sku}: {datos_procesados[primer_sku]}")
+        logger.debug("[RADAR AJAX] Datos procesados: %d SKUs", len(datos_procesados))
+        if datos_procesados and logger.isEnabledFor(logging.DEBUG):
+            primer_sku = next(iter(datos_procesados))
+            logger.debug("[RADAR AJAX] Ejemplo SKU %s: %s", primer_sku, datos_procesados[primer_sku])
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'datos_semanales': datos_procesados,
             'semana_actual': semana_num if semana_num else 1
         })
 
     except Exception as e:
-        print(f"ERROR: [RADAR SEMANAL AJAX] {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("[RADAR SEMANAL AJAX] %s", e)
+        return respuesta_json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
@@ -4,8 +4,36 @@ Servicios para el módulo de Radar Comercial
 Lógica de negocio para análisis de competencia y comparación de precios
 """
 
+import functools
+import itertools
+import logging
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
-from database import get_radar_comercial_data, get_analisis_competencia_ml
+from dateutil.relativedelta import relativedelta
+from config import MAZATLAN_TZ
+from database import (
+    get_radar_comercial_data,
+    get_analisis_competencia_ml,
+    get_radar_comercial_datos_semanales
+)
+from utils import cache_con_ttl, totales_por_cancelacion
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se reutilizan los datos procesados del radar entre requests
+# (la página, la búsqueda AJAX y los datos semanales no recalculan en ese lapso)
+RADAR_CACHE_TTL = 60
+
+# SKUs que se muestran en el filtro (frozenset: se construye una sola vez)
+TARGET_SKUS = frozenset([
+    '2000005', '9900157', '2000013', '9900021', '9900027',
+    '2000040', '2000020', '2000002', '2000026', '2000032', '9900023'
+])
+
+# Canales Ecommerce usados por defecto cuando no se seleccionan canales
+CANALES_ECOMMERCE = ('Mercado Libre', 'Doto', 'Yuhu', 'Aliexpress',
+                     'Coppel', 'Liverpool', 'Shein', 'CrediTienda', 'Walmart', 'TikTok Shop')
 
 
 def get_specific_skus_with_descriptions(df):
@@ -18,40 +46,36 @@ def get_specific_skus_with_descriptions(df):
     Returns:
         list: Lista de diccionarios con SKU y descripción
     """
-    # SKUs que queremos mostrar en el filtro
-    target_skus = ['2000005', '9900157', '2000013', '9900021', '9900027',
-                   '2000040', '2000020', '2000002', '2000026', '2000032', '9900023']
-
     try:
-        # Filtrar el dataframe para obtener solo estos SKUs
-        df_skus = df[df['sku'].isin(target_skus)].copy()
+        # Filtrar solo los SKUs del filtro y las dos columnas necesarias
+        # (solo se lee, no hace falta copiarlo)
+        df_skus = df.loc[df['sku'].isin(TARGET_SKUS), ['sku', 'descripcion']]
 
         if df_skus.empty:
-            print("DEBUG: No se encontraron los SKUs especificados en los datos")
+            logger.debug("No se encontraron los SKUs especificados en los datos")
             return []
 
-        # Obtener SKU y descripción únicos
-        skus_with_desc = df_skus.groupby('sku')['descripcion'].first().reset_index()
+        # SKU y primera descripción no nula de cada uno (una sola pasada de hash)
+        df_skus = df_skus.dropna(subset=['descripcion']).drop_duplicates('sku')
 
-        # Crear lista de diccionarios con SKU y descripción
-        skus_disponibles = []
-        for _, row in skus_with_desc.iterrows():
-            skus_disponibles.append({
-                'sku': row['sku'],
-                'descripcion': row['descripcion'][:60] + '...' if len(row['descripcion']) > 60 else row['descripcion']
-            })
+        # Recortar descripciones largas a 60 caracteres, vectorizado
+        descripcion = df_skus['descripcion'].astype(str)
+        df_skus = df_skus.assign(descripcion=descripcion.where(
+            descripcion.str.len() <= 60, descripcion.str.slice(0, 60) + '...'
+        ))
 
         # Ordenar por SKU
-        skus_disponibles.sort(key=lambda x: x['sku'])
+        skus_disponibles = df_skus.sort_values('sku').to_dict('records')
 
-        print(f"=== SKUs ESPECÍFICOS ENCONTRADOS ===")
-        for sku_info in skus_disponibles:
-            print(f"SKU: {sku_info['sku']} - {sku_info['descripcion']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== SKUs ESPECÍFICOS ENCONTRADOS ===")
+            for sku_info in skus_disponibles:
+                logger.debug("SKU: %s - %s", sku_info['sku'], sku_info['descripcion'])
 
         return skus_disponibles
 
     except Exception as e:
-        print(f"Error obteniendo SKUs específicos: {e}")
+        logger.error("Error obteniendo SKUs específicos: %s", e)
         return []
 
 
@@ -67,20 +91,18 @@ def calcular_indicadores(df_main, df_compare):
         list: Lista de diccionarios con los indicadores formateados
     """
     # Calcular valores del período principal
-    v_main = df_main["Total"].sum()
-    c_main = df_main[df_main["estado"] == "Cancelado"]["Total"].sum()
-    n_main = df_main[df_main["estado"] != "Cancelado"]["Total"].sum()
+    c_main, n_main = totales_por_cancelacion(df_main)
+    v_main = c_main + n_main
     p_main = (c_main / v_main * 100) if v_main else 0
-    t_main = (v_main / len(df_main)) if len(df_main) else 0
-    n_tx_main = len(df_main)
+    n_tx_main = len(df_main.index)
+    t_main = (v_main / n_tx_main) if n_tx_main else 0
 
     # Calcular valores del período de comparación
-    v_comp = df_compare["Total"].sum()
-    c_comp = df_compare[df_compare["estado"] == "Cancelado"]["Total"].sum()
-    n_comp = df_compare[df_compare["estado"] != "Cancelado"]["Total"].sum()
+    c_comp, n_comp = totales_por_cancelacion(df_compare)
+    v_comp = c_comp + n_comp
     p_comp = (c_comp / v_comp * 100) if v_comp else 0
-    t_comp = (v_comp / len(df_compare)) if len(df_compare) else 0
-    n_tx_comp = len(df_compare)
+    n_tx_comp = len(df_compare.index)
+    t_comp = (v_comp / n_tx_comp) if n_tx_comp else 0
 
     def formato(label, val_main, val_comp, tipo="$"):
         """Formatea un indicador normal (más es mejor)"""
@@ -135,6 +157,22 @@ def calcular_indicadores(df_main, df_compare):
     return indicadores
 
 
+@functools.lru_cache(maxsize=256)
+def parsear_fecha_dia(texto):
+    """
+    Convierte 'YYYY-MM-DD' a datetime localizado en Mazatlán (memorizado por
+    texto: los rangos del selector se repiten entre requests).
+
+    Args:
+        texto: Fecha en formato 'YYYY-MM-DD' (se ignoran espacios)
+
+    Returns:
+        datetime: Fecha a las 00:00 en MAZATLAN_TZ
+    """
+    # fromisoformat es un parser dedicado en C (strptime interpreta el formato en cada llamada)
+    return MAZATLAN_TZ.localize(datetime.fromisoformat(texto.strip()))
+
+
 def parsear_fechas_request(preset_main, preset_compare, main_range=None, compare_range=None):
     """
     Parsea las fechas desde los parámetros del request
@@ -160,15 +198,15 @@ def parsear_fechas_request(preset_main, preset_compare, main_range=None, compare
         f2 = hoy + timedelta(days=1)
     elif preset_main == "personalizado":
         if main_range:
-            if " to " in main_range:
+            f1_str, separador, f2_str = main_range.partition(" to ")
+            if separador:
                 # Rango de fechas (dos fechas)
-                f1_str, f2_str = main_range.split(" to ")
-                f1 = MAZATLAN_TZ.localize(datetime.strptime(f1_str.strip(), "%Y-%m-%d"))
-                f2_temp = MAZATLAN_TZ.localize(datetime.strptime(f2_str.strip(), "%Y-%m-%d"))
+                f1 = parsear_fecha_dia(f1_str)
+                f2_temp = parsear_fecha_dia(f2_str)
                 f2 = f2_temp + timedelta(days=1)
             else:
                 # Un solo día seleccionado
-                f1 = MAZATLAN_TZ.localize(datetime.strptime(main_range.strip(), "%Y-%m-%d"))
+                f1 = parsear_fecha_dia(main_range)
                 f2 = f1 + timedelta(days=1)
         else:
             raise ValueError("Rango personalizado inválido")
@@ -178,22 +216,23 @@ def parsear_fechas_request(preset_main, preset_compare, main_range=None, compare
     # Determinar fechas del período de comparación
     delta = f2 - f1
     if preset_compare == "anterior":
-        fc1 = (f1 - pd.DateOffset(months=1)).to_pydatetime()
+        # Mismo día del mes anterior (en hora local; se recorta a fin de mes)
+        fc1 = MAZATLAN_TZ.localize(f1.replace(tzinfo=None) - relativedelta(months=1))
         fc2 = fc1 + delta
     elif preset_compare == "anual":
         fc1 = f1.replace(year=f1.year - 1)
         fc2 = fc1 + delta
     elif preset_compare == "personalizado":
         if compare_range:
-            if " to " in compare_range:
+            fc1_str, separador, fc2_str = compare_range.partition(" to ")
+            if separador:
                 # Rango de fechas (dos fechas)
-                fc1_str, fc2_str = compare_range.split(" to ")
-                fc1 = MAZATLAN_TZ.localize(datetime.strptime(fc1_str.strip(), "%Y-%m-%d"))
-                fc2_temp = MAZATLAN_TZ.localize(datetime.strptime(fc2_str.strip(), "%Y-%m-%d"))
+                fc1 = parsear_fecha_dia(fc1_str)
+                fc2_temp = parsear_fecha_dia(fc2_str)
                 fc2 = fc2_temp + timedelta(days=1)
             else:
                 # Un solo día seleccionado
-                fc1 = MAZATLAN_TZ.localize(datetime.strptime(compare_range.strip(), "%Y-%m-%d"))
+                fc1 = parsear_fecha_dia(compare_range)
                 fc2 = fc1 + timedelta(days=1)
         else:
             fc2 = f1
@@ -205,6 +244,26 @@ def parsear_fechas_request(preset_main, preset_compare, main_range=None, compare
     return f1, f2, fc1, fc2
 
 
+def filtrar_por_valores(df, columna, valores):
+    """
+    Filtra df a las filas cuya columna está en valores. Si el filtro no
+    descarta nada (todos los valores presentes ya están permitidos y no hay
+    nulos) devuelve df tal cual, sin construir la máscara.
+
+    Args:
+        df: DataFrame a filtrar
+        columna: Nombre de la columna
+        valores: Conjunto (o lista) de valores permitidos
+
+    Returns:
+        DataFrame: df filtrado (o el mismo df si el filtro no aplica)
+    """
+    serie = df[columna]
+    if not serie.hasnans and set(serie.unique()) <= set(valores):
+        return df
+    return df[serie.isin(valores)]
+
+
 def aplicar_filtros(df_main, df_compare, channels=None, warehouses=None, skus=None):
     """
     Aplica filtros de canales, almacenes y SKUs a los DataFrames
@@ -221,179 +280,206 @@ def aplicar_filtros(df_main, df_compare, channels=None, warehouses=None, skus=No
     """
     # Si no hay canales seleccionados, usar Ecommerce por defecto
     if not channels:
-        canales_ecommerce = ['Mercado Libre', 'Doto', 'Yuhu', 'Aliexpress',
-                             'Coppel', 'Liverpool', 'Shein', 'CrediTienda', 'Walmart', 'TikTok Shop']
-        df_main = df_main[df_main["Channel"].isin(canales_ecommerce)]
-        df_compare = df_compare[df_compare["Channel"].isin(canales_ecommerce)]
-        selected_channels = canales_ecommerce
+        selected_channels = list(CANALES_ECOMMERCE)
     else:
-        df_main = df_main[df_main["Channel"].isin(channels)]
-        df_compare = df_compare[df_compare["Channel"].isin(channels)]
         selected_channels = channels
 
+    # Cada filtro se omite si ya cubre todos los valores del DataFrame
+    df_main = filtrar_por_valores(df_main, "Channel", selected_channels)
+    df_compare = filtrar_por_valores(df_compare, "Channel", selected_channels)
+
     # Aplicar filtros de warehouse y SKU si existen
     if warehouses:
-        df_main = df_main[df_main["Warehouse"].isin(warehouses)]
-        df_compare = df_compare[df_compare["Warehouse"].isin(warehouses)]
+        df_main = filtrar_por_valores(df_main, "Warehouse", warehouses)
+        df_compare = filtrar_por_valores(df_compare, "Warehouse", warehouses)
 
     if skus:
-        df_main = df_main[df_main["sku"].isin(skus)]
-        df_compare = df_compare[df_compare["sku"].isin(skus)]
+        df_main = filtrar_por_valores(df_main, "sku", skus)
+        df_compare = filtrar_por_valores(df_compare, "sku", skus)
 
     return df_main, df_compare, selected_channels
 
 
-def procesar_datos_radar():
+# Canales del radar (sufijo de las columnas de la vista) y su nombre para display
+CANALES_RADAR = ['ML', 'CT', 'WM', 'SH', 'TK', 'LP', 'YH']
+NOMBRES_CANALES_RADAR = {
+    'ML': 'Mercado Libre',
+    'CT': 'CrediTienda',
+    'WM': 'Walmart',
+    'SH': 'Shein',
+    'TK': 'TikTok Shop',
+    'LP': 'Liverpool',
+    'YH': 'Yuhu'
+}
+
+# Umbrales de IR (>=) y la clase CSS de cada intervalo
+UMBRALES_IR = [-np.inf, 10, 20, 30, np.inf]
+CLASES_IR = ['bajo', 'regular', 'bueno', 'excelente']
+
+
+def valores_o_none(serie):
     """
-    Obtiene y procesa los datos del radar comercial para la visualización
+    Convierte una serie a objetos Python (float/int) con None en lugar de NaN,
+    para que to_dict('records') entregue los mismos valores que el template
+    y el JSON esperan.
+
+    Args:
+        serie: pd.Series numérica (puede tener NaN / pd.NA)
 
     Returns:
-        tuple: (productos_procesados, estadisticas_generales)
+        pd.Series: Serie de tipo object con None en los faltantes
     """
-    # Obtener datos de ClickHouse
-    df = get_radar_comercial_data()
+    return serie.astype(object).where(serie.notna(), None)
 
-    if df.empty:
-        return [], {}
 
-    productos = []
+def convertir_porcentajes(serie):
+    """
+    Convierte una columna de porcentajes en texto ('25.3%') a float.
+    Nulos, vacíos o valores no numéricos quedan como NaN.
 
-    for _, row in df.iterrows():
-        # Extraer datos básicos
-        producto = {
-            'sku': row['sku'],
-            'descripcion': row['descripcion']
-        }
+    Args:
+        serie: pd.Series con porcentajes como texto (o números)
 
-        # Procesar cada canal
-        canales = ['ML', 'CT', 'WM', 'SH', 'TK', 'LP', 'YH']
-        nombres_canales = {
-            'ML': 'Mercado Libre',
-            'CT': 'CrediTienda',
-            'WM': 'Walmart',
-            'SH': 'Shein',
-            'TK': 'TikTok Shop',
-            'LP': 'Liverpool',
-            'YH': 'Yuhu'
-        }
+    Returns:
+        pd.Series: Serie float64 con el valor numérico del porcentaje
+    """
+    # Columna ya numérica: no hay texto que limpiar (0 cuenta como sin dato)
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        valores = serie.astype(float)
+        return valores.where(valores.ne(0))
 
-        precios = []
-        irs = []
+    con_valor = serie.notna() & serie.ne('') & serie.ne(0)
+    texto = serie[con_valor].astype(str).str.replace('%', '', regex=False).str.strip()
+    return pd.to_numeric(texto, errors='coerce').reindex(serie.index)
 
-        for canal in canales:
-            precio = row.get(f'precio_{canal}')
-            ir_str = row.get(f'%IR_{canal}')
-            dias_precio = row.get(f'dias_precio_{canal}')
-            inv_asignado = row.get(f'inv_asignado_{canal}')
 
-            # Procesar precio
-            if pd.notna(precio):
-                producto[f'precio_{canal}'] = float(precio)
-                precios.append(float(precio))
-            else:
-                producto[f'precio_{canal}'] = None
-
-            # Procesar IR (viene como string con %)
-            if pd.notna(ir_str) and ir_str:
-                try:
-                    ir_value = float(str(ir_str).replace('%', '').strip())
-                    producto[f'ir_{canal}'] = ir_value
-                    producto[f'ir_{canal}_str'] = f"{ir_value:.1f}%"
-                    irs.append(ir_value)
-                except:
-                    producto[f'ir_{canal}'] = None
-                    producto[f'ir_{canal}_str'] = 'N/A'
-            else:
-                producto[f'ir_{canal}'] = None
-                producto[f'ir_{canal}_str'] = 'N/A'
+@cache_con_ttl(RADAR_CACHE_TTL, cachear_si=lambda resultado: not resultado[0].empty)
+def procesar_datos_radar():
+    """
+    Obtiene y procesa los datos del radar comercial para la visualización.
+    Resultado memorizado por RADAR_CACHE_TTL segundos (no modificarlo).
 
-            # Procesar días de precio activo
-            if pd.notna(dias_precio):
-                producto[f'dias_precio_{canal}'] = int(dias_precio)
-            else:
-                producto[f'dias_precio_{canal}'] = None
+    Todas las columnas se calculan vectorizadas y los productos se entregan
+    como DataFrame (una columna por campo); quien los muestre los convierte
+    con to_dict('records') solo para las filas que envía.
 
-            # Procesar inventario asignado
-            if pd.notna(inv_asignado):
-                producto[f'inv_asignado_{canal}'] = float(inv_asignado)
-            else:
-                producto[f'inv_asignado_{canal}'] = 0
-
-            # Nombre del canal para display
-            producto[f'nombre_{canal}'] = nombres_canales[canal]
-
-        # Procesar conversión de Mercado Libre (solo para ML)
-        conv_ml_str = row.get('%Conv_ML')
-        if pd.notna(conv_ml_str) and conv_ml_str:
-            try:
-                producto['conv_ML_str'] = conv_ml_str
-                # Extraer valor numérico para análisis
-                conv_value = float(str(conv_ml_str).replace('%', '').strip())
-                producto['conv_ML'] = conv_value
-            except:
-                producto['conv_ML_str'] = 'N/A'
-                producto['conv_ML'] = None
-        else:
-            producto['conv_ML_str'] = 'N/A'
-            producto['conv_ML'] = None
-
-        # Calcular estadísticas del producto
-        if precios:
-            producto['precio_min'] = min(precios)
-            producto['precio_max'] = max(precios)
-            producto['precio_promedio'] = sum(precios) / len(precios)
-            producto['diferencia_precio'] = producto['precio_max'] - producto['precio_min']
-            producto['diferencia_precio_pct'] = (producto['diferencia_precio'] / producto['precio_min'] * 100) if producto['precio_min'] > 0 else 0
-        else:
-            producto['precio_min'] = None
-            producto['precio_max'] = None
-            producto['precio_promedio'] = None
-            producto['diferencia_precio'] = None
-            producto['diferencia_precio_pct'] = None
-
-        if irs:
-            producto['ir_promedio'] = sum(irs) / len(irs)
-            producto['ir_min'] = min(irs)
-            producto['ir_max'] = max(irs)
-        else:
-            producto['ir_promedio'] = None
-            producto['ir_min'] = None
-            producto['ir_max'] = None
+    Returns:
+        tuple: (df_productos, estadisticas_generales)
+    """
+    # Obtener datos de ClickHouse
+    df = get_radar_comercial_data()
 
-        # Contar presencia en canales
-        producto['canales_activos'] = sum(1 for p in [producto[f'precio_{c}'] for c in canales] if p is not None)
+    if df.empty:
+        return pd.DataFrame(), {}
 
-        productos.append(producto)
+    vacia = pd.Series(np.nan, index=df.index)
 
-    # Calcular estadísticas generales
-    stats = obtener_estadisticas_generales(productos)
+    def columna(nombre):
+        return df[nombre] if nombre in df.columns else vacia
 
-    return productos, stats
+    # Extraer datos básicos
+    columnas = {
+        'sku': df['sku'],
+        'descripcion': df['descripcion']
+    }
+    precios = {}
+    irs = {}
+
+    # Procesar cada canal
+    for canal in CANALES_RADAR:
+        precio = pd.to_numeric(columna(f'precio_{canal}'), errors='coerce').astype(float)
+        ir_valor = convertir_porcentajes(columna(f'%IR_{canal}'))
+        dias_precio = pd.to_numeric(columna(f'dias_precio_{canal}'), errors='coerce')
+        inv_asignado = pd.to_numeric(columna(f'inv_asignado_{canal}'), errors='coerce').astype(float)
+
+        precios[canal] = precio
+        irs[canal] = ir_valor
+
+        columnas[f'precio_{canal}'] = valores_o_none(precio)
+        # IR (viene como string con %)
+        columnas[f'ir_{canal}'] = valores_o_none(ir_valor)
+        columnas[f'ir_{canal}_str'] = ir_valor.map('{:.1f}%'.format, na_action='ignore').fillna('N/A')
+        columnas[f'ir_{canal}_clase'] = clasificar_ir_series(ir_valor)
+        # Días de precio activo
+        columnas[f'dias_precio_{canal}'] = valores_o_none(np.trunc(dias_precio).astype('Int64'))
+        # Inventario asignado (0 si no hay dato)
+        columnas[f'inv_asignado_{canal}'] = inv_asignado.astype(object).where(inv_asignado.notna(), 0)
+        # Nombre del canal para display
+        columnas[f'nombre_{canal}'] = NOMBRES_CANALES_RADAR[canal]
+
+    # Conversión de Mercado Libre (solo para ML): se conserva el texto original
+    conv_ml_str = columna('%Conv_ML')
+    conv_ml = convertir_porcentajes(conv_ml_str)
+    columnas['conv_ML_str'] = conv_ml_str.astype(object).where(conv_ml.notna(), 'N/A')
+    columnas['conv_ML'] = valores_o_none(conv_ml)
+
+    # Estadísticas del producto sobre los canales con precio / IR
+    df_precios = pd.DataFrame(precios)
+    precio_min = df_precios.min(axis=1)
+    precio_max = df_precios.max(axis=1)
+    diferencia_precio = precio_max - precio_min
+    diferencia_precio_pct = (diferencia_precio / precio_min.where(precio_min > 0) * 100).astype(object)
+    diferencia_precio_pct[precio_min.notna() & ~(precio_min > 0)] = 0
+
+    columnas['precio_min'] = valores_o_none(precio_min)
+    columnas['precio_max'] = valores_o_none(precio_max)
+    columnas['precio_promedio'] = valores_o_none(df_precios.mean(axis=1))
+    columnas['diferencia_precio'] = valores_o_none(diferencia_precio)
+    columnas['diferencia_precio_pct'] = diferencia_precio_pct.where(precio_min.notna(), None)
+
+    df_irs = pd.DataFrame(irs)
+    ir_promedio = df_irs.mean(axis=1)
+    columnas['ir_promedio'] = valores_o_none(ir_promedio)
+    columnas['ir_clase'] = clasificar_ir_series(ir_promedio)
+    columnas['ir_min'] = valores_o_none(df_irs.min(axis=1))
+    columnas['ir_max'] = valores_o_none(df_irs.max(axis=1))
+
+    # Contar presencia en canales
+    columnas['canales_activos'] = df_precios.notna().sum(axis=1)
+
+    df_productos = pd.DataFrame(columnas)
+
+    # Calcular estadísticas generales sobre el DataFrame (reducciones vectorizadas)
+    stats = obtener_estadisticas_generales(df_productos)
+
+    return df_productos, stats
 
 
 def filtrar_productos(productos, filtro_texto=None):
     """
-    Filtra la lista de productos según texto de búsqueda
+    Filtra los productos según texto de búsqueda (sin distinguir mayúsculas)
+
+    La búsqueda usa los kernels de texto de pandas con regex=False
+    (búsqueda literal de subcadena) sobre las columnas sku y descripción.
 
     Args:
-        productos: Lista de productos procesados
+        productos: Lista de productos procesados (o DataFrame de productos)
         filtro_texto: Texto para buscar en SKU o descripción
 
     Returns:
-        list: Lista filtrada de productos
+        list | DataFrame: Productos filtrados, del mismo tipo que la entrada
     """
-    if not productos:
-        return []
+    es_dataframe = isinstance(productos, pd.DataFrame)
+    if (productos.empty if es_dataframe else not productos):
+        return productos if es_dataframe else []
 
     if not filtro_texto:
         return productos
 
     filtro_texto = filtro_texto.lower()
-    return [
-        p for p in productos
-        if filtro_texto in str(p['sku']).lower() or
-           filtro_texto in str(p['descripcion']).lower()
-    ]
+    if es_dataframe:
+        df = productos
+    else:
+        df = pd.DataFrame.from_records(productos, columns=['sku', 'descripcion'])
+
+    coincide = (
+        df['sku'].astype(str).str.lower().str.contains(filtro_texto, regex=False) |
+        df['descripcion'].astype(str).str.lower().str.contains(filtro_texto, regex=False)
+    )
+
+    if es_dataframe:
+        return productos[coincide]
+    return list(itertools.compress(productos, coincide.tolist()))
 
 
 def obtener_estadisticas_generales(productos):
@@ -401,12 +487,16 @@ def obtener_estadisticas_generales(productos):
     Calcula estadísticas generales del radar comercial
 
     Args:
-        productos: Lista de productos procesados
+        productos: DataFrame de productos procesados (o la lista de dicts
+                   equivalente, que se convierte a DataFrame)
 
     Returns:
         dict: Diccionario con estadísticas generales
     """
-    if not productos:
+    if not isinstance(productos, pd.DataFrame):
+        productos = pd.DataFrame(productos)
+
+    if productos.empty:
         return {
             'total_productos': 0,
             'productos_en_ml': 0,
@@ -417,25 +507,47 @@ def obtener_estadisticas_generales(productos):
             'ir_promedio_general': 0
         }
 
+    # Presencia por canal en una sola reducción sobre las columnas de precio
+    columnas_precio = [f'precio_{canal}' for canal in ('ML', 'CT', 'WM', 'SH')]
+    presencia = productos.reindex(columns=columnas_precio).notna().sum()
+
     stats = {
         'total_productos': len(productos),
-        'productos_en_ml': sum(1 for p in productos if p.get('precio_ML') is not None),
-        'productos_en_ct': sum(1 for p in productos if p.get('precio_CT') is not None),
-        'productos_en_wm': sum(1 for p in productos if p.get('precio_WM') is not None),
-        'productos_en_sh': sum(1 for p in productos if p.get('precio_SH') is not None),
-        'productos_multicanal': sum(1 for p in productos if p.get('canales_activos', 0) > 1)
+        'productos_en_ml': int(presencia['precio_ML']),
+        'productos_en_ct': int(presencia['precio_CT']),
+        'productos_en_wm': int(presencia['precio_WM']),
+        'productos_en_sh': int(presencia['precio_SH']),
+        'productos_multicanal': int((productos['canales_activos'] > 1).sum()) if 'canales_activos' in productos.columns else 0
     }
 
     # IR promedio general
-    irs_validos = [p['ir_promedio'] for p in productos if p.get('ir_promedio') is not None]
-    stats['ir_promedio_general'] = sum(irs_validos) / len(irs_validos) if irs_validos else 0
+    irs_validos = pd.to_numeric(productos['ir_promedio'], errors='coerce') if 'ir_promedio' in productos.columns else pd.Series(dtype=float)
+    stats['ir_promedio_general'] = float(irs_validos.mean()) if irs_validos.notna().any() else 0
 
     return stats
 
 
+def clasificar_ir_series(serie):
+    """
+    Clasifica una Serie de IR en las mismas clases que clasificar_ir,
+    en una sola pasada con pd.cut (intervalos cerrados por la izquierda,
+    equivalentes a los umbrales >= 10 / 20 / 30).
+
+    Args:
+        serie: Serie con valores de IR (0-100); NaN/None = sin datos
+
+    Returns:
+        pd.Series: Clase CSS por fila (excelente, bueno, regular, bajo, sin-datos)
+    """
+    valores = pd.to_numeric(serie, errors='coerce')
+    clases = pd.cut(valores, bins=UMBRALES_IR, labels=CLASES_IR, right=False)
+    return clases.astype(object).where(valores.notna(), 'sin-datos')
+
+
 def clasificar_ir(ir_value):
     """
-    Clasifica el IR en categorías para colorear
+    Clasifica el IR en categorías para colorear (versión escalar;
+    para columnas completas usar clasificar_ir_series)
 
     Args:
         ir_value: Valor de IR (0-100)
@@ -456,12 +568,15 @@ def clasificar_ir(ir_value):
         return 'bajo'
 
 
+@cache_con_ttl(RADAR_CACHE_TTL, cachear_si=bool)
 def procesar_analisis_competencia():
     """
     Obtiene y procesa el análisis de competencia de Mercado Libre
     Formato: tabla horizontal con Loomber + top 3 competidores por score
+    Resultado memorizado por RADAR_CACHE_TTL segundos (no modificarlo).
 
-    Posiciones basadas en score_competitividad_total (mayor score = 1er lugar)
+    Posiciones basadas en score_competitividad_total (mayor score = 1er lugar).
+    El ranking de todos los SKUs se arma con un solo ordenamiento vectorizado.
 
     Returns:
         list: Lista de diccionarios con SKU, posición Loomber, precio Loomber,
@@ -472,112 +587,100 @@ def procesar_analisis_competencia():
     if df.empty:
         return []
 
-    # Obtener datos de radar para precios de Loomber
+    # Obtener datos de radar para precios de Loomber: precio ML por SKU
+    # (primer registro de cada SKU) en un dict para búsquedas O(1). Solo se
+    # guardan precios no nulos, ya como float: la búsqueda por SKU no necesita
+    # ni pd.notna ni conversión
     df_radar = get_radar_comercial_data()
-
-    # Lista para almacenar filas de la tabla
+    precio_ml_radar = {}
+    if not df_radar.empty and 'precio_ML' in df_radar.columns:
+        df_precio_ml = df_radar.drop_duplicates('sku')
+        df_precio_ml = df_precio_ml[df_precio_ml['precio_ML'].notna()]
+        precio_ml_radar = dict(zip(
+            df_precio_ml['sku'].tolist(), df_precio_ml['precio_ML'].astype(float).tolist()
+        ))
+
+    # Orden de aparición y producto (primera fila) de cada SKU
+    primeras = df.dropna(subset=['sku']).drop_duplicates('sku')
+    skus = primeras['sku'].tolist()
+    productos = dict(zip(skus, primeras['producto'].tolist()))
+
+    # Proveedores con precio válido de todos los SKUs a la vez
+    # IMPORTANTE: Cuando Loomber aparece en la tabla, ESE es nuestro dato con score
+    validos = df[df['precio'].notna() & (df['precio'] > 0) & df['sku'].notna()]
+    score = validos['score_competitividad_total'].astype(float)
+    proveedores = pd.DataFrame({
+        'sku': validos['sku'],
+        'nombre': validos['nombre_proveedor'],
+        'precio': validos['precio'].astype(float),
+        'url': validos['url'].astype(object).where(validos['url'].notna(), None),
+        'es_loomber': validos['nombre_proveedor'].str.strip().str.lower().eq('loomber'),
+        'score_total': score.astype(object).where(score.notna(), 0),
+        '_score': score.fillna(0)
+    })
+
+    # Si Loomber NO aparece en la tabla, usar el precio del radar con score 0
+    # (va después de los proveedores de la tabla de su SKU)
+    skus_con_loomber = set(proveedores.loc[proveedores['es_loomber'], 'sku'])
+    filas_radar = [
+        {'sku': sku, 'nombre': 'Loomber', 'precio': precio_ml_radar[sku], 'url': None,
+         'es_loomber': True, 'score_total': 0, '_score': 0.0}
+        for sku in skus
+        if sku not in skus_con_loomber and sku in precio_ml_radar
+    ]
+    if filas_radar:
+        proveedores = pd.concat([proveedores, pd.DataFrame(filas_radar)], ignore_index=True)
+
+    # Ordenar por SKU (orden de aparición) y score_total de mayor a menor; los
+    # empates conservan el orden original. Mayor score = 1er lugar = más competitivo
+    orden_sku = {sku: i for i, sku in enumerate(skus)}
+    proveedores = proveedores.assign(
+        _orden_sku=proveedores['sku'].map(orden_sku),
+        _pos=np.arange(len(proveedores))
+    ).sort_values(['_orden_sku', '_score', '_pos'], ascending=[True, False, True])
+
+    # Asignar posiciones dentro de cada SKU (1er lugar = mayor score)
+    proveedores['posicion'] = proveedores.groupby('sku', sort=False).cumcount() + 1
+
+    # Loomber: su primera aparición en el ranking de cada SKU
+    loomber = proveedores[proveedores['es_loomber']].drop_duplicates('sku')
+    loomber_por_sku = dict(zip(
+        loomber['sku'].tolist(),
+        zip(loomber['precio'].tolist(), loomber['posicion'].tolist(), loomber['url'].tolist())
+    ))
+
+    # Top 3 competidores por score (excluyendo Loomber) de cada SKU
+    competidores = proveedores[~proveedores['es_loomber']]
+    competidores = competidores[competidores.groupby('sku', sort=False).cumcount() < 3]
+    competidores_por_sku = {}
+    for sku, nombre, precio, posicion, url, score_total in zip(
+        competidores['sku'].tolist(), competidores['nombre'].tolist(), competidores['precio'].tolist(),
+        competidores['posicion'].tolist(), competidores['url'].tolist(), competidores['score_total'].tolist()
+    ):
+        competidores_por_sku.setdefault(sku, []).append({
+            'nombre': nombre,
+            'precio': precio,
+            'posicion': posicion,
+            'url': url,
+            'score_total': score_total
+        })
+
+    # Construir filas de la tabla; si no hay datos de Loomber (ni en tabla ni
+    # en radar) el SKU se omite
     tabla_competencia = []
-
-    for sku in df['sku'].unique():
-        df_sku = df[df['sku'] == sku].copy()
-
-        if df_sku.empty:
-            continue
-
-        # Información del producto
-        primera_fila = df_sku.iloc[0]
-        producto = primera_fila['producto']
-
-        # Crear lista con todos los proveedores (incluyendo Loomber si aparece)
-        # IMPORTANTE: Cuando Loomber aparece en la tabla, ESE es nuestro dato con score
-        todos_proveedores = []
-        loomber_encontrado_en_tabla = False
-
-        # Procesar todos los proveedores de la tabla de competencia
-        for _, row in df_sku.iterrows():
-            if pd.notna(row['precio']) and row['precio'] > 0:
-                score = row['score_competitividad_total']
-                if pd.notna(score):
-                    score = float(score)
-                else:
-                    score = 0
-
-                es_loomber = row['nombre_proveedor'].strip().lower() == 'loomber'
-
-                if es_loomber:
-                    loomber_encontrado_en_tabla = True
-
-                todos_proveedores.append({
-                    'nombre': row['nombre_proveedor'],
-                    'precio': float(row['precio']),
-                    'url': row['url'] if pd.notna(row['url']) else None,
-                    'es_loomber': es_loomber,
-                    'score_total': score
-                })
-
-        # Si Loomber NO aparece en la tabla, usar el precio del radar con score 0
-        if not loomber_encontrado_en_tabla:
-            precio_loomber_radar = None
-            if not df_radar.empty:
-                df_loomber = df_radar[df_radar['sku'] == sku]
-                if not df_loomber.empty:
-                    precio_ml = df_loomber.iloc[0].get('precio_ML')
-                    if pd.notna(precio_ml):
-                        precio_loomber_radar = float(precio_ml)
-
-            # Si encontramos precio en el radar, agregarlo
-            if precio_loomber_radar is not None:
-                todos_proveedores.append({
-                    'nombre': 'Loomber',
-                    'precio': precio_loomber_radar,
-                    'url': None,
-                    'es_loomber': True,
-                    'score_total': 0
-                })
-
-        # Si no hay datos de Loomber (ni en tabla ni en radar), saltar este SKU
-        if not any(p['es_loomber'] for p in todos_proveedores):
+    for sku in skus:
+        if sku not in loomber_por_sku:
             continue
 
-        # Ordenar todos por score_total (mayor a menor) para determinar posiciones
-        # Mayor score = 1er lugar = más competitivo
-        todos_proveedores.sort(key=lambda x: x['score_total'], reverse=True)
-
-        # Asignar posiciones (1er lugar = mayor score)
-        for idx, proveedor in enumerate(todos_proveedores, start=1):
-            proveedor['posicion'] = idx
-
-        # Encontrar posición de Loomber
-        loomber_data = next((p for p in todos_proveedores if p['es_loomber']), None)
-
-        if not loomber_data:
-            continue
-
-        # Obtener top 3 competidores por score (excluyendo Loomber)
-        competidores = [p for p in todos_proveedores if not p['es_loomber']]
-        top_3_competidores = competidores[:3]  # Los 3 con mayor score
-
-        # Construir fila de la tabla
-        fila = {
+        loomber_precio, loomber_posicion, loomber_url = loomber_por_sku[sku]
+        tabla_competencia.append({
             'sku': sku,
-            'producto': producto,
-            'loomber_precio': loomber_data['precio'],
-            'loomber_posicion': loomber_data['posicion'],
-            'loomber_url': loomber_data.get('url'),
-            'competidores': []
-        }
-
-        # Agregar competidores (máximo 3)
-        for comp in top_3_competidores:
-            fila['competidores'].append({
-                'nombre': comp['nombre'],
-                'precio': comp['precio'],
-                'posicion': comp['posicion'],
-                'url': comp['url'],
-                'score_total': comp['score_total']
-            })
-
-        tabla_competencia.append(fila)
+            'producto': productos[sku],
+            'loomber_precio': loomber_precio,
+            'loomber_posicion': loomber_posicion,
+            'loomber_url': loomber_url,
+            'competidores': competidores_por_sku.get(sku, [])
+        })
 
     return tabla_competencia
 
@@ -593,12 +696,13 @@ def procesar_datos_semanales(df_semanal):
         dict: Diccionario con estructura {sku: {canal: {inv, ventas}}}
     """
     if df_semanal.empty:
-        print("WARN: [PROCESAR SEMANAL] DataFrame vacío")
+        logger.warning("[PROCESAR SEMANAL] DataFrame vacío")
         return {}
 
-    print(f"INFO: [PROCESAR SEMANAL] Procesando {len(df_semanal)} registros")
-    print(f"DEBUG: [PROCESAR SEMANAL] SKUs únicos: {df_semanal['sku'].nunique()}")
-    print(f"DEBUG: [PROCESAR SEMANAL] Canales únicos: {df_semanal['canal'].unique()}")
+    logger.info("[PROCESAR SEMANAL] Procesando %d registros", len(df_semanal))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[PROCESAR SEMANAL] SKUs únicos: %d", df_semanal['sku'].nunique())
+        logger.debug("[PROCESAR SEMANAL] Canales únicos: %s", df_semanal['canal'].unique())
 
     # Mapeo de nombres de canales a códigos
     mapeo_canales = {
@@ -611,27 +715,52 @@ def procesar_datos_semanales(df_semanal):
         'Yuhu': 'YH'
     }
 
+    # Columnas preparadas de forma vectorizada: código del canal y montos
+    # como float (0 si no hay dato)
+    canal_codigo = df_semanal['canal'].map(mapeo_canales).fillna(df_semanal['canal'])
+    inv_asignado = pd.to_numeric(df_semanal['inv_asignado_semana'], errors='coerce').astype(float)
+    ventas = pd.to_numeric(df_semanal['ventas_semana'], errors='coerce').astype(float)
+    inv_asignado = inv_asignado.astype(object).where(inv_asignado.notna(), 0)
+    ventas = ventas.astype(object).where(ventas.notna(), 0)
+
+    # Un solo recorrido sobre las columnas ya convertidas (sin iterrows);
+    # si un SKU-canal se repite, el último registro gana
     datos_procesados = {}
+    for sku, canal, inv, venta in zip(
+        df_semanal['sku'].tolist(), canal_codigo.tolist(), inv_asignado.tolist(), ventas.tolist()
+    ):
+        datos_procesados.setdefault(sku, {})[canal] = {
+            'inv': inv,
+            'ventas': venta
+        }
+
+    logger.info("[PROCESAR SEMANAL] Datos procesados para %d SKUs", len(datos_procesados))
 
-    for idx, row in df_semanal.iterrows():
-        sku = row['sku']
-        canal_nombre = row['canal']
-        inv_asignado = float(row['inv_asignado_semana']) if pd.notna(row['inv_asignado_semana']) else 0
-        ventas = float(row['ventas_semana']) if pd.notna(row['ventas_semana']) else 0
+    return datos_procesados
 
-        # Obtener código del canal
-        canal_codigo = mapeo_canales.get(canal_nombre, canal_nombre)
 
-        # Inicializar diccionario para el SKU si no existe
-        if sku not in datos_procesados:
-            datos_procesados[sku] = {}
+@cache_con_ttl(RADAR_CACHE_TTL, cachear_si=bool)
+def obtener_datos_semanales(semana_num=None):
+    """
+    Obtiene y procesa los datos semanales de inventario y ventas de una semana.
+    Resultado memorizado por semana durante RADAR_CACHE_TTL segundos.
 
-        # Agregar datos del canal
-        datos_procesados[sku][canal_codigo] = {
-            'inv': inv_asignado,
-            'ventas': ventas
-        }
+    Args:
+        semana_num: Número de semana (None para la actual)
+
+    Returns:
+        dict: {sku: {canal: {inv, ventas}}} (vacío si no hay datos)
+    """
+    df_semanal = get_radar_comercial_datos_semanales(semana_num=semana_num)
 
-    print(f"INFO: [PROCESAR SEMANAL] Datos procesados para {len(datos_procesados)} SKUs")
+    logger.debug("[RADAR AJAX] DataFrame recibido: %d filas", len(df_semanal))
 
-    return datos_procesados
+    if df_semanal.empty:
+        logger.warning("[RADAR AJAX] DataFrame vacío, retornando datos vacíos")
+        return {}
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[RADAR AJAX] Columnas: %s", df_semanal.columns.tolist())
+        logger.debug("[RADAR AJAX] Primeras 3 filas:\n%s", df_semanal.head(3))
+
+    return procesar_datos_semanales(df_semanal)
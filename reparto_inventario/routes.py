@@ -4,57 +4,322 @@ Rutas del módulo de Reparto de Inventario
 Vista consultiva para encargados de canal
 """
 
-from flask import render_template, jsonify, request
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import render_template, request
 from reparto_inventario import bp
 from database import (
-    get_db_connection,
+    COLUMNAS_CUPOS,
     get_distribucion_semanal_inventario,
+    obtener_cupos_manuales_originales,
     calcular_asignacion_semanal_secuencial
 )
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from utils import respuesta_json, respuesta_json_streaming
 
+logger = logging.getLogger(__name__)
 
-def obtener_cupos_manuales_originales(mes):
+# Valores derivados de la distribución de cada mes, ligados al DataFrame
+# (memorizado en database) del que se calcularon: mes -> (df, valor).
+# Ver memorizar_por_distribucion
+LISTAS_DISPONIBLES = {}
+METRICAS_POR_CANAL = {}
+DISTRIBUCION_ORDENADA = {}
+SEMANAS_CONSOLIDADAS = {}
+GRUPOS_REPARTO = {}
+TEXTO_BUSQUEDA = {}
+
+# Separador entre SKU y descripción en el texto de búsqueda
+SEPARADOR_BUSQUEDA = '\x00'
+
+# Estados de cumplimiento en orden de evaluación (ver calcular_cumplimiento_estado)
+ESTADOS_CUMPLIMIENTO = ['sobre-venta', 'cumplido', 'parcial', 'bajo']
+
+METRICAS_VACIAS = {
+    'total_asignado': 0,
+    'total_vendido': 0,
+    'cumplimiento_general': 0,
+    'inventario_restante': 0,
+    'skus_totales': 0
+}
+
+
+def memorizar_por_distribucion(memo, mes, df_resultado, calcular):
     """
-    Consulta directa a la tabla Silver.Distribucion_Mensual_Canal_Manual
-    para obtener los valores de cupo_manual originales (solo para mostrar en UI)
+    Devuelve calcular(df_resultado) calculándolo una vez por DataFrame:
+    mientras la distribución memorizada del mes sea el mismo objeto, los
+    requests siguientes reutilizan el valor; si se recalcula o se invalida,
+    el DataFrame nuevo provoca un cálculo nuevo.
+
+    Args:
+        memo: dict del módulo donde se guarda mes -> (df, valor)
+        mes: Nombre del mes (ej: 'Diciembre 2025') u otra clave por mes
+        df_resultado: DataFrame memorizado (la distribución del mes o uno derivado)
+        calcular: Función df -> valor (el valor no debe modificarse)
 
     Returns:
-        dict: Diccionario con clave (sku, canal) y valor cupo_manual
+        Valor calculado para df_resultado
     """
-    try:
-        client = get_db_connection()
-
-        # Convertir nombre del mes a formato de la tabla (ej: "Diciembre 2025")
-        query = f"""
-        SELECT
-            sku,
-            Channel,
-            cupo_manual
-        FROM Silver.Distribucion_Mensual_Canal_Manual
-        WHERE mes = '{mes}'
-          AND activo = 1
-        """
-
-        result = client.query(query)
-
-        # Crear diccionario con clave (sku, canal) -> cupo_manual
-        cupos_dict = {}
-        for row in result.result_rows:
-            sku_val = row[0]
-            canal_val = row[1]
-            cupo_manual = float(row[2])
-            cupos_dict[(sku_val, canal_val)] = cupo_manual
-
-        print(f"OK: [CUPOS MANUALES] Cargados {len(cupos_dict)} registros de cupos manuales para {mes}")
-        return cupos_dict
+    entrada = memo.get(mes)
+    if entrada is None or entrada[0] is not df_resultado:
+        entrada = (df_resultado, calcular(df_resultado))
+        memo[mes] = entrada
+    return entrada[1]
 
-    except Exception as e:
-        print(f"ERROR: [CUPOS MANUALES] Error obteniendo cupos manuales: {e}")
-        import traceback
-        traceback.print_exc()
-        return {}
+
+def obtener_canales_y_skus(mes, df_resultado):
+    """
+    Listas ordenadas de canales y SKUs de la distribución del mes
+    (memorizadas por DataFrame)
+
+    Returns:
+        tuple: (canales_disponibles, skus_disponibles)
+    """
+    return memorizar_por_distribucion(LISTAS_DISPONIBLES, mes, df_resultado, lambda df: (
+        sorted(df['canal'].unique().tolist()),
+        sorted(df['sku'].unique().tolist())
+    ))
+
+
+def obtener_distribucion_ordenada(mes, df_resultado):
+    """
+    Distribución sin filas sin sku/canal, ordenada por (sku, canal, semana)
+    una sola vez por DataFrame; los filtros por máscara conservan el orden,
+    así que los requests no vuelven a ordenar
+
+    Returns:
+        DataFrame: Distribución ordenada (no debe modificarse)
+    """
+    return memorizar_por_distribucion(DISTRIBUCION_ORDENADA, mes, df_resultado, lambda df: (
+        df.dropna(subset=['sku', 'canal']).sort_values(['sku', 'canal', 'semana'], kind='stable')
+    ))
+
+
+def calcular_metricas_por_canal(df_resultado):
+    """
+    Calcula las métricas generales de todos los canales con una agregación
+    por (canal, sku) en una sola pasada y reducciones por canal sobre ese
+    resultado (en lugar de filtrar y agrupar por cada request)
+
+    Args:
+        df_resultado: DataFrame de get_distribucion_semanal_inventario
+
+    Returns:
+        dict: {canal: metricas} con total_asignado, total_vendido,
+              cumplimiento_general, inventario_restante y skus_totales
+    """
+    df = df_resultado[df_resultado['canal'].notna()]
+
+    # Una sola pasada sobre las filas: totales por (canal, sku); los SKU nulos
+    # forman su propio grupo (cuentan para ventas y número de SKUs)
+    por_sku = df.groupby(['canal', 'sku'], dropna=False).agg(
+        asignado=('asignacion_canal', 'sum'),
+        vendido=('ventas_reales_informativas', 'sum'),
+        # Inventario inicial: primer valor de cada SKU dentro del canal
+        inventario=('inventario_inicial', 'first')
+    )
+    con_sku = por_sku.index.get_level_values('sku').notna()
+    por_canal = por_sku.groupby(level='canal')
+
+    # Sumar asignaciones de todas las semanas por SKU-Canal
+    total_asignado = por_sku['asignado'].where(con_sku, 0).groupby(level='canal').sum()
+    # Sumar ventas informativas de todas las semanas (incluye semana actual)
+    total_vendido = por_canal['vendido'].sum()
+    inventario_inicial = por_sku['inventario'].where(con_sku).groupby(level='canal').sum()
+    skus_totales = por_canal.size()
+
+    metricas = {}
+    for canal, asignado, vendido, inventario, skus in zip(
+        total_vendido.index, total_asignado.tolist(), total_vendido.tolist(),
+        inventario_inicial.tolist(), skus_totales.tolist()
+    ):
+        metricas[canal] = {
+            'total_asignado': float(asignado),
+            'total_vendido': float(vendido),
+            'cumplimiento_general': float(vendido / asignado * 100) if asignado > 0 else 0.0,
+            # Inventario restante: tomar el inventario inicial menos las ventas
+            'inventario_restante': float(inventario - vendido),
+            'skus_totales': int(skus)
+        }
+    return metricas
+
+
+def calcular_grupos_reparto(df_resultado):
+    """
+    Agrupa la distribución ordenada por (sku, canal) con todas sus semanas
+    juntas; cumplimiento/estado se calculan vectorizados para todas las filas
+
+    Args:
+        df_resultado: Distribución ordenada por (sku, canal, semana)
+                      (ver obtener_distribucion_ordenada), completa o filtrada
+
+    Returns:
+        DataFrame: Un grupo por fila con columnas sku, canal, descripcion
+                   (primera fila del grupo) y semanas (lista de dicts)
+    """
+    asignacion = df_resultado['asignacion_canal']
+    # Usar ventas informativas para mostrar (incluye semana actual)
+    ventas = df_resultado['ventas_reales_informativas']
+    cumplimiento, estado = calcular_cumplimiento_estado(asignacion, ventas)
+
+    semanas = pd.DataFrame({
+        'semana': df_resultado['semana'],
+        'asignacion': asignacion,
+        'ventas': ventas,
+        'cumplimiento': cumplimiento,
+        'estado': estado
+    }).to_dict('records')
+
+    claves = zip(df_resultado['sku'].tolist(), df_resultado['canal'].tolist())
+    filas = zip(claves, df_resultado['descripcion'].tolist(), semanas)
+
+    grupos = []
+    for (sku_val, canal_val), grupo in itertools.groupby(filas, key=lambda fila: fila[0]):
+        grupo = list(grupo)
+        grupos.append((sku_val, canal_val, grupo[0][1], [fila[2] for fila in grupo]))
+
+    return pd.DataFrame(grupos, columns=['sku', 'canal', 'descripcion', 'semanas'])
+
+
+def calcular_semanas_consolidadas(df_resultado):
+    """
+    Suma asignaciones y ventas de todos los canales por SKU y semana con una
+    sola agregación y calcula cumplimiento/estado vectorizado
+
+    Args:
+        df_resultado: DataFrame de distribución (filtrado o completo)
+
+    Returns:
+        dict: {sku: [semanas ordenadas con semana, asignacion, ventas,
+               cumplimiento y estado]}
+    """
+    df_semanas = df_resultado.groupby(['sku', 'semana']).agg(
+        asignacion=('asignacion_canal', 'sum'),
+        ventas=('ventas_reales_informativas', 'sum')
+    ).reset_index()
+    df_semanas['cumplimiento'], df_semanas['estado'] = calcular_cumplimiento_estado(
+        df_semanas['asignacion'], df_semanas['ventas']
+    )
+
+    semanas = df_semanas[['semana', 'asignacion', 'ventas', 'cumplimiento', 'estado']].to_dict('records')
+    return {
+        sku_val: [fila[1] for fila in grupo]
+        for sku_val, grupo in itertools.groupby(
+            zip(df_semanas['sku'].tolist(), semanas), key=lambda fila: fila[0]
+        )
+    }
+
+
+def obtener_metricas_canal(mes, df_resultado, canal):
+    """
+    Métricas de un canal; las de todos los canales se calculan una vez por
+    DataFrame de distribución
+
+    Returns:
+        dict: Métricas del canal (METRICAS_VACIAS si no tiene filas)
+    """
+    metricas = memorizar_por_distribucion(METRICAS_POR_CANAL, mes, df_resultado, calcular_metricas_por_canal)
+    return metricas.get(canal, METRICAS_VACIAS)
+
+
+def construir_texto_busqueda(df):
+    """
+    Texto de búsqueda por fila: SKU y descripción en minúsculas unidos por un
+    separador que no aparece en el texto buscado (una sola columna donde
+    buscar en lugar de dos)
+
+    Args:
+        df: DataFrame con columnas sku y descripcion
+
+    Returns:
+        pd.Series: Texto de búsqueda con el mismo índice que df
+    """
+    return (
+        df['sku'].str.lower().fillna('') + SEPARADOR_BUSQUEDA +
+        df['descripcion'].str.lower().fillna('')
+    )
+
+
+def filtrar_por_texto(clave, df, texto):
+    """
+    Filtra las filas cuyo SKU o descripción contienen el texto (sin distinguir
+    mayúsculas). Búsqueda literal de subcadena (regex=False) en una sola
+    pasada sobre el texto de búsqueda, que se construye una vez por DataFrame.
+
+    Args:
+        clave: Clave del memo para este DataFrame (ej: (mes, 'datos'))
+        df: DataFrame memorizado con columnas sku y descripcion
+        texto: Texto a buscar
+
+    Returns:
+        DataFrame: Filas que coinciden
+    """
+    texto_busqueda = memorizar_por_distribucion(TEXTO_BUSQUEDA, clave, df, construir_texto_busqueda)
+    texto = texto.lower().replace(SEPARADOR_BUSQUEDA, '')
+    return df[texto_busqueda.str.contains(texto, regex=False)]
+
+
+def agregar_cupo_manual(df, df_cupos):
+    """
+    Agrega la columna cupo_manual (0 si el sku/canal no tiene cupo manual)
+    con un merge por (sku, canal) que conserva el orden de df
+
+    Args:
+        df: DataFrame con columnas sku y canal
+        df_cupos: DataFrame de obtener_cupos_manuales_originales
+
+    Returns:
+        DataFrame: df con la columna cupo_manual
+    """
+    df = df.merge(df_cupos[COLUMNAS_CUPOS], on=['sku', 'canal'], how='left')
+    df['cupo_manual'] = df['cupo_manual'].astype(float).fillna(0)
+    return df
+
+
+def obtener_distribucion_y_cupos(mes):
+    """
+    Obtiene la distribución semanal y los cupos manuales originales del mes.
+    Ambas consultas son independientes: se lanzan en paralelo para pagar un
+    solo viaje de ida y vuelta a ClickHouse por request.
+
+    Returns:
+        tuple: (df_resultado, df_cupos); df_cupos vacío si la consulta de
+               cupos falla
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futuro_distribucion = executor.submit(get_distribucion_semanal_inventario, mes)
+        futuro_cupos = executor.submit(obtener_cupos_manuales_originales, mes)
+        df_cupos = futuro_cupos.result()
+        if df_cupos is None:
+            df_cupos = pd.DataFrame(columns=COLUMNAS_CUPOS)
+        return futuro_distribucion.result(), df_cupos
+
+
+def calcular_cumplimiento_estado(asignacion, ventas):
+    """
+    Calcula el cumplimiento (%) y el estado de cada fila de forma vectorizada
+
+    Args:
+        asignacion: Serie con la asignación (float)
+        ventas: Serie con las ventas (float)
+
+    Returns:
+        tuple: (Serie cumplimiento, Categorical estado) con estado en
+               sobre-venta (tolerancia 5%), cumplido, parcial o bajo
+    """
+    cumplimiento = (ventas / asignacion * 100).where(asignacion > 0, 0.0)
+    # np.select sobre códigos enteros (índices de ESTADOS_CUMPLIMIENTO) en
+    # lugar de arreglos de texto; el resultado queda como categoría
+    codigos = np.select(
+        [ventas > asignacion * 1.05, cumplimiento >= 95, cumplimiento >= 80],
+        [0, 1, 2],
+        default=3
+    )
+    estado = pd.Categorical.from_codes(codigos, categories=ESTADOS_CUMPLIMIENTO)
+    return cumplimiento, estado
 
 
 @bp.route("/reparto-inventario")
@@ -73,117 +338,84 @@ def reparto_inventario_datos():
         sku = request.args.get('sku', '')
 
         if not mes:
-            return jsonify({'success': False, 'message': 'Mes requerido'}), 400
+            return respuesta_json({'success': False, 'message': 'Mes requerido'}, 400)
 
         # Obtener datos con la función que ya tiene todas las reglas implementadas
         # Esta función ya llama internamente a calcular_asignacion_semanal_secuencial
-        df_resultado = get_distribucion_semanal_inventario(mes)
+        # Los cupos manuales originales de la tabla (solo para mostrar en UI) se
+        # consultan en paralelo
+        df_resultado, df_cupos = obtener_distribucion_y_cupos(mes)
 
         if df_resultado is None or df_resultado.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': True,
                 'data': [],
                 'canales': [],
                 'skus': []
             })
 
-        # Obtener cupos manuales originales de la tabla (solo para mostrar en UI)
-        cupos_manuales_dict = obtener_cupos_manuales_originales(mes)
-
         # Obtener listas de canales y SKUs ANTES de filtrar
-        canales_disponibles = sorted(df_resultado['canal'].unique().tolist())
-        skus_disponibles = sorted(df_resultado['sku'].unique().tolist())
+        canales_disponibles, skus_disponibles = obtener_canales_y_skus(mes, df_resultado)
 
-        # Aplicar filtros
-        if canal and canal != 'Todos':
-            df_resultado = df_resultado[df_resultado['canal'] == canal]
+        # Agrupar por SKU y Canal para tener todas las semanas juntas: la
+        # distribución ya viene ordenada por (sku, canal, semana) y los filtros
+        # conservan ese orden
+        df_resultado = obtener_distribucion_ordenada(mes, df_resultado)
 
+        # Registros por (sku, canal): sin filtro de texto se reutilizan los del
+        # DataFrame memorizado; con filtro se arman solo con las filas filtradas
         if sku and sku.strip():
-            df_resultado = df_resultado[
-                df_resultado['sku'].str.contains(sku, case=False, na=False) |
-                df_resultado['descripcion'].str.contains(sku, case=False, na=False)
-            ]
+            df_grupos = calcular_grupos_reparto(filtrar_por_texto((mes, 'datos'), df_resultado, sku))
+        else:
+            df_grupos = memorizar_por_distribucion(GRUPOS_REPARTO, mes, df_resultado, calcular_grupos_reparto)
 
-        if df_resultado.empty:
-            return jsonify({
+        # El filtro de canal selecciona grupos completos
+        if canal and canal != 'Todos':
+            df_grupos = df_grupos[df_grupos['canal'] == canal]
+
+        if df_grupos.empty:
+            return respuesta_json({
                 'success': True,
                 'data': [],
                 'canales': canales_disponibles,
                 'skus': skus_disponibles
             })
 
-        # Preparar datos para el frontend
-        # Agrupar por SKU y Canal para tener todas las semanas juntas
-        registros = []
-        for (sku_val, canal_val), grupo in df_resultado.groupby(['sku', 'canal']):
-            # Obtener datos de la primera fila para información general
-            primera_fila = grupo.iloc[0]
+        # Cupo manual original de la tabla (solo para mostrar en UI) por (sku, canal)
+        # IMPORTANTE: Usar cupo_manual_original (de la tabla) NO inventario_asignado_total (suma de semanas)
+        df_grupos = agregar_cupo_manual(df_grupos, df_cupos)
 
-            # Obtener el cupo manual original de la tabla (solo para mostrar en UI)
-            # La clave es (sku, canal)
-            cupo_manual_original = cupos_manuales_dict.get((sku_val, canal_val), 0)
-
-            registro = {
+        # Registros de forma fija generados y serializados uno por uno mientras
+        # se envía la respuesta (sin lista completa ni texto JSON en memoria)
+        registros = (
+            {
                 'sku': sku_val,
-                'descripcion': primera_fila.get('descripcion', ''),
+                'descripcion': descripcion,
                 'canal': canal_val,
                 'disponible_total': cupo_manual_original,  # ✅ Cupo manual de la tabla (solo visual)
-                'semanas': []
+                'semanas': semanas,
+                'inventario_asignado': cupo_manual_original
             }
-
-            # Ordenar grupo por semana y procesar cada semana
-            grupo_ordenado = grupo.sort_values('semana')
-
-            for idx, row in grupo_ordenado.iterrows():
-                semana_nombre = row['semana']
-                asignacion = float(row.get('asignacion_canal', 0))
-                # Usar ventas informativas para mostrar (incluye semana actual)
-                ventas = float(row.get('ventas_reales_informativas', 0))
-
-                # Calcular cumplimiento
-                cumplimiento = (ventas / asignacion * 100) if asignacion > 0 else 0
-
-                # Determinar estado
-                if ventas > asignacion * 1.05:  # Tolerancia 5%
-                    estado = 'sobre-venta'
-                elif cumplimiento >= 95:
-                    estado = 'cumplido'
-                elif cumplimiento >= 80:
-                    estado = 'parcial'
-                else:
-                    estado = 'bajo'
-
-                registro['semanas'].append({
-                    'semana': semana_nombre,
-                    'asignacion': asignacion,
-                    'ventas': ventas,
-                    'cumplimiento': cumplimiento,
-                    'estado': estado
-                })
-
-            # Agregar el inventario asignado (cupo manual original de la tabla)
-            # IMPORTANTE: Usar cupo_manual_original (de la tabla) NO inventario_asignado_total (suma de semanas)
-            registro['inventario_asignado'] = cupo_manual_original
-
-            registros.append(registro)
+            for sku_val, canal_val, descripcion, semanas, cupo_manual_original in zip(
+                df_grupos['sku'].tolist(), df_grupos['canal'].tolist(), df_grupos['descripcion'].tolist(),
+                df_grupos['semanas'].tolist(), df_grupos['cupo_manual'].tolist()
+            )
+        )
 
         # Devolver las listas completas (sin filtrar) para los selectores
-        return jsonify({
+        return respuesta_json_streaming({
             'success': True,
-            'data': registros,
             'canales': canales_disponibles,
             'skus': skus_disponibles
-        })
+        }, 'data', registros)
 
     except Exception as e:
-        print(f"ERROR: [AJAX] Error obteniendo datos de reparto: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[AJAX] Error obteniendo datos de reparto")
 
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'message': f'Error al obtener datos: {str(e)}'
-        }), 500
+        }, 500)
 
 
 @bp.route("/reparto-inventario-metricas-canal", methods=["GET"])
@@ -195,73 +427,29 @@ def reparto_inventario_metricas_canal():
         canal = request.args.get('canal', '')
 
         if not mes or not canal:
-            return jsonify({'success': False, 'message': 'Mes y canal requeridos'}), 400
+            return respuesta_json({'success': False, 'message': 'Mes y canal requeridos'}, 400)
 
         # Obtener datos (ya procesados con todas las reglas de negocio)
         df_resultado = get_distribucion_semanal_inventario(mes)
 
         if df_resultado is None or df_resultado.empty:
-            return jsonify({
-                'success': True,
-                'metricas': {
-                    'total_asignado': 0,
-                    'total_vendido': 0,
-                    'cumplimiento_general': 0,
-                    'inventario_restante': 0,
-                    'skus_totales': 0
-                }
-            })
-
-        # Filtrar por canal
-        df_canal = df_resultado[df_resultado['canal'] == canal]
-
-        if df_canal.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': True,
-                'metricas': {
-                    'total_asignado': 0,
-                    'total_vendido': 0,
-                    'cumplimiento_general': 0,
-                    'inventario_restante': 0,
-                    'skus_totales': 0
-                }
+                'metricas': METRICAS_VACIAS
             })
 
-        # Calcular métricas
-        # Sumar asignaciones de todas las semanas por SKU-Canal
-        total_asignado = df_canal.groupby(['sku', 'canal'])['asignacion_canal'].sum().sum()
-
-        # Sumar ventas informativas de todas las semanas (incluye semana actual)
-        total_vendido = df_canal['ventas_reales_informativas'].sum()
-
-        cumplimiento_general = (total_vendido / total_asignado * 100) if total_asignado > 0 else 0
-
-        # Inventario restante: tomar el inventario inicial menos las ventas
-        inventario_inicial_total = df_canal.groupby(['sku'])['inventario_inicial'].first().sum()
-        inventario_restante = inventario_inicial_total - total_vendido
-
-        skus_totales = len(df_canal['sku'].unique())
-
-        return jsonify({
+        return respuesta_json({
             'success': True,
-            'metricas': {
-                'total_asignado': float(total_asignado),
-                'total_vendido': float(total_vendido),
-                'cumplimiento_general': float(cumplimiento_general),
-                'inventario_restante': float(inventario_restante),
-                'skus_totales': int(skus_totales)
-            }
+            'metricas': obtener_metricas_canal(mes, df_resultado, canal)
         })
 
     except Exception as e:
-        print(f"ERROR: [AJAX] Error obteniendo métricas de canal: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[AJAX] Error obteniendo métricas de canal")
 
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'message': f'Error al obtener métricas: {str(e)}'
-        }), 500
+        }, 500)
 
 
 @bp.route("/reparto-inventario-consolidado", methods=["GET"])
@@ -273,95 +461,63 @@ def reparto_inventario_consolidado():
         sku = request.args.get('sku', '')
 
         if not mes:
-            return jsonify({'success': False, 'message': 'Mes requerido'}), 400
+            return respuesta_json({'success': False, 'message': 'Mes requerido'}, 400)
 
-        # Obtener datos con todas las reglas de negocio
-        df_resultado = get_distribucion_semanal_inventario(mes)
+        # Obtener datos con todas las reglas de negocio y cupos manuales originales
+        df_resultado, df_cupos = obtener_distribucion_y_cupos(mes)
 
         if df_resultado is None or df_resultado.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': True,
                 'data': []
             })
 
         # Aplicar filtro de SKU si existe
+        df_distribucion = df_resultado
         if sku and sku.strip():
-            df_resultado = df_resultado[
-                df_resultado['sku'].str.contains(sku, case=False, na=False) |
-                df_resultado['descripcion'].str.contains(sku, case=False, na=False)
-            ]
+            df_resultado = filtrar_por_texto((mes, 'consolidado'), df_resultado, sku)
 
         if df_resultado.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': True,
                 'data': []
             })
 
-        # Obtener cupos manuales originales
-        cupos_manuales_dict = obtener_cupos_manuales_originales(mes)
-
         # Agrupar por SKU y Semana, consolidando todos los canales
-        registros = []
-        for sku_val, grupo_sku in df_resultado.groupby('sku'):
-            # Obtener descripción (tomar la primera)
-            primera_fila = grupo_sku.iloc[0]
-            descripcion = primera_fila.get('descripcion', '')
-
-            # Calcular inventario total asignado sumando cupos manuales de todos los canales
-            inventario_total = 0
-            for canal_val in grupo_sku['canal'].unique():
-                inventario_total += cupos_manuales_dict.get((sku_val, canal_val), 0)
-
-            registro = {
+        # Descripción e inventario por SKU (primera fila de cada SKU; cupos
+        # manuales sumados sobre sus canales distintos)
+        df_resultado = df_resultado.dropna(subset=['sku'])
+        df_skus = df_resultado.drop_duplicates('sku').sort_values('sku', kind='stable')
+        df_sku_canal = agregar_cupo_manual(df_resultado.drop_duplicates(['sku', 'canal']), df_cupos)
+        inventario_por_sku = df_sku_canal.groupby('sku')['cupo_manual'].sum()
+
+        # Semanas consolidadas por SKU: sin filtro se reutilizan las del
+        # DataFrame memorizado; con filtro se agregan solo las filas filtradas
+        if sku and sku.strip():
+            semanas_por_sku = calcular_semanas_consolidadas(df_resultado)
+        else:
+            semanas_por_sku = memorizar_por_distribucion(
+                SEMANAS_CONSOLIDADAS, mes, df_distribucion, calcular_semanas_consolidadas
+            )
+
+        # Los registros se generan y serializan uno por uno mientras se envía
+        # la respuesta (sin lista completa ni texto JSON completo en memoria)
+        registros = (
+            {
                 'sku': sku_val,
                 'descripcion': descripcion,
-                'inventario_total': inventario_total,
-                'semanas': []
+                'inventario_total': inventario_por_sku.get(sku_val, 0),
+                'semanas': semanas_por_sku.get(sku_val, [])
             }
+            for sku_val, descripcion in zip(df_skus['sku'].tolist(), df_skus['descripcion'].tolist())
+        )
 
-            # Agrupar por semana y consolidar
-            for semana_nombre, grupo_semana in grupo_sku.groupby('semana'):
-                # Sumar asignaciones y ventas de todos los canales para esta semana
-                asignacion_total = grupo_semana['asignacion_canal'].sum()
-                ventas_totales = grupo_semana['ventas_reales_informativas'].sum()
-
-                # Calcular cumplimiento
-                cumplimiento = (ventas_totales / asignacion_total * 100) if asignacion_total > 0 else 0
-
-                # Determinar estado
-                if ventas_totales > asignacion_total * 1.05:
-                    estado = 'sobre-venta'
-                elif cumplimiento >= 95:
-                    estado = 'cumplido'
-                elif cumplimiento >= 80:
-                    estado = 'parcial'
-                else:
-                    estado = 'bajo'
-
-                registro['semanas'].append({
-                    'semana': semana_nombre,
-                    'asignacion': float(asignacion_total),
-                    'ventas': float(ventas_totales),
-                    'cumplimiento': float(cumplimiento),
-                    'estado': estado
-                })
-
-            # Ordenar semanas
-            registro['semanas'] = sorted(registro['semanas'], key=lambda x: x['semana'])
-
-            registros.append(registro)
-
-        return jsonify({
-            'success': True,
-            'data': registros
-        })
+        return respuesta_json_streaming({'success': True}, 'data', registros)
 
     except Exception as e:
-        print(f"ERROR: [AJAX] Error obteniendo datos consolidados: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[AJAX] Error obteniendo datos consolidados")
 
-        return jsonify({
+        return respuesta_json({
             'success': False,
             'message': f'Error al obtener datos consolidados: {str(e)}'
-        }), 500
+        }, 500)
@@ -4,87 +4,251 @@ Utilidades compartidas
 Funciones auxiliares para formateo, serialización y procesamiento de datos
 """
 
+import functools
 import json
 import math
+import threading
+import time
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from flask import Response, current_app, stream_with_context
+from jinja2.runtime import Undefined
 from config import MAZATLAN_TZ, MESES_ESPANOL_LOWER
 
+# orjson es opcional: si está instalado, respuesta_json lo usa para serializar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # ====== SERIALIZACIÓN JSON ======
 
-class NumpyEncoder(json.JSONEncoder):
-    """Encoder personalizado para convertir tipos NumPy a tipos JSON serializables"""
+def respuesta_json(datos, status=200):
+    """
+    Construye una respuesta JSON de Flask. Con orjson disponible serializa en
+    C; en ambos casos acepta tipos NumPy (escalares y arreglos) directamente.
+
+    Args:
+        datos: Objeto a serializar (dict o lista)
+        status: Código HTTP de la respuesta
 
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super().default(obj)
+    Returns:
+        Response: Respuesta con mimetype application/json
+    """
+    return Response(
+        serializar_json(datos),
+        status=status,
+        mimetype='application/json'
+    )
 
 
-def clean_data_for_json(data, path=""):
+def serializar_json(datos):
     """
-    Limpia los datos para serialización JSON, reemplazando NaN, inf, Undefined y otros tipos problemáticos
+    Serializa un objeto a JSON (bytes) con orjson si está disponible o con
+    el proveedor JSON de Flask (el mismo que usa jsonify) más conversión de
+    tipos NumPy. En ambos casos los tipos que el serializador no conoce
+    pasan por convertir_numpy_json (ej. Decimal con orjson).
 
     Args:
-        data: Datos a limpiar (puede ser dict, list, número, etc.)
-        path: Path interno para debugging (opcional)
+        datos: Objeto a serializar
 
     Returns:
-        Datos limpios serializables a JSON
+        bytes: JSON codificado en UTF-8
     """
-    from jinja2.runtime import Undefined
+    if orjson is None:
+        return current_app.json.dumps(datos, default=convertir_numpy_json).encode('utf-8')
+    return orjson.dumps(
+        datos,
+        default=convertir_numpy_json,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
 
-    try:
-        # Verificar si es un objeto Undefined de Jinja2
-        if isinstance(data, Undefined):
-            print(f"WARNING: Encontrado objeto Undefined en path '{path}', reemplazando con None")
-            return None
 
+def convertir_a_tipos_json(datos):
+    """
+    Convierte una estructura con tipos NumPy a tipos de Python equivalentes a
+    JSON (dict, list, str, int, float, bool, None) con una ida y vuelta por
+    serializar_json
+
+    Args:
+        datos: Objeto a convertir
+
+    Returns:
+        Objeto con solo tipos de Python
+    """
+    if orjson is None:
+        return json.loads(serializar_json(datos))
+    return orjson.loads(serializar_json(datos))
+
+
+def convertir_numpy_json(obj):
+    """
+    Función default para serializar JSON: convierte arreglos y escalares
+    NumPy a tipos de Python (lo que orjson hace con OPT_SERIALIZE_NUMPY, más
+    los casos que no cubre) y delega el resto al proveedor de Flask
+
+    Args:
+        obj: Objeto que json no sabe serializar
+
+    Returns:
+        Valor serializable a JSON
+    """
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    return current_app.json.default(obj)
+
+
+def respuesta_json_streaming(datos, clave, elementos):
+    """
+    Respuesta JSON que se envía por partes: los campos de `datos` van al
+    inicio y la lista `clave` se serializa elemento por elemento a medida
+    que `elementos` (iterable o generador) los produce, sin armar en memoria
+    la lista completa ni el texto JSON completo.
+
+    Args:
+        datos: dict con los demás campos de la respuesta
+        clave: Nombre del campo que contiene la lista
+        elementos: Iterable con los elementos de la lista
+
+    Returns:
+        Response: Respuesta streaming con mimetype application/json
+    """
+    def generar():
+        cabecera = serializar_json(datos)
+        yield cabecera[:-1] + (b',' if len(cabecera) > 2 else b'') + serializar_json(clave) + b':['
+        separador = b''
+        for elemento in elementos:
+            yield separador + serializar_json(elemento)
+            separador = b','
+        yield b']}'
+
+    return Response(stream_with_context(generar()), mimetype='application/json')
+
+
+def formatear_ruta(ruta):
+    """
+    Convierte una ruta de clean_data_for_json a texto (solo se usa en los
+    mensajes, así que se arma únicamente cuando hay algo que reportar)
+
+    Args:
+        ruta: Texto de la raíz o tupla (ruta_padre, separador, clave) con
+              separador '[' para índices de lista y '.' para claves de dict
+
+    Returns:
+        str: Ruta como "raiz.clave[0]"
+    """
+    partes = []
+    while isinstance(ruta, tuple):
+        ruta, separador, clave = ruta
+        partes.append(f"[{clave}]" if separador == '[' else f".{clave}")
+    return ruta + "".join(reversed(partes))
+
+
+def limpiar_valor_json(data, ruta):
+    """
+    Limpia un valor que no es lista ni dict (ver clean_data_for_json)
+
+    Args:
+        data: Valor a limpiar
+        ruta: Ruta del valor (ver formatear_ruta)
+
+    Returns:
+        Valor serializable a JSON
+    """
+    try:
+        # Tipos más comunes primero
         if data is None:
             return None
-        elif isinstance(data, list):
-            return [clean_data_for_json(item, f"{path}[{i}]") for i, item in enumerate(data)]
-        elif isinstance(data, dict):
-            cleaned_dict = {}
-            for key, value in data.items():
-                try:
-                    cleaned_dict[key] = clean_data_for_json(value, f"{path}.{key}")
-                except Exception as e:
-                    print(f"ERROR limpiando clave '{key}' en path '{path}': {e}")
-                    cleaned_dict[key] = None
-            return cleaned_dict
+        elif isinstance(data, str):
+            return data
         elif isinstance(data, (np.integer, int)):
             return int(data)
         elif isinstance(data, (np.floating, float)):
-            if math.isnan(data) or math.isinf(data):
-                print(f"WARNING: Valor NaN/inf encontrado en path '{path}', reemplazando con 0")
+            if not math.isfinite(data):
+                print(f"WARNING: Valor NaN/inf encontrado en path '{formatear_ruta(ruta)}', reemplazando con 0")
                 return 0
             return float(data)
-        elif hasattr(data, 'item'):  # Para tipos numpy
-            return clean_data_for_json(data.item(), path)
-        elif str(type(data)) == "<class 'jinja2.runtime.Undefined'>":
-            print(f"WARNING: Objeto Undefined detectado por string en path '{path}', reemplazando con None")
+        # Verificar si es un objeto Undefined de Jinja2 (antes de hasattr:
+        # Undefined responde a cualquier atributo)
+        elif isinstance(data, Undefined):
+            print(f"WARNING: Encontrado objeto Undefined en path '{formatear_ruta(ruta)}', reemplazando con None")
             return None
+        elif hasattr(data, 'item'):  # Para tipos numpy
+            return limpiar_valor_json(data.item(), ruta)
         else:
             # Verificar si se puede serializar a JSON
             try:
                 json.dumps(data)
                 return data
             except (TypeError, ValueError) as e:
-                print(f"WARNING: Objeto no serializable en path '{path}': {type(data)} - {e}, reemplazando con string")
+                print(f"WARNING: Objeto no serializable en path '{formatear_ruta(ruta)}': {type(data)} - {e}, reemplazando con string")
                 return str(data)
 
     except Exception as e:
-        print(f"ERROR en clean_data_for_json en path '{path}': {e}")
+        print(f"ERROR en clean_data_for_json en path '{formatear_ruta(ruta)}': {e}")
         return None
 
 
+def clean_data_for_json(data, path=""):
+    """
+    Limpia los datos para serialización JSON, reemplazando NaN, inf, Undefined y otros tipos problemáticos
+
+    Recorre la estructura con una pila explícita (sin recursión): cada lista
+    o dict se copia a un contenedor nuevo cuyos elementos se llenan al
+    sacarlos de la pila; los datos originales no se modifican.
+
+    Args:
+        data: Datos a limpiar (puede ser dict, list, número, etc.)
+        path: Path interno para debugging (opcional)
+
+    Returns:
+        Datos limpios serializables a JSON
+    """
+    raiz = [None]
+    pendientes = [(raiz, 0, data, path)]
+    while pendientes:
+        destino, clave, valor, ruta = pendientes.pop()
+
+        if isinstance(valor, pd.Series):
+            valor = valor.to_numpy()
+        if isinstance(valor, np.ndarray):
+            # Arreglos numéricos: NaN/inf a 0 en una sola operación vectorizada
+            # en lugar de revisar elemento por elemento
+            if valor.dtype.kind == 'f':
+                finitos = np.isfinite(valor)
+                if not finitos.all():
+                    print(f"WARNING: {np.count_nonzero(~finitos)} valores NaN/inf encontrados en path '{formatear_ruta(ruta)}', reemplazando con 0")
+                destino[clave] = np.where(finitos, valor, 0).tolist()
+                continue
+            if valor.dtype.kind in 'iu':
+                destino[clave] = valor.tolist()
+                continue
+            if valor.dtype.kind == 'b':
+                # Booleanos como 1/0, igual que limpiar_valor_json
+                destino[clave] = valor.astype(np.int8).tolist()
+                continue
+            valor = valor.tolist()
+
+        if isinstance(valor, list):
+            nueva = [None] * len(valor)
+            destino[clave] = nueva
+            # En orden inverso para procesar (y reportar) en el orden original
+            for i in range(len(valor) - 1, -1, -1):
+                pendientes.append((nueva, i, valor[i], (ruta, '[', i)))
+        elif isinstance(valor, dict):
+            # fromkeys conserva el orden de las claves
+            nuevo = dict.fromkeys(valor)
+            destino[clave] = nuevo
+            for clave_hija, valor_hijo in reversed(valor.items()):
+                pendientes.append((nuevo, clave_hija, valor_hijo, (ruta, '.', clave_hija)))
+        else:
+            destino[clave] = limpiar_valor_json(valor, ruta)
+
+    return raiz[0]
+
+
 # ====== FORMATEO DE FECHAS Y PERÍODOS ======
 
 def formato_periodo_texto(preset_main, fecha_inicio, fecha_fin):
@@ -189,7 +353,7 @@ def obtener_mes_actual():
 
 # ====== AGRUPACIÓN Y PROCESAMIENTO DE DATOS ======
 
-def agrupar_por(df, granularidad, limite_hora=None):
+def agrupar_por(df, granularidad, limite_hora=None, mascara=None):
     """
     Agrupa un DataFrame por granularidad temporal
 
@@ -197,26 +361,52 @@ def agrupar_por(df, granularidad, limite_hora=None):
         df: DataFrame con columna 'Fecha' y 'Total'
         granularidad: "hora" o "dia"
         limite_hora: Límite de hora para mostrar (opcional)
+        mascara: Arreglo booleano de filas a incluir (opcional, todas si es None)
 
     Returns:
         Series: Datos agrupados por la granularidad especificada
     """
+    if df.empty:
+        # Sin filas no hay nada que agrupar: ceros para las 24 horas o una
+        # serie vacía por día
+        if granularidad == "hora":
+            return pd.Series(np.zeros(24), index=range(24), name="Total")
+        return pd.Series(dtype=np.float64, name="Total")
+
     if granularidad == "hora":
-        if not df.empty and limite_hora is not None:
+        # Por hora se trabaja sobre los arreglos de las dos columnas: la
+        # máscara selecciona filas sin copiar el DataFrame
+        horas = df["Fecha"].dt.hour.to_numpy(dtype=np.float64)
+        totales = df["Total"].to_numpy(dtype=np.float64, na_value=0.0)
+        if mascara is not None:
+            horas, totales = horas[mascara], totales[mascara]
+        # Fechas nulas no cuentan
+        con_fecha = ~np.isnan(horas)
+
+        if con_fecha.any() and limite_hora is not None:
             # Solo mostrar hasta la última hora con datos
-            hora_max = min(df["Fecha"].dt.hour.max(), limite_hora)
+            hora_max = min(int(horas[con_fecha].max()), limite_hora)
             horas_rango = range(0, hora_max + 1)
         else:
             # Mostrar todas las 24 horas
             horas_rango = range(24)
-        return df.groupby(df["Fecha"].dt.hour)["Total"].sum().reindex(horas_rango, fill_value=0)
+        # Las horas ya son enteros 0-23: suma por hora con np.bincount en una
+        # sola pasada (sin groupby ni reindex)
+        totales = np.bincount(horas[con_fecha].astype(np.int64), weights=totales[con_fecha], minlength=24)
+        return pd.Series(totales[:len(horas_rango)], index=horas_rango, name="Total")
     else:
-        return df.groupby(df["Fecha"].dt.strftime("%d-%b"))["Total"].sum().sort_index(
+        if mascara is not None:
+            df = df[mascara]
+        # Sumar por día calendario (clave datetime, sin formatear cada fila)
+        # y dar formato "%d-%b" solo a los días resultantes; días de años
+        # distintos con la misma etiqueta se siguen sumando juntos
+        por_dia = df.groupby(df["Fecha"].dt.normalize())["Total"].sum()
+        return por_dia.groupby(por_dia.index.strftime("%d-%b")).sum().sort_index(
             key=lambda x: pd.to_datetime(x, format="%d-%b")
         )
 
 
-def agrupar_condicional(df, granularidad, condicion, limite_hora=None):
+def agrupar_condicional(df, granularidad, condicion, limite_hora=None, cancelado=None):
     """
     Agrupa un DataFrame aplicando una condición antes de agrupar
 
@@ -225,15 +415,40 @@ def agrupar_condicional(df, granularidad, condicion, limite_hora=None):
         granularidad: "hora" o "dia"
         condicion: "cancelado", "neto", u otra
         limite_hora: Límite de hora para mostrar (opcional)
+        cancelado: Arreglo booleano estado == "Cancelado" ya calculado para
+                   df (opcional; si es None se calcula aquí)
 
     Returns:
         Series: Datos agrupados con la condición aplicada
     """
-    if condicion == "cancelado":
-        df = df[df["estado"] == "Cancelado"]
-    elif condicion == "neto":
-        df = df[df["estado"] != "Cancelado"]
-    return agrupar_por(df, granularidad, limite_hora)
+    mascara = None
+    if condicion in ("cancelado", "neto"):
+        # Una sola comparación sobre estado; la condición se pasa como máscara
+        # a agrupar_por en lugar de filtrar (y copiar) el DataFrame
+        if cancelado is None:
+            cancelado = df["estado"].eq("Cancelado").to_numpy()
+        mascara = cancelado if condicion == "cancelado" else ~cancelado
+    return agrupar_por(df, granularidad, limite_hora, mascara)
+
+
+def totales_por_cancelacion(df, cancelado=None):
+    """
+    Suma el Total de cancelados y no cancelados con un solo groupby
+
+    Args:
+        df: DataFrame con columnas 'estado' y 'Total'
+        cancelado: Arreglo booleano estado == "Cancelado" ya calculado para
+                   df (opcional; si es None se calcula aquí)
+
+    Returns:
+        tuple: (total_cancelado, total_no_cancelado)
+    """
+    if df.empty:
+        return 0, 0
+    if cancelado is None:
+        cancelado = df["estado"].eq("Cancelado")
+    totales = df["Total"].groupby(cancelado).sum()
+    return totales.get(True, 0), totales.get(False, 0)
 
 
 def resumen_periodo(df_periodo, df_comparado, granularidad):
@@ -248,13 +463,11 @@ def resumen_periodo(df_periodo, df_comparado, granularidad):
     Returns:
         dict: Resumen con métricas comparativas
     """
-    # Calcular métricas del período principal
-    ventas_main = df_periodo[df_periodo["estado"] != "Cancelado"]["Total"].sum() if not df_periodo.empty else 0
-    cancelaciones_main = df_periodo[df_periodo["estado"] == "Cancelado"]["Total"].sum() if not df_periodo.empty else 0
+    # Calcular métricas del período principal (una pasada por DataFrame)
+    cancelaciones_main, ventas_main = totales_por_cancelacion(df_periodo)
 
     # Calcular métricas del período de comparación
-    ventas_compare = df_comparado[df_comparado["estado"] != "Cancelado"]["Total"].sum() if not df_comparado.empty else 0
-    cancelaciones_compare = df_comparado[df_comparado["estado"] == "Cancelado"]["Total"].sum() if not df_comparado.empty else 0
+    cancelaciones_compare, ventas_compare = totales_por_cancelacion(df_comparado)
 
     # Calcular deltas
     delta_ventas = ((ventas_main - ventas_compare) / ventas_compare * 100) if ventas_compare else 0
@@ -294,6 +507,182 @@ def get_default_resumen_general():
             'ingreso': {'actual': 0, 'anterior': 0, 'delta': 0}
         }
     }
+
+
+# ====== GAUGES DE PLOTLY ======
+
+# Partes fijas de las configuraciones de gauge: se construyen una vez al
+# importar y todas las configuraciones las comparten (Plotly y la
+# serialización JSON solo las leen; no deben modificarse)
+GAUGE_NUMERO = {
+    'font': {'size': 28, 'color': '#1a1a1a', 'family': 'Inter, -apple-system, sans-serif', 'weight': 700},
+    'suffix': "%",
+    'valueformat': '.1f'
+}
+GAUGE_DOMINIO = {'x': [0, 1], 'y': [0, 1]}
+GAUGE_BARRA = {'color': "transparent", 'thickness': 0}  # Sin línea de progreso
+GAUGE_AGUJA = {'color': "#1f2937", 'width': 6}  # Aguja principal más gruesa y elegante
+GAUGE_LAYOUT = {
+    'height': 240,
+    'margin': {'l': 30, 'r': 30, 't': 50, 'b': 30},
+    'paper_bgcolor': 'rgba(0,0,0,0)',
+    'plot_bgcolor': 'rgba(0,0,0,0)',
+    'font': {'color': '#374151', 'family': 'Inter, -apple-system, BlinkMacSystemFont, sans-serif', 'size': 12},
+    'showlegend': False,
+    'hovermode': False
+}
+GAUGE_CONFIG_PLOTLY = {'displayModeBar': False, 'responsive': True}
+# Espacios y guiones bajos del canal a guiones en el div_id (una sola pasada)
+TABLA_SLUG_GAUGE = str.maketrans({' ': '-', '_': '-'})
+
+
+def crear_eje_gauge(minimo, maximo):
+    """Eje del gauge principal con etiquetas solo en los extremos"""
+    return {
+        'range': [minimo, maximo],
+        'tickmode': 'array',
+        'tickvals': [minimo, maximo],  # Solo extremos
+        'ticktext': [str(minimo), str(maximo)],  # Solo etiquetas extremas
+        'tickwidth': 2,
+        'tickcolor': "#666",
+        'ticklen': 10,
+        'tickfont': {'size': 9, 'color': '#4a5568', 'family': 'Inter, -apple-system, sans-serif'}
+    }
+
+
+def crear_marcador_gauge(valor, rango):
+    """Mini aguja amarilla fija en `valor` (mismo rango, eje invisible)"""
+    return {
+        'type': 'indicator',
+        'mode': 'gauge',
+        'value': valor,
+        'domain': GAUGE_DOMINIO,
+        'gauge': {
+            'axis': {'range': rango, 'visible': False},
+            'bar': GAUGE_BARRA,
+            'bgcolor': "transparent",
+            'borderwidth': 0,
+            'threshold': {
+                'line': {'color': "#ffc107", 'width': 4},  # Aguja amarilla más gruesa
+                'thickness': 0.8,  # Más larga que antes
+                'value': valor
+            }
+        }
+    }
+
+
+# Gauge de costo: rango visual 45%-57%
+GAUGE_COSTO_EJE = crear_eje_gauge(45, 57)
+GAUGE_COSTO_PASOS = [
+    # Verde intenso (45%-47%): Excelente (costo muy bajo)
+    {'range': [45, 46], 'color': "#20c997"},    # Verde teal puro
+    {'range': [46, 47], 'color': "#24b386"},    # Transición teal→verde
+
+    # Verde claro (47%-48%): Muy bueno (costo bajo)
+    {'range': [47, 48], 'color': "#28a745"},    # Verde éxito puro
+
+    # DEGRADADO AMARILLO (48%-54%): De débil a fuerte hacia el rojo
+    {'range': [48, 48.5], 'color': "#fff3cd"},  # Amarillo muy claro (cerca del verde)
+    {'range': [48.5, 49], 'color': "#ffecb3"},  # Amarillo suave
+    {'range': [49, 49.5], 'color': "#ffe082"},  # Amarillo claro
+    {'range': [49.5, 50], 'color': "#ffd54f"},  # Amarillo medio-claro
+    {'range': [50, 50.5], 'color': "#ffc107"},  # Amarillo estándar (centro)
+    {'range': [50.5, 51], 'color': "#ffb300"},  # Amarillo medio-fuerte
+    {'range': [51, 51.5], 'color': "#ffa000"},  # Amarillo fuerte
+    {'range': [51.5, 52], 'color': "#ff9800"},  # Amarillo-naranja suave
+    {'range': [52, 52.5], 'color': "#ff8f00"},  # Amarillo-naranja medio
+    {'range': [52.5, 53], 'color': "#ff8a65"},  # Amarillo-naranja fuerte
+    {'range': [53, 53.5], 'color': "#ff7043"},  # Casi naranja
+    {'range': [53.5, 54], 'color': "#ff6f00"},  # Naranja-amarillo (cerca del rojo)
+
+    # Rojo (54%-57%): Alto Riesgo - después del rango objetivo
+    {'range': [54, 55.5], 'color': "#dc3545"},  # Rojo puro
+    {'range': [55.5, 57], 'color': "#c82333"}   # Rojo intenso final
+]
+# Mini agujas marcadoras en 48% y 54%
+GAUGE_COSTO_MARCADORES = [crear_marcador_gauge(48, [45, 57]), crear_marcador_gauge(54, [45, 57])]
+
+# Gauge de ingreso real: rango visual 5%-20%
+GAUGE_INGRESO_EJE = crear_eje_gauge(5, 20)
+GAUGE_INGRESO_PASOS = [
+    # Rojo (5%-10%): Rentabilidad baja
+    {'range': [5, 7], 'color': "#dc3545"},    # Rojo puro
+    {'range': [7, 10], 'color': "#c82333"},   # Rojo intenso
+
+    # DEGRADADO AMARILLO (10%-15%): De fuerte hacia verde
+    {'range': [10, 10.4], 'color': "#ff6f00"},  # Naranja-amarillo (cerca del rojo)
+    {'range': [10.4, 10.8], 'color': "#ff7043"},  # Casi naranja
+    {'range': [10.8, 11.2], 'color': "#ff8a65"},  # Amarillo-naranja fuerte
+    {'range': [11.2, 11.6], 'color': "#ff8f00"},  # Amarillo-naranja medio
+    {'range': [11.6, 12], 'color': "#ffa000"},    # Amarillo fuerte
+    {'range': [12, 12.4], 'color': "#ffb300"},    # Amarillo medio-fuerte
+    {'range': [12.4, 12.8], 'color': "#ffc107"},  # Amarillo estándar (centro)
+    {'range': [12.8, 13.2], 'color': "#ffd54f"},  # Amarillo medio-claro
+    {'range': [13.2, 13.6], 'color': "#ffe082"},  # Amarillo claro
+    {'range': [13.6, 14], 'color': "#ffecb3"},    # Amarillo suave
+    {'range': [14, 14.4], 'color': "#fff3cd"},    # Amarillo muy claro
+    {'range': [14.4, 15], 'color': "#fff8e1"},    # Amarillo muy claro (cerca del verde)
+
+    # Verde (15%-20%): Excelente rentabilidad
+    {'range': [15, 17.5], 'color': "#28a745"},   # Verde éxito puro
+    {'range': [17.5, 20], 'color': "#20c997"}     # Verde teal puro
+]
+# Mini agujas marcadoras en 10% y 15%
+GAUGE_INGRESO_MARCADORES = [crear_marcador_gauge(10, [5, 20]), crear_marcador_gauge(15, [5, 20])]
+
+
+def crear_gauge_config(porcentaje_actual, eje, pasos, marcadores, div_id):
+    """
+    Arma la configuración de un gauge: solo el indicador principal (valor y
+    aguja) es nuevo en cada llamada; eje, pasos, marcadores, layout y config
+    son los objetos fijos del módulo
+
+    Args:
+        porcentaje_actual: Valor del indicador y de la aguja principal
+        eje: Eje del gauge (GAUGE_COSTO_EJE o GAUGE_INGRESO_EJE)
+        pasos: Pasos de color del gauge
+        marcadores: Indicadores de las mini agujas fijas
+        div_id: ID del div donde se dibuja el gauge
+
+    Returns:
+        dict: Configuración de Plotly con data, layout, config y div_id;
+              lista para serializar a JSON sin pasar por clean_data_for_json
+    """
+    # NaN/inf se muestran como 0 (lo que haría clean_data_for_json)
+    if not math.isfinite(porcentaje_actual):
+        porcentaje_actual = 0
+    return {
+        'data': [
+            # Indicador principal
+            {
+                'type': 'indicator',
+                'mode': 'gauge+number',
+                'value': porcentaje_actual,
+                'title': {'text': ""},  # Sin título
+                'number': GAUGE_NUMERO,
+                'domain': GAUGE_DOMINIO,
+                'gauge': {
+                    'axis': eje,
+                    'bar': GAUGE_BARRA,
+                    'bgcolor': "rgba(248, 250, 252, 0.9)",
+                    'borderwidth': 0,
+                    'steps': pasos,
+                    'threshold': {
+                        'line': GAUGE_AGUJA,
+                        'thickness': 0.85,
+                        'value': porcentaje_actual
+                    },
+                    'shape': "angular"
+                }
+            },
+            *marcadores
+        ],
+        'layout': GAUGE_LAYOUT,
+        'config': GAUGE_CONFIG_PLOTLY,
+        'div_id': div_id
+    }
+
+
 def crear_gauge_costo_config(porcentaje_actual, canal="Canal"):
     """
     Crear configuración JSON de Plotly para gauge de costo de venta
@@ -309,120 +698,11 @@ def crear_gauge_costo_config(porcentaje_actual, canal="Canal"):
         if porcentaje_actual is None or porcentaje_actual < 0:
             print(f"WARN: porcentaje_actual inválido: {porcentaje_actual}, usando 50 por defecto")
             porcentaje_actual = 50.0
-        gauge_config = {
-            'data': [
-                # Indicador principal
-                {
-                    'type': 'indicator',
-                    'mode': 'gauge+number',
-                    'value': porcentaje_actual,
-                    'title': {'text': ""},  # Sin título
-                    'number': {
-                        'font': {'size': 28, 'color': '#1a1a1a', 'family': 'Inter, -apple-system, sans-serif', 'weight': 700}, 
-                        'suffix': "%",
-                        'valueformat': '.1f'
-                    },
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {
-                            'range': [45, 57], 
-                            'tickmode': 'array',
-                            'tickvals': [45, 57],  # Solo extremos
-                            'ticktext': ['45', '57'],  # Solo etiquetas extremas
-                            'tickwidth': 2, 
-                            'tickcolor': "#666", 
-                            'ticklen': 10,
-                            'tickfont': {'size': 9, 'color': '#4a5568', 'family': 'Inter, -apple-system, sans-serif'}
-                        },
-                        'bar': {'color': "transparent", 'thickness': 0},  # Sin línea de progreso
-                        'bgcolor': "rgba(248, 250, 252, 0.9)",
-                        'borderwidth': 0,
-                        'steps': [
-                            # Verde intenso (45%-47%): Excelente (costo muy bajo)
-                            {'range': [45, 46], 'color': "#20c997"},    # Verde teal puro
-                            {'range': [46, 47], 'color': "#24b386"},    # Transición teal→verde
-                            
-                            # Verde claro (47%-48%): Muy bueno (costo bajo)
-                            {'range': [47, 48], 'color': "#28a745"},    # Verde éxito puro
-                            
-                            # DEGRADADO AMARILLO (48%-54%): De débil a fuerte hacia el rojo
-                            {'range': [48, 48.5], 'color': "#fff3cd"},  # Amarillo muy claro (cerca del verde)
-                            {'range': [48.5, 49], 'color': "#ffecb3"},  # Amarillo suave
-                            {'range': [49, 49.5], 'color': "#ffe082"},  # Amarillo claro
-                            {'range': [49.5, 50], 'color': "#ffd54f"},  # Amarillo medio-claro
-                            {'range': [50, 50.5], 'color': "#ffc107"},  # Amarillo estándar (centro)
-                            {'range': [50.5, 51], 'color': "#ffb300"},  # Amarillo medio-fuerte
-                            {'range': [51, 51.5], 'color': "#ffa000"},  # Amarillo fuerte
-                            {'range': [51.5, 52], 'color': "#ff9800"},  # Amarillo-naranja suave
-                            {'range': [52, 52.5], 'color': "#ff8f00"},  # Amarillo-naranja medio
-                            {'range': [52.5, 53], 'color': "#ff8a65"},  # Amarillo-naranja fuerte
-                            {'range': [53, 53.5], 'color': "#ff7043"},  # Casi naranja
-                            {'range': [53.5, 54], 'color': "#ff6f00"},  # Naranja-amarillo (cerca del rojo)
-                            
-                            # Rojo (54%-57%): Alto Riesgo - después del rango objetivo
-                            {'range': [54, 55.5], 'color': "#dc3545"},  # Rojo puro
-                            {'range': [55.5, 57], 'color': "#c82333"}   # Rojo intenso final
-                        ],
-                        'threshold': {
-                            'line': {'color': "#1f2937", 'width': 6},  # Aguja principal más gruesa y elegante
-                            'thickness': 0.85,
-                            'value': porcentaje_actual
-                        },
-                        'shape': "angular"
-                    }
-                },
-                # Mini aguja marcadora en 48% 
-                {
-                    'type': 'indicator',
-                    'mode': 'gauge',
-                    'value': 48,  # Valor fijo en 48%
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {'range': [45, 57], 'visible': False},  # Mismo rango, eje invisible
-                        'bar': {'color': "transparent", 'thickness': 0},
-                        'bgcolor': "transparent",
-                        'borderwidth': 0,
-                        'threshold': {
-                            'line': {'color': "#ffc107", 'width': 4},  # Aguja amarilla más gruesa
-                            'thickness': 0.8,  # Más larga que antes
-                            'value': 48
-                        }
-                    }
-                },
-                # Mini aguja marcadora en 54%
-                {
-                    'type': 'indicator', 
-                    'mode': 'gauge',
-                    'value': 54,  # Valor fijo en 54%
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {'range': [45, 57], 'visible': False},  # Mismo rango, eje invisible
-                        'bar': {'color': "transparent", 'thickness': 0},
-                        'bgcolor': "transparent",
-                        'borderwidth': 0,
-                        'threshold': {
-                            'line': {'color': "#ffc107", 'width': 4},  # Aguja amarilla más gruesa (mismo color)
-                            'thickness': 0.8,  # Más larga que antes
-                            'value': 54
-                        }
-                    }
-                }
-            ],
-            'layout': {
-                'height': 240,
-                'margin': {'l': 30, 'r': 30, 't': 50, 'b': 30},
-                'paper_bgcolor': 'rgba(0,0,0,0)',
-                'plot_bgcolor': 'rgba(0,0,0,0)',
-                'font': {'color': '#374151', 'family': 'Inter, -apple-system, BlinkMacSystemFont, sans-serif', 'size': 12},
-                'showlegend': False,
-                'hovermode': False
-            },
-            'config': {'displayModeBar': False, 'responsive': True},
-            'div_id': f"gauge-costo-{canal.lower().replace(' ', '-').replace('_', '-')}"
-        }
-        
-        return gauge_config
-        
+        return crear_gauge_config(
+            porcentaje_actual, GAUGE_COSTO_EJE, GAUGE_COSTO_PASOS, GAUGE_COSTO_MARCADORES,
+            f"gauge-costo-{canal.lower().translate(TABLA_SLUG_GAUGE)}"
+        )
+
     except Exception as e:
         print(f"Error creando configuración de gauge de costo: {e}")
         return None
@@ -442,118 +722,83 @@ def crear_gauge_ingreso_config(porcentaje_actual, canal="Canal"):
         if porcentaje_actual is None or porcentaje_actual < 0:
             print(f"WARN: porcentaje_actual inválido: {porcentaje_actual}, usando 12 por defecto")
             porcentaje_actual = 12.0
-        gauge_config = {
-            'data': [
-                # Indicador principal
-                {
-                    'type': 'indicator',
-                    'mode': 'gauge+number',
-                    'value': porcentaje_actual,
-                    'title': {'text': ""},  # Sin título
-                    'number': {
-                        'font': {'size': 28, 'color': '#1a1a1a', 'family': 'Inter, -apple-system, sans-serif', 'weight': 700}, 
-                        'suffix': "%",
-                        'valueformat': '.1f'
-                    },
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {
-                            'range': [5, 20], 
-                            'tickmode': 'array',
-                            'tickvals': [5, 20],  # Solo extremos
-                            'ticktext': ['5', '20'],  # Solo etiquetas extremas
-                            'tickwidth': 2, 
-                            'tickcolor': "#666", 
-                            'ticklen': 10,
-                            'tickfont': {'size': 9, 'color': '#4a5568', 'family': 'Inter, -apple-system, sans-serif'}
-                        },
-                        'bar': {'color': "transparent", 'thickness': 0},  # Sin línea de progreso
-                        'bgcolor': "rgba(248, 250, 252, 0.9)",
-                        'borderwidth': 0,
-                        'steps': [
-                            # Rojo (5%-10%): Rentabilidad baja
-                            {'range': [5, 7], 'color': "#dc3545"},    # Rojo puro
-                            {'range': [7, 10], 'color': "#c82333"},   # Rojo intenso
-                            
-                            # DEGRADADO AMARILLO (10%-15%): De fuerte hacia verde
-                            {'range': [10, 10.4], 'color': "#ff6f00"},  # Naranja-amarillo (cerca del rojo)
-                            {'range': [10.4, 10.8], 'color': "#ff7043"},  # Casi naranja
-                            {'range': [10.8, 11.2], 'color': "#ff8a65"},  # Amarillo-naranja fuerte
-                            {'range': [11.2, 11.6], 'color': "#ff8f00"},  # Amarillo-naranja medio
-                            {'range': [11.6, 12], 'color': "#ffa000"},    # Amarillo fuerte
-                            {'range': [12, 12.4], 'color': "#ffb300"},    # Amarillo medio-fuerte
-                            {'range': [12.4, 12.8], 'color': "#ffc107"},  # Amarillo estándar (centro)
-                            {'range': [12.8, 13.2], 'color': "#ffd54f"},  # Amarillo medio-claro
-                            {'range': [13.2, 13.6], 'color': "#ffe082"},  # Amarillo claro
-                            {'range': [13.6, 14], 'color': "#ffecb3"},    # Amarillo suave
-                            {'range': [14, 14.4], 'color': "#fff3cd"},    # Amarillo muy claro
-                            {'range': [14.4, 15], 'color': "#fff8e1"},    # Amarillo muy claro (cerca del verde)
-                            
-                            # Verde (15%-20%): Excelente rentabilidad
-                            {'range': [15, 17.5], 'color': "#28a745"},   # Verde éxito puro
-                            {'range': [17.5, 20], 'color': "#20c997"}     # Verde teal puro
-                        ],
-                        'threshold': {
-                            'line': {'color': "#1f2937", 'width': 6},  # Aguja principal más gruesa y elegante
-                            'thickness': 0.85,
-                            'value': porcentaje_actual
-                        },
-                        'shape': "angular"
-                    }
-                },
-                # Mini aguja marcadora en 10% 
-                {
-                    'type': 'indicator',
-                    'mode': 'gauge',
-                    'value': 10,  # Valor fijo en 10%
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {'range': [5, 20], 'visible': False},  # Mismo rango, eje invisible
-                        'bar': {'color': "transparent", 'thickness': 0},
-                        'bgcolor': "transparent",
-                        'borderwidth': 0,
-                        'threshold': {
-                            'line': {'color': "#ffc107", 'width': 4},  # Aguja amarilla más gruesa
-                            'thickness': 0.8,  # Más larga que antes
-                            'value': 10
-                        }
-                    }
-                },
-                # Mini aguja marcadora en 15%
-                {
-                    'type': 'indicator', 
-                    'mode': 'gauge',
-                    'value': 15,  # Valor fijo en 15%
-                    'domain': {'x': [0, 1], 'y': [0, 1]},
-                    'gauge': {
-                        'axis': {'range': [5, 20], 'visible': False},  # Mismo rango, eje invisible
-                        'bar': {'color': "transparent", 'thickness': 0},
-                        'bgcolor': "transparent",
-                        'borderwidth': 0,
-                        'threshold': {
-                            'line': {'color': "#ffc107", 'width': 4},  # Aguja amarilla más gruesa (mismo color)
-                            'thickness': 0.8,  # Más larga que antes
-                            'value': 15
-                        }
-                    }
-                }
-            ],
-            'layout': {
-                'height': 240,
-                'margin': {'l': 30, 'r': 30, 't': 50, 'b': 30},
-                'paper_bgcolor': 'rgba(0,0,0,0)',
-                'plot_bgcolor': 'rgba(0,0,0,0)',
-                'font': {'color': '#374151', 'family': 'Inter, -apple-system, BlinkMacSystemFont, sans-serif', 'size': 12},
-                'showlegend': False,
-                'hovermode': False
-            },
-            'config': {'displayModeBar': False, 'responsive': True},
-            'div_id': f"gauge-ingreso-{canal.lower().replace(' ', '-').replace('_', '-')}"
-        }
-        
-        return gauge_config
-        
+        return crear_gauge_config(
+            porcentaje_actual, GAUGE_INGRESO_EJE, GAUGE_INGRESO_PASOS, GAUGE_INGRESO_MARCADORES,
+            f"gauge-ingreso-{canal.lower().translate(TABLA_SLUG_GAUGE)}"
+        )
+
     except Exception as e:
         print(f"Error creando configuración de gauge de ingreso real: {e}")
         return None
 
+
+# ====== CACHÉ EN MEMORIA ======
+
+def cache_con_ttl(segundos, cachear_si=None):
+    """
+    Decorador que memoriza el resultado de una función por sus argumentos
+    (posicionales y nombrados) durante `segundos`. Pensado para funciones que
+    consultan ClickHouse y procesan el resultado: mientras la entrada esté
+    vigente las llamadas siguientes (otros requests del mismo proceso) la
+    reutilizan. Las entradas vencidas se descartan en cada consulta.
+
+    El resultado se comparte entre llamadas: quien lo reciba no debe
+    modificarlo. La función decorada expone cache_clear() para invalidarla
+    completa, o cache_clear(*args, **kwargs) para descartar solo esa entrada.
+    Un resultado cuya llamada empezó antes de un cache_clear() no se guarda,
+    para no volver a servir datos previos a una escritura. La invalidación
+    solo aplica al proceso actual: los demás workers de gunicorn siguen
+    sirviendo su entrada hasta que venza el TTL, así que los datos que edita
+    el usuario deben usar un TTL corto.
+
+    Args:
+        segundos: Tiempo de vida de cada entrada
+        cachear_si: Función opcional resultado -> bool; si devuelve False el
+                    resultado no se guarda (ej. DataFrame vacío por un error)
+
+    Returns:
+        function: Decorador
+    """
+    def clave_de(args, kwargs):
+        return (args, tuple(sorted(kwargs.items()))) if kwargs else args
+
+    def decorador(func):
+        entradas = {}
+        lock = threading.Lock()
+        # Se incrementa en cada cache_clear(); una llamada que vio otra
+        # generación al empezar no guarda su resultado
+        generacion = [0]
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            clave = clave_de(args, kwargs)
+            ahora = time.monotonic()
+            with lock:
+                vencidas = [k for k, (creada, _) in entradas.items()
+                            if ahora - creada >= segundos]
+                for k in vencidas:
+                    del entradas[k]
+                entrada = entradas.get(clave)
+                generacion_inicial = generacion[0]
+            if entrada is not None:
+                return entrada[1]
+
+            resultado = func(*args, **kwargs)
+            if cachear_si is None or cachear_si(resultado):
+                with lock:
+                    if generacion[0] == generacion_inicial:
+                        entradas[clave] = (ahora, resultado)
+            return resultado
+
+        def cache_clear(*args, **kwargs):
+            with lock:
+                generacion[0] += 1
+                if args or kwargs:
+                    entradas.pop(clave_de(args, kwargs), None)
+                else:
+                    entradas.clear()
+
+        envoltura.cache_clear = cache_clear
+        return envoltura
+
+    return decorador
@@ -4,14 +4,27 @@ Rutas del módulo de Ventas por Hora Mercado Libre
 Maneja las rutas y endpoints relacionados con el análisis de ventas por hora
 """
 
-from flask import request, render_template, jsonify
+import logging
+import numpy as np
+from flask import request, render_template
 from datetime import datetime
 
 from ventas_hora_meli.blueprint import bp
 from ventas_hora_meli.services import (
     obtener_skus_disponibles,
-    obtener_datos_completos_sku
+    obtener_datos_completos_sku,
+    obtener_datos_completos_skus
 )
+from utils import respuesta_json
+
+logger = logging.getLogger(__name__)
+
+# Columnas numéricas del gráfico: se convierten a float y NaN/inf se
+# reemplazan por 0 una vez por columna antes de serializar (el frontend
+# espera números)
+COLUMNAS_NUMERICAS_GRAFICO = ['Cantidad_Total', 'Precio_cliente', 'Venta_Neta_Total', 'Var_vs_Dia_Anterior_Porc']
+# Columnas enteras del gráfico (nulos como 0)
+COLUMNAS_ENTERAS_GRAFICO = ['Killer', 'Hora']
 
 
 @bp.route("/ventas-hora-meli", methods=["GET"])
@@ -29,17 +42,15 @@ def ventas_hora_meli():
 
         # Si hay SKUs, seleccionar el primero por defecto
         if skus_disponibles:
-            # skus_disponibles ahora es una lista de diccionarios: [{'sku': 'ABC', 'descripcion': 'Desc'}, ...]
+            # skus_disponibles es una tupla de diccionarios: ({'sku': 'ABC', 'descripcion': 'Desc'}, ...)
             sku_seleccionado = skus_disponibles[0]['sku']  # Solo pasar el SKU
         else:
             error = "No hay SKUs disponibles en la base de datos"
-            print(f"WARNING: {error}")
+            logger.warning(error)
 
     except Exception as e:
         error = f"Error cargando datos: {str(e)}"
-        print(f"ERROR en ventas_hora_meli: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error en ventas_hora_meli")
 
     # Renderizar template
     return render_template("ventas_hora_meli.html",
@@ -48,54 +59,88 @@ def ventas_hora_meli():
                          sku_seleccionado=sku_seleccionado)
 
 
+def preparar_datos_grafico(df):
+    """
+    Prepara las series del gráfico de Chart.js para los datos de un SKU
+
+    Args:
+        df: DataFrame de obtener_datos_completos_sku (no vacío)
+
+    Returns:
+        dict: labels y series del gráfico; las columnas numéricas van como
+              arreglos NumPy (respuesta_json los serializa directamente sin
+              crear una lista de objetos de Python)
+    """
+    # Convertir timestamp a string para JSON ('%Y-%m-%d %H:%M') formateando
+    # todo el arreglo de una vez: datetime_as_string produce 'YYYY-MM-DDTHH:MM'
+    # y la 'T' se cambia por espacio (los NaT se dejan como 'NaT')
+    timestamps = df['timestamp'].to_numpy(dtype='datetime64[m]')
+    labels = np.datetime_as_string(timestamps, unit='m')
+    labels = np.where(np.isnat(timestamps), labels, np.char.replace(labels, 'T', ' ')).tolist()
+    numericos = df[COLUMNAS_NUMERICAS_GRAFICO].astype(float).replace([np.inf, -np.inf], np.nan).fillna(0)
+    enteros = df[COLUMNAS_ENTERAS_GRAFICO].fillna(0).astype(np.int64)
+
+    return {
+        'labels': labels,  # Eje X: timestamps
+        'cantidades': numericos['Cantidad_Total'].to_numpy(),  # Barras: cantidad vendida
+        'precios': numericos['Precio_cliente'].to_numpy(),  # Línea: precio
+        'ventas_netas': numericos['Venta_Neta_Total'].to_numpy(),  # Para tooltip
+        'variaciones': numericos['Var_vs_Dia_Anterior_Porc'].to_numpy(),  # Para tooltip
+        'killers': enteros['Killer'].to_numpy(),  # Para tooltip
+        'dias': df['dia'].astype(str).tolist(),  # Para tooltip
+        'horas': enteros['Hora'].to_numpy()  # Para tooltip
+    }
+
+
 @bp.route("/ventas-hora-meli-datos", methods=["POST"])
 def ventas_hora_meli_datos():
-    """Endpoint para obtener datos del gráfico por SKU"""
+    """
+    Endpoint para obtener datos del gráfico por SKU. Con varios valores de
+    'sku' en el formulario devuelve los datos de cada uno en datos_por_sku
+    """
     try:
-        sku = request.form.get("sku")
+        skus = [sku for sku in request.form.getlist("sku") if sku]
 
-        if not sku:
-            return jsonify({
+        if not skus:
+            return respuesta_json({
                 'success': False,
                 'error': 'Por favor selecciona un SKU'
             })
 
+        if len(skus) > 1:
+            # Una sola consulta para todos los SKUs pedidos
+            dfs_por_sku = obtener_datos_completos_skus(skus)
+
+            return respuesta_json({
+                'success': True,
+                'datos_por_sku': {
+                    sku: {'datos': preparar_datos_grafico(df), 'total_registros': len(df)}
+                    for sku, df in dfs_por_sku.items() if not df.empty
+                },
+                'skus_sin_datos': [sku for sku, df in dfs_por_sku.items() if df.empty]
+            })
+
+        sku = skus[0]
+
         # Obtener todos los datos del SKU
         df = obtener_datos_completos_sku(sku)
 
         if df.empty:
-            return jsonify({
+            return respuesta_json({
                 'success': False,
                 'error': f'No se encontraron datos para el SKU {sku}'
             })
 
-        # Preparar datos para Chart.js
-        # Convertir timestamp a string para JSON
-        labels = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()
-
-        datos_grafico = {
-            'labels': labels,  # Eje X: timestamps
-            'cantidades': df['Cantidad_Total'].tolist(),  # Barras: cantidad vendida
-            'precios': df['Precio_cliente'].tolist(),  # Línea: precio
-            'ventas_netas': df['Venta_Neta_Total'].tolist(),  # Para tooltip
-            'variaciones': df['Var_vs_Dia_Anterior_Porc'].tolist(),  # Para tooltip
-            'killers': df['Killer'].tolist(),  # Para tooltip
-            'dias': df['dia'].astype(str).tolist(),  # Para tooltip
-            'horas': df['Hora'].tolist()  # Para tooltip
-        }
-
-        return jsonify({
+        return respuesta_json({
             'success': True,
             'sku': sku,
-            'datos': datos_grafico,
+            'datos': preparar_datos_grafico(df),
             'total_registros': len(df)
         })
 
     except Exception as e:
-        print(f"Error en ventas_hora_meli_datos: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error en ventas_hora_meli_datos")
+        return respuesta_json({
             'success': False,
             'error': f'Error procesando datos: {str(e)}'
         })
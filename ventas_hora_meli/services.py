@@ -4,129 +4,406 @@ Servicios del módulo de Ventas por Hora Mercado Libre
 Lógica de negocio para consultar y analizar datos de ventas por hora
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import pandas as pd
-from datetime import datetime, timedelta
-from database import get_db_connection
+from datetime import datetime, date, timedelta
+from clickhouse_connect.driver.exceptions import DatabaseError
+from database import get_db_connection, descartar_conexion_si_caida, resultado_a_dataframe
+from utils import cache_con_ttl
 
+logger = logging.getLogger(__name__)
 
-def obtener_ventas_por_hora(fecha_inicio=None, fecha_fin=None, sku=None, channel=None):
+# Segundos que se reutiliza la lista de SKUs del selector entre requests de la
+# página principal; la lista vacía (sin datos o error) no se guarda
+SKUS_DISPONIBLES_CACHE_TTL = 300
+
+# Segundos que ClickHouse guarda en su caché de consultas el resultado de los
+# SELECT de este módulo (los usuarios repiten los mismos filtros al navegar).
+# Los resúmenes por hora cambian lento; el detalle de un SKU se refresca antes.
+QUERY_CACHE_TTL = 180
+QUERY_CACHE_TTL_RESUMEN = 300
+QUERY_CACHE_TTL_SKU = 60
+
+
+def settings_query_cache(ttl):
+    """
+    Settings de ClickHouse para que una consulta use la caché de resultados
+
+    Args:
+        ttl: Segundos que el resultado se considera vigente
+
+    Returns:
+        dict: Settings para client.query
+    """
+    return {
+        'use_query_cache': 1,
+        'query_cache_ttl': ttl,
+        'query_cache_min_query_runs': 1,
+    }
+
+
+# Tabla pre-agregada por (dia, Hora) que alimenta obtener_resumen_por_hora.
+# La llena la vista materializada al insertar en Silver.VentaXhora_Meli, de modo
+# que el resumen lee a lo más 24 filas por día en lugar de una por SKU y hora.
+RESUMEN_HORA_TABLA = 'Silver.VentaXhora_Meli_resumen_mv_tbl'
+RESUMEN_HORA_VISTA = 'Silver.VentaXhora_Meli_resumen_mv'
+
+# DDL de la tabla agregada, la vista y la carga del histórico. Para no
+# contar dos veces ni perder filas se usa un día de corte fijo (por defecto
+# mañana, cuando aún no hay filas): la vista solo agrega dia >= corte y la
+# carga histórica solo dia < corte, y esta se hace a partir del día de corte,
+# cuando los días anteriores ya están completos. El corte y el estado de la
+# carga quedan en el comentario de la tabla; obtener_resumen_por_hora solo lee
+# la tabla agregada cuando el histórico ya está cargado.
+# Supone que VentaXhora_Meli solo recibe inserts: si la tabla se recarga
+# completa, la tabla agregada debe vaciarse y volver a cargarse.
+# SKUs_Distintos usa uniqCombined: es exacto mientras el número de SKUs es
+# pequeño (cientos por hora) y con muchos SKUs el error es de ~1%, a cambio de
+# memoria acotada en lugar de un conjunto con todos los SKUs del rango.
+RESUMEN_HORA_COMENTARIO_CORTE = 'dia_corte={corte}'
+RESUMEN_HORA_COMENTARIO_CARGADO = 'dia_corte={corte};historico=cargado'
+RESUMEN_HORA_TABLA_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {RESUMEN_HORA_TABLA} (
+        dia Date,
+        Hora UInt8,
+        Total_Cantidad AggregateFunction(sum, Float64),
+        Total_Ventas AggregateFunction(sum, Float64),
+        SKUs_Distintos AggregateFunction(uniqCombined, String)
+    )
+    ENGINE = AggregatingMergeTree
+    ORDER BY (dia, Hora)
+    COMMENT '{{comentario}}'
+    """
+RESUMEN_HORA_VISTA_DDL = f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {RESUMEN_HORA_VISTA}
+    TO {RESUMEN_HORA_TABLA}
+    AS SELECT
+        dia,
+        toUInt8(Hora) AS Hora,
+        sumState(toFloat64(Cantidad_Total)) AS Total_Cantidad,
+        sumState(toFloat64(Venta_Neta_Total)) AS Total_Ventas,
+        uniqCombinedState(toString(sku)) AS SKUs_Distintos
+    FROM Silver.VentaXhora_Meli
+    WHERE dia >= toDate('{{corte}}')
+    GROUP BY dia, Hora
+    """
+RESUMEN_HORA_CARGA_HISTORICA = f"""
+    INSERT INTO {RESUMEN_HORA_TABLA}
+    SELECT
+        dia,
+        toUInt8(Hora) AS Hora,
+        sumState(toFloat64(Cantidad_Total)),
+        sumState(toFloat64(Venta_Neta_Total)),
+        uniqCombinedState(toString(sku))
+    FROM Silver.VentaXhora_Meli
+    WHERE dia < toDate('{{corte}}')
+    GROUP BY dia, Hora
+    """
+RESUMEN_HORA_COMENTARIO_QUERY = """
+    SELECT comment
+    FROM system.tables
+    WHERE database = {base:String} AND name = {tabla:String}
+    """
+
+# Proyección de Silver.VentaXhora_Meli pre-agregada por (dia, Hora, sku): las
+# consultas de top productos (filtro por Hora, suma por sku) la usan de forma
+# automática en lugar de leer todas las filas del rango de fechas.
+# Se crea una vez con crear_proyeccion_top_por_hora; MATERIALIZE la construye
+# para las partes ya existentes (mutación en segundo plano).
+TOP_HORA_PROYECCION = 'proj_hora'
+TOP_HORA_PROYECCION_DDL = [
+    f"""
+    ALTER TABLE Silver.VentaXhora_Meli
+    ADD PROJECTION IF NOT EXISTS {TOP_HORA_PROYECCION} (
+        SELECT
+            dia,
+            Hora,
+            sku,
+            sum(Venta_Neta_Total),
+            sum(Cantidad_Total)
+        GROUP BY dia, Hora, sku
+    )
+    """,
+    f"ALTER TABLE Silver.VentaXhora_Meli MATERIALIZE PROJECTION {TOP_HORA_PROYECCION}",
+]
+
+# Diccionario de ClickHouse sku -> descripcion sobre Gold.RPT_Inventarios que
+# usa obtener_skus_disponibles en lugar de un JOIN; se recarga cada hora.
+# Se crea una vez con crear_diccionario_sku_descripcion.
+SKU_DESCRIPCION_DICT = 'Gold.dict_sku_desc'
+SKU_DESCRIPCION_DICT_DDL = f"""
+CREATE DICTIONARY IF NOT EXISTS {SKU_DESCRIPCION_DICT} (
+    sku String,
+    descripcion String
+)
+PRIMARY KEY sku
+SOURCE(CLICKHOUSE(QUERY '
+    SELECT toString(sku) AS sku, ifNull(any(descripcion), \\'\\') AS descripcion
+    FROM Gold.RPT_Inventarios
+    GROUP BY sku
+'))
+LAYOUT(COMPLEX_KEY_HASHED())
+LIFETIME(3600)
+"""
+
+# Columnas que puede devolver obtener_ventas_por_hora (en el orden por defecto)
+COLUMNAS_VENTAS_POR_HORA = [
+    'dia', 'Hora', 'sku', 'Channel', 'Cantidad_Total', 'Venta_Neta_Total',
+    'Ticket_Mediana', 'Killer', 'Precio_cliente', 'Var_vs_Dia_Anterior_Porc'
+]
+# Columnas de texto de obtener_ventas_por_hora que se entregan como category
+COLUMNAS_CATEGORICAS_VENTAS = ['sku', 'Channel']
+
+
+def dataframe_vacio(tipos):
+    """
+    Crea un DataFrame sin filas con las columnas y tipos indicados
+
+    Args:
+        tipos: dict columna -> dtype
+
+    Returns:
+        DataFrame: Vacío, con una Serie tipada por columna
+    """
+    return pd.DataFrame({columna: pd.Series(dtype=dtype) for columna, dtype in tipos.items()})
+
+
+# Resultados vacíos (sin datos o error) de cada consulta: conservan las
+# columnas de la consulta para que el código que los recibe no tenga que
+# distinguir un DataFrame sin columnas. Se devuelven copias (o selecciones de
+# columnas, que también son copias) para que nadie modifique el compartido.
+VACIO_VENTAS_POR_HORA = dataframe_vacio({
+    'dia': 'object', 'Hora': 'uint8', 'sku': 'category', 'Channel': 'category',
+    'Cantidad_Total': 'float64', 'Venta_Neta_Total': 'float64',
+    'Ticket_Mediana': 'float64', 'Killer': 'int64', 'Precio_cliente': 'float64',
+    'Var_vs_Dia_Anterior_Porc': 'float64'
+})
+VACIO_RESUMEN_POR_HORA = dataframe_vacio({
+    'Hora': 'uint8', 'Total_Cantidad': 'float64', 'Total_Ventas': 'float64',
+    'SKUs_Distintos': 'uint64'
+})
+VACIO_TOP_PRODUCTOS = dataframe_vacio({
+    'sku': 'object', 'Total_Ventas': 'float64', 'Total_Cantidad': 'float64'
+})
+VACIO_TOP_PRODUCTOS_POR_HORAS = dataframe_vacio({
+    'Hora': 'uint8', 'sku': 'object', 'Total_Ventas': 'float64', 'Total_Cantidad': 'float64'
+})
+VACIO_DATOS_SKU = dataframe_vacio({
+    'dia': 'object', 'Hora': 'uint8', 'Cantidad_Total': 'float64',
+    'Venta_Neta_Total': 'float64', 'Precio_cliente': 'float64',
+    'Var_vs_Dia_Anterior_Porc': 'float64', 'Killer': 'int64',
+    'Ticket_Mediana': 'float64', 'timestamp': 'datetime64[ns]'
+})
+
+
+def rango_fechas_consulta(fecha_inicio=None, fecha_fin=None):
+    """
+    Normaliza el rango de fechas de las consultas a objetos date, que se
+    envían como parámetros Date nativos, en forma semiabierta
+    [fecha_inicio, fecha_fin + 1 día) para que ClickHouse descarte partes y gránulos por dia.
+
+    Args:
+        fecha_inicio: date, datetime o 'YYYY-MM-DD'; None para 7 días antes de fecha_fin
+        fecha_fin: date, datetime o 'YYYY-MM-DD' (incluida); None para hoy
+
+    Returns:
+        tuple: (fecha_inicio, día siguiente a fecha_fin) como date
+    """
+    def a_date(valor):
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        return date.fromisoformat(str(valor)[:10])
+
+    # Si no se especifican fechas, usar últimos 7 días
+    fecha_fin = datetime.now().date() if fecha_fin is None else a_date(fecha_fin)
+    fecha_inicio = fecha_fin - timedelta(days=7) if fecha_inicio is None else a_date(fecha_inicio)
+
+    return fecha_inicio, fecha_fin + timedelta(days=1)
+
+
+def obtener_ventas_por_hora(fecha_inicio=None, fecha_fin=None, sku=None, channel=None, columnas=None,
+                            limit=None, offset=0, limit_por_hora=None):
     """
     Obtiene datos de ventas por hora desde Silver.VentaXhora_Meli
 
     Args:
         fecha_inicio: Fecha de inicio del período (datetime), None para últimos 7 días
         fecha_fin: Fecha fin del período (datetime), None para hoy
-        sku: SKU específico o None para todos
-        channel: Canal específico o None para todos (aunque la tabla solo tiene Meli)
+        sku: SKU específico, lista de SKUs o None para todos
+        channel: Canal específico, lista de canales o None para todos (aunque la tabla solo tiene Meli)
+        columnas: Subconjunto de COLUMNAS_VENTAS_POR_HORA a leer (None para todas);
+                  ClickHouse solo lee del disco las columnas pedidas
+        limit: Máximo de filas a devolver (None para todas), para paginar
+        offset: Filas a saltar antes de las devueltas (solo con limit)
+        limit_por_hora: Máximo de filas por (dia, Hora), las de mayor venta
+                        (None para todas)
 
     Returns:
         DataFrame: Datos de ventas por hora con columnas:
                    dia, Hora, sku, Channel, Cantidad_Total, Venta_Neta_Total,
                    Ticket_Mediana, Killer, Precio_cliente, Var_vs_Dia_Anterior_Porc
+                   (o solo las pedidas en columnas, en ese orden); sku y
+                   Channel son de tipo category
+
+    Raises:
+        ValueError: Si columnas incluye una columna que no está en COLUMNAS_VENTAS_POR_HORA
     """
+    if columnas is None:
+        columnas = COLUMNAS_VENTAS_POR_HORA
+    else:
+        # Lista blanca: los nombres se insertan en el texto de la query
+        columnas = list(columnas)
+        desconocidas = [c for c in columnas if c not in COLUMNAS_VENTAS_POR_HORA]
+        if desconocidas or not columnas:
+            raise ValueError(f"Columnas no válidas para ventas por hora: {desconocidas or columnas}")
+
     client = get_db_connection()
 
     if not client:
-        print("ERROR: No se pudo conectar a ClickHouse")
-        return pd.DataFrame()
+        logger.error("No se pudo conectar a ClickHouse")
+        return VACIO_VENTAS_POR_HORA[columnas]
 
     try:
-        # Si no se especifican fechas, usar últimos 7 días
-        if fecha_fin is None:
-            fecha_fin = datetime.now().date()
-
-        if fecha_inicio is None:
-            fecha_inicio = fecha_fin - timedelta(days=7)
-
-        # Convertir a string para la query
-        fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d') if isinstance(fecha_inicio, (datetime, date)) else str(fecha_inicio)
-        fecha_fin_str = fecha_fin.strftime('%Y-%m-%d') if isinstance(fecha_fin, (datetime, date)) else str(fecha_fin)
+        fecha_inicio, fecha_fin_siguiente = rango_fechas_consulta(fecha_inicio, fecha_fin)
 
         # Construir query con filtros opcionales
+        # Los valores viajan como parámetros de ClickHouse: el texto de la
+        # query solo depende de qué filtros se usan
         where_conditions = [
-            f"dia >= '{fecha_inicio_str}'",
-            f"dia <= '{fecha_fin_str}'"
+            "dia >= {fecha_inicio:Date}",
+            "dia < {fecha_fin_siguiente:Date}"
         ]
+        parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin_siguiente': fecha_fin_siguiente}
 
+        # Con listas el filtro es un IN sobre un parámetro Array: una sola
+        # lectura para todos los valores
         if sku:
-            where_conditions.append(f"sku = '{sku}'")
+            if isinstance(sku, str):
+                where_conditions.append("sku = {sku:String}")
+            else:
+                where_conditions.append("sku IN {sku:Array(String)}")
+                sku = list(sku)
+            parametros['sku'] = sku
 
         if channel:
-            where_conditions.append(f"Channel = '{channel}'")
+            if isinstance(channel, str):
+                where_conditions.append("Channel = {channel:String}")
+            else:
+                where_conditions.append("Channel IN {channel:Array(String)}")
+                channel = list(channel)
+            parametros['channel'] = channel
 
         where_clause = " AND ".join(where_conditions)
 
+        # Recortes hechos en el servidor: solo viajan las filas que se muestran
+        limites = ""
+        if limit_por_hora:
+            limites += "\n        LIMIT {limit_por_hora:UInt32} BY dia, Hora"
+            parametros['limit_por_hora'] = int(limit_por_hora)
+        if limit:
+            limites += "\n        LIMIT {limit:UInt32} OFFSET {offset:UInt32}"
+            parametros['limit'] = int(limit)
+            parametros['offset'] = int(offset)
+
         query = f"""
         SELECT
-            dia,
-            Hora,
-            sku,
-            Channel,
-            Cantidad_Total,
-            Venta_Neta_Total,
-            Ticket_Mediana,
-            Killer,
-            Precio_cliente,
-            Var_vs_Dia_Anterior_Porc
+            {', '.join(columnas)}
         FROM Silver.VentaXhora_Meli
         WHERE {where_clause}
-        ORDER BY dia DESC, Hora DESC, Venta_Neta_Total DESC
+        ORDER BY dia DESC, Hora DESC, Venta_Neta_Total DESC{limites}
         """
 
-        print(f"INFO: Consultando ventas por hora desde {fecha_inicio_str} hasta {fecha_fin_str}")
+        logger.info("Consultando ventas por hora desde %s hasta %s", fecha_inicio, fecha_fin_siguiente - timedelta(days=1))
 
-        result = client.query(query)
+        result = client.query(query, parameters=parametros,
+                              settings=settings_query_cache(QUERY_CACHE_TTL))
 
         # Convertir a DataFrame
-        if result.result_rows:
-            df = pd.DataFrame(
-                result.result_rows,
-                columns=['dia', 'Hora', 'sku', 'Channel', 'Cantidad_Total',
-                        'Venta_Neta_Total', 'Ticket_Mediana', 'Killer',
-                        'Precio_cliente', 'Var_vs_Dia_Anterior_Porc']
-            )
-
-            print(f"OK: {len(df)} registros cargados desde Silver.VentaXhora_Meli")
+        if result.row_count:
+            df = resultado_a_dataframe(result)
+
+            # sku y Channel se repiten en muchas filas: como categorías cada
+            # valor se guarda una vez y las filas solo llevan un código entero
+            categoricas = [c for c in COLUMNAS_CATEGORICAS_VENTAS if c in df.columns]
+            if categoricas:
+                df[categoricas] = df[categoricas].astype('category')
+
+            logger.info("%s registros cargados desde Silver.VentaXhora_Meli", len(df))
             return df
         else:
-            print("WARNING: No se encontraron datos para el período especificado")
-            return pd.DataFrame()
+            logger.warning("No se encontraron datos para el período especificado")
+            return VACIO_VENTAS_POR_HORA[columnas]
 
     except Exception as e:
-        print(f"ERROR al consultar ventas por hora: {e}")
-        import traceback
-        traceback.print_exc()
-        return pd.DataFrame()
+        logger.exception("Error al consultar ventas por hora")
+        descartar_conexion_si_caida(e)
+        return VACIO_VENTAS_POR_HORA[columnas]
 
 
+@cache_con_ttl(SKUS_DISPONIBLES_CACHE_TTL, cachear_si=bool)
 def obtener_skus_disponibles():
     """
     Obtiene la lista de SKUs únicos disponibles en la tabla VentaXhora_Meli
     con sus descripciones desde Gold.RPT_Inventarios
 
     Returns:
-        list: Lista de diccionarios con formato: [{'sku': 'ABC123', 'descripcion': 'Descripción del producto'}, ...]
+        tuple: Tupla de diccionarios con formato: ({'sku': 'ABC123', 'descripcion': 'Descripción del producto'}, ...)
+               (compartida entre requests: no debe modificarse; se guarda
+               SKUS_DISPONIBLES_CACHE_TTL segundos y
+               obtener_skus_disponibles.cache_clear() fuerza recargarla)
     """
     client = get_db_connection()
 
     if not client:
-        return []
+        return ()
 
     try:
-        # Query con JOIN para obtener descripción desde Gold.RPT_Inventarios
-        query = """
-        SELECT DISTINCT
-            v.sku,
-            any(i.descripcion) as descripcion
-        FROM Silver.VentaXhora_Meli v
-        LEFT JOIN Gold.RPT_Inventarios i ON toString(v.sku) = toString(i.sku)
-        GROUP BY v.sku
-        ORDER BY v.sku
+        # La descripción se busca en el diccionario sku -> descripcion (tabla
+        # hash en memoria del servidor) una vez por SKU distinto
+        query = f"""
+        SELECT
+            sku,
+            dictGetOrDefault('{SKU_DESCRIPCION_DICT}', 'descripcion', tuple(toString(sku)), '') as descripcion
+        FROM (
+            SELECT sku
+            FROM Silver.VentaXhora_Meli
+            GROUP BY sku
+        )
+        ORDER BY sku
         """
 
-        result = client.query(query)
-
-        if result.result_rows:
+        try:
+            result = client.query(query, settings=settings_query_cache(QUERY_CACHE_TTL))
+        except DatabaseError as e:
+            logger.warning("%s no disponible, se usa JOIN con RPT_Inventarios: %s", SKU_DESCRIPCION_DICT, e)
+            # Query con JOIN para obtener descripción desde Gold.RPT_Inventarios.
+            # Cada lado se reduce a una fila por SKU antes del JOIN (el cast a
+            # String se hace una vez por SKU de inventario, no por fila de ventas),
+            # así el JOIN es entre dos listas de SKUs y no sobre la tabla completa
+            query = """
+            SELECT
+                v.sku,
+                i.descripcion
+            FROM (
+                SELECT sku
+                FROM Silver.VentaXhora_Meli
+                GROUP BY sku
+            ) v
+            LEFT JOIN (
+                SELECT
+                    toString(sku) as sku_inventario,
+                    any(descripcion) as descripcion
+                FROM Gold.RPT_Inventarios
+                GROUP BY sku_inventario
+            ) i ON toString(v.sku) = i.sku_inventario
+            ORDER BY v.sku
+            """
+            result = client.query(query, settings=settings_query_cache(QUERY_CACHE_TTL))
+
+        if result.row_count:
             # Retornar lista de diccionarios con sku y descripción
             skus_con_descripcion = []
             for row in result.result_rows:
@@ -137,16 +414,15 @@ def obtener_skus_disponibles():
                     'descripcion': descripcion
                 })
 
-            print(f"INFO: {len(skus_con_descripcion)} SKUs únicos encontrados con descripción")
-            return skus_con_descripcion
+            logger.info("%s SKUs únicos encontrados con descripción", len(skus_con_descripcion))
+            return tuple(skus_con_descripcion)
         else:
-            return []
+            return ()
 
     except Exception as e:
-        print(f"ERROR al obtener SKUs: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        logger.exception("Error al obtener SKUs")
+        descartar_conexion_si_caida(e)
+        return ()
 
 
 def obtener_resumen_por_hora(fecha_inicio=None, fecha_fin=None):
@@ -163,47 +439,221 @@ def obtener_resumen_por_hora(fecha_inicio=None, fecha_fin=None):
     client = get_db_connection()
 
     if not client:
-        return pd.DataFrame()
+        return VACIO_RESUMEN_POR_HORA.copy()
 
     try:
-        # Si no se especifican fechas, usar últimos 7 días
-        if fecha_fin is None:
-            fecha_fin = datetime.now().date()
-
-        if fecha_inicio is None:
-            fecha_inicio = fecha_fin - timedelta(days=7)
-
-        fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d') if isinstance(fecha_inicio, (datetime, date)) else str(fecha_inicio)
-        fecha_fin_str = fecha_fin.strftime('%Y-%m-%d') if isinstance(fecha_fin, (datetime, date)) else str(fecha_fin)
+        fecha_inicio, fecha_fin_siguiente = rango_fechas_consulta(fecha_inicio, fecha_fin)
 
         query = f"""
         SELECT
             Hora,
-            SUM(Cantidad_Total) as Total_Cantidad,
-            SUM(Venta_Neta_Total) as Total_Ventas,
-            COUNT(DISTINCT sku) as SKUs_Distintos
-        FROM Silver.VentaXhora_Meli
-        WHERE dia >= '{fecha_inicio_str}'
-          AND dia <= '{fecha_fin_str}'
+            sumMerge(Total_Cantidad) as Total_Cantidad,
+            sumMerge(Total_Ventas) as Total_Ventas,
+            uniqCombinedMerge(SKUs_Distintos) as SKUs_Distintos
+        FROM {RESUMEN_HORA_TABLA}
+        WHERE dia >= {{fecha_inicio:Date}}
+          AND dia < {{fecha_fin_siguiente:Date}}
         GROUP BY Hora
         ORDER BY Hora
         """
 
-        result = client.query(query)
-
-        if result.result_rows:
-            df = pd.DataFrame(
-                result.result_rows,
-                columns=['Hora', 'Total_Cantidad', 'Total_Ventas', 'SKUs_Distintos']
-            )
-            print(f"OK: Resumen por hora calculado para {len(df)} horas")
+        parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin_siguiente': fecha_fin_siguiente}
+
+        result = None
+        if resumen_por_hora_disponible():
+            try:
+                result = client.query(query, parameters=parametros,
+                                      settings=settings_query_cache(QUERY_CACHE_TTL_RESUMEN))
+            except DatabaseError as e:
+                logger.warning("%s no disponible, se usa VentaXhora_Meli: %s", RESUMEN_HORA_TABLA, e)
+
+        if result is None:
+            # La tabla agregada no existe o aún no tiene el histórico:
+            # agregar directamente sobre la tabla base
+            query = """
+            SELECT
+                Hora,
+                SUM(Cantidad_Total) as Total_Cantidad,
+                SUM(Venta_Neta_Total) as Total_Ventas,
+                uniqCombined(sku) as SKUs_Distintos
+            FROM Silver.VentaXhora_Meli
+            WHERE dia >= {fecha_inicio:Date}
+              AND dia < {fecha_fin_siguiente:Date}
+            GROUP BY Hora
+            ORDER BY Hora
+            """
+            result = client.query(query, parameters=parametros,
+                                  settings=settings_query_cache(QUERY_CACHE_TTL_RESUMEN))
+
+        if result.row_count:
+            df = resultado_a_dataframe(result)
+            logger.info("Resumen por hora calculado para %s horas", len(df))
             return df
         else:
-            return pd.DataFrame()
+            return VACIO_RESUMEN_POR_HORA.copy()
 
     except Exception as e:
-        print(f"ERROR al obtener resumen por hora: {e}")
-        return pd.DataFrame()
+        logger.exception("Error al obtener resumen por hora")
+        descartar_conexion_si_caida(e)
+        return VACIO_RESUMEN_POR_HORA.copy()
+
+
+def comentario_resumen_por_hora(client):
+    """
+    Lee el comentario de la tabla agregada del resumen por hora
+
+    Args:
+        client: Cliente de ClickHouse
+
+    Returns:
+        str: Comentario de la tabla, o None si la tabla no existe
+    """
+    base, tabla = RESUMEN_HORA_TABLA.split('.')
+    result = client.query(RESUMEN_HORA_COMENTARIO_QUERY, parameters={'base': base, 'tabla': tabla})
+    return result.result_rows[0][0] if result.row_count else None
+
+
+@cache_con_ttl(QUERY_CACHE_TTL_RESUMEN, cachear_si=bool)
+def resumen_por_hora_disponible():
+    """
+    Indica si la tabla agregada del resumen por hora existe y ya tiene el
+    histórico cargado. Solo se guarda el True: mientras falte la carga
+    histórica se vuelve a revisar en cada llamada.
+
+    Returns:
+        bool: True si obtener_resumen_por_hora puede leer la tabla agregada
+    """
+    client = get_db_connection()
+
+    if not client:
+        return False
+
+    try:
+        comentario = comentario_resumen_por_hora(client)
+        return bool(comentario) and comentario.endswith(';historico=cargado')
+    except Exception as e:
+        logger.warning("No se pudo revisar %s: %s", RESUMEN_HORA_TABLA, e)
+        descartar_conexion_si_caida(e)
+        return False
+
+
+def crear_resumen_por_hora_mv(corte=None):
+    """
+    Crea en ClickHouse la tabla agregada y la vista materializada que usa
+    obtener_resumen_por_hora, y carga el histórico anterior al día de corte.
+
+    La vista agrega desde el día de corte; el histórico (dia < corte) se
+    carga cuando ya llegó el día de corte, así que si se crea con el corte
+    por defecto (mañana) hay que volver a ejecutarla a partir de mañana.
+    Se puede ejecutar las veces que sea necesario: el corte queda fijo en el
+    comentario de la tabla y el histórico se carga solo si aún no tiene filas
+    anteriores al corte (p. ej. si una ejecución previa falló a medias).
+
+    Args:
+        corte: Día (date) desde el que agrega la vista; None para mañana.
+               Solo se usa al crear la tabla
+
+    Returns:
+        bool: True si todo quedó creado (con o sin histórico pendiente),
+              False si hubo error
+    """
+    client = get_db_connection()
+
+    if not client:
+        return False
+
+    try:
+        if corte is None:
+            corte = datetime.now().date() + timedelta(days=1)
+
+        client.command(RESUMEN_HORA_TABLA_DDL.format(
+            comentario=RESUMEN_HORA_COMENTARIO_CORTE.format(corte=corte.isoformat())
+        ))
+
+        # El corte vigente es el de la tabla (pudo crearse en una ejecución anterior)
+        comentario = comentario_resumen_por_hora(client)
+        corte = date.fromisoformat(comentario.split(';')[0].split('=')[1])
+        client.command(RESUMEN_HORA_VISTA_DDL.format(corte=corte.isoformat()))
+
+        if comentario.endswith(';historico=cargado'):
+            logger.info("Vista materializada %s lista", RESUMEN_HORA_VISTA)
+            return True
+
+        if datetime.now().date() < corte:
+            logger.info("Vista materializada %s creada; el histórico anterior a %s se carga "
+                        "al volver a ejecutar desde ese día", RESUMEN_HORA_VISTA, corte)
+            return True
+
+        # Solo la carga histórica escribe filas con dia < corte: si ya hay,
+        # una ejecución anterior la hizo y solo faltó marcarla
+        filas_historicas = client.command(
+            f"SELECT count() FROM {RESUMEN_HORA_TABLA} WHERE dia < toDate('{corte.isoformat()}')"
+        )
+        if not filas_historicas:
+            client.command(RESUMEN_HORA_CARGA_HISTORICA.format(corte=corte.isoformat()))
+
+        client.command(
+            f"ALTER TABLE {RESUMEN_HORA_TABLA} MODIFY COMMENT "
+            f"'{RESUMEN_HORA_COMENTARIO_CARGADO.format(corte=corte.isoformat())}'"
+        )
+        resumen_por_hora_disponible.cache_clear()
+        logger.info("Vista materializada %s lista con histórico hasta %s", RESUMEN_HORA_VISTA, corte)
+        return True
+
+    except Exception as e:
+        logger.exception("Error al crear la vista materializada del resumen por hora")
+        descartar_conexion_si_caida(e)
+        return False
+
+
+def crear_diccionario_sku_descripcion():
+    """
+    Crea en ClickHouse el diccionario sku -> descripcion que usa
+    obtener_skus_disponibles. Se ejecuta una sola vez.
+
+    Returns:
+        bool: True si se creó (o ya existía), False si hubo error
+    """
+    client = get_db_connection()
+
+    if not client:
+        return False
+
+    try:
+        client.command(SKU_DESCRIPCION_DICT_DDL)
+        logger.info("Diccionario %s listo", SKU_DESCRIPCION_DICT)
+        return True
+
+    except Exception as e:
+        logger.exception("Error al crear el diccionario de descripciones")
+        descartar_conexion_si_caida(e)
+        return False
+
+
+def crear_proyeccion_top_por_hora():
+    """
+    Agrega y materializa en Silver.VentaXhora_Meli la proyección que usan
+    obtener_top_productos_por_hora y obtener_top_productos_por_horas.
+    Se ejecuta una sola vez.
+
+    Returns:
+        bool: True si se ejecutó todo el DDL, False si hubo error
+    """
+    client = get_db_connection()
+
+    if not client:
+        return False
+
+    try:
+        for sentencia in TOP_HORA_PROYECCION_DDL:
+            client.command(sentencia)
+        logger.info("Proyección %s agregada (se materializa en segundo plano)", TOP_HORA_PROYECCION)
+        return True
+
+    except Exception as e:
+        logger.exception("Error al crear la proyección de top productos por hora")
+        descartar_conexion_si_caida(e)
+        return False
 
 
 def obtener_top_productos_por_hora(hora, fecha_inicio=None, fecha_fin=None, limit=10):
@@ -222,47 +672,106 @@ def obtener_top_productos_por_hora(hora, fecha_inicio=None, fecha_fin=None, limi
     client = get_db_connection()
 
     if not client:
-        return pd.DataFrame()
+        return VACIO_TOP_PRODUCTOS.copy()
 
     try:
-        # Si no se especifican fechas, usar últimos 7 días
-        if fecha_fin is None:
-            fecha_fin = datetime.now().date()
-
-        if fecha_inicio is None:
-            fecha_inicio = fecha_fin - timedelta(days=7)
+        fecha_inicio, fecha_fin_siguiente = rango_fechas_consulta(fecha_inicio, fecha_fin)
 
-        fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d') if isinstance(fecha_inicio, (datetime, date)) else str(fecha_inicio)
-        fecha_fin_str = fecha_fin.strftime('%Y-%m-%d') if isinstance(fecha_fin, (datetime, date)) else str(fecha_fin)
-
-        query = f"""
+        query = """
         SELECT
             sku,
             SUM(Venta_Neta_Total) as Total_Ventas,
             SUM(Cantidad_Total) as Total_Cantidad
         FROM Silver.VentaXhora_Meli
-        WHERE dia >= '{fecha_inicio_str}'
-          AND dia <= '{fecha_fin_str}'
-          AND Hora = {hora}
+        WHERE dia >= {fecha_inicio:Date}
+          AND dia < {fecha_fin_siguiente:Date}
+          AND Hora = {hora:UInt8}
         GROUP BY sku
         ORDER BY Total_Ventas DESC
-        LIMIT {limit}
+        LIMIT {lim:UInt32}
         """
+        parametros = {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin_siguiente': fecha_fin_siguiente,
+            'hora': int(hora),
+            'lim': int(limit),
+        }
+
+        result = client.query(query, parameters=parametros,
+                              settings=settings_query_cache(QUERY_CACHE_TTL_RESUMEN))
+
+        if result.row_count:
+            df = resultado_a_dataframe(result)
+            return df
+        else:
+            return VACIO_TOP_PRODUCTOS.copy()
 
-        result = client.query(query)
+    except Exception as e:
+        logger.exception("Error al obtener top productos por hora")
+        descartar_conexion_si_caida(e)
+        return VACIO_TOP_PRODUCTOS.copy()
 
-        if result.result_rows:
-            df = pd.DataFrame(
-                result.result_rows,
-                columns=['sku', 'Total_Ventas', 'Total_Cantidad']
-            )
-            return df
+
+def obtener_top_productos_por_horas(horas, fecha_inicio=None, fecha_fin=None, limit=10):
+    """
+    Obtiene los productos más vendidos de varias horas con una sola consulta
+    (una lectura de la tabla y un viaje a ClickHouse en lugar de uno por hora)
+
+    Args:
+        horas: Lista de horas del día (0-23)
+        fecha_inicio: Fecha de inicio del período
+        fecha_fin: Fecha fin del período
+        limit: Número máximo de productos a retornar por hora
+
+    Returns:
+        DataFrame: Top productos de cada hora con columnas: Hora, sku,
+                   Total_Ventas, Total_Cantidad (ordenado por Hora y ventas)
+    """
+    if not horas:
+        return VACIO_TOP_PRODUCTOS_POR_HORAS.copy()
+
+    client = get_db_connection()
+
+    if not client:
+        return VACIO_TOP_PRODUCTOS_POR_HORAS.copy()
+
+    try:
+        fecha_inicio, fecha_fin_siguiente = rango_fechas_consulta(fecha_inicio, fecha_fin)
+
+        # LIMIT ... BY Hora conserva los primeros `limit` SKUs de cada hora
+        query = """
+        SELECT
+            Hora,
+            sku,
+            SUM(Venta_Neta_Total) as Total_Ventas,
+            SUM(Cantidad_Total) as Total_Cantidad
+        FROM Silver.VentaXhora_Meli
+        WHERE dia >= {fecha_inicio:Date}
+          AND dia < {fecha_fin_siguiente:Date}
+          AND Hora IN {horas:Array(UInt8)}
+        GROUP BY Hora, sku
+        ORDER BY Hora, Total_Ventas DESC
+        LIMIT {lim:UInt32} BY Hora
+        """
+        parametros = {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin_siguiente': fecha_fin_siguiente,
+            'horas': sorted({int(hora) for hora in horas}),
+            'lim': int(limit),
+        }
+
+        result = client.query(query, parameters=parametros,
+                              settings=settings_query_cache(QUERY_CACHE_TTL_RESUMEN))
+
+        if result.row_count:
+            return resultado_a_dataframe(result)
         else:
-            return pd.DataFrame()
+            return VACIO_TOP_PRODUCTOS_POR_HORAS.copy()
 
     except Exception as e:
-        print(f"ERROR al obtener top productos por hora: {e}")
-        return pd.DataFrame()
+        logger.exception("Error al obtener top productos por horas")
+        descartar_conexion_si_caida(e)
+        return VACIO_TOP_PRODUCTOS_POR_HORAS.copy()
 
 
 def obtener_datos_completos_sku(sku):
@@ -280,11 +789,11 @@ def obtener_datos_completos_sku(sku):
     client = get_db_connection()
 
     if not client:
-        print("ERROR: No se pudo conectar a ClickHouse")
-        return pd.DataFrame()
+        logger.error("No se pudo conectar a ClickHouse")
+        return VACIO_DATOS_SKU.copy()
 
     try:
-        query = f"""
+        query = """
         SELECT
             dia,
             Hora,
@@ -295,32 +804,121 @@ def obtener_datos_completos_sku(sku):
             Killer,
             Ticket_Mediana
         FROM Silver.VentaXhora_Meli
-        WHERE sku = '{sku}'
+        WHERE sku = {sku:String}
         ORDER BY dia ASC, Hora ASC
         """
 
-        print(f"INFO: Consultando datos completos para SKU {sku}")
+        logger.info("Consultando datos completos para SKU %s", sku)
 
-        result = client.query(query)
+        result = client.query(query, parameters={'sku': sku},
+                              settings=settings_query_cache(QUERY_CACHE_TTL_SKU))
 
-        if result.result_rows:
-            df = pd.DataFrame(
-                result.result_rows,
-                columns=['dia', 'Hora', 'Cantidad_Total', 'Venta_Neta_Total',
-                        'Precio_cliente', 'Var_vs_Dia_Anterior_Porc', 'Killer', 'Ticket_Mediana']
-            )
+        if result.row_count:
+            df = resultado_a_dataframe(result)
 
-            # Crear columna de timestamp combinado para el eje X
-            df['timestamp'] = pd.to_datetime(df['dia'].astype(str)) + pd.to_timedelta(df['Hora'], unit='h')
+            # Crear columna de timestamp combinado para el eje X con aritmética
+            # de NumPy (día + horas), sin convertir dia a texto y volver a parsearlo
+            timestamps = df['dia'].to_numpy(dtype='datetime64[D]') + df['Hora'].to_numpy(dtype='timedelta64[h]')
+            df['timestamp'] = timestamps.astype('datetime64[ns]')
 
-            print(f"OK: {len(df)} registros cargados para SKU {sku}")
+            logger.info("%s registros cargados para SKU %s", len(df), sku)
             return df
         else:
-            print(f"WARNING: No se encontraron datos para SKU {sku}")
-            return pd.DataFrame()
+            logger.warning("No se encontraron datos para SKU %s", sku)
+            return VACIO_DATOS_SKU.copy()
+
+    except Exception as e:
+        logger.exception("Error al consultar datos completos para SKU %s", sku)
+        descartar_conexion_si_caida(e)
+        return VACIO_DATOS_SKU.copy()
+
+
+def obtener_datos_completos_skus(skus):
+    """
+    Obtiene los datos históricos de varios SKUs con una sola consulta
+    (sku IN Array) en lugar de una consulta por SKU
+
+    Args:
+        skus: Lista de SKUs a analizar
+
+    Returns:
+        dict: {sku: DataFrame} con el mismo formato que obtener_datos_completos_sku
+              para cada SKU pedido (DataFrame vacío si no tiene datos)
+    """
+    datos = {sku: VACIO_DATOS_SKU.copy() for sku in skus}
+
+    if not datos:
+        return datos
+
+    client = get_db_connection()
+
+    if not client:
+        logger.error("No se pudo conectar a ClickHouse")
+        return datos
+
+    try:
+        query = """
+        SELECT
+            sku,
+            dia,
+            Hora,
+            Cantidad_Total,
+            Venta_Neta_Total,
+            Precio_cliente,
+            Var_vs_Dia_Anterior_Porc,
+            Killer,
+            Ticket_Mediana
+        FROM Silver.VentaXhora_Meli
+        WHERE sku IN {skus:Array(String)}
+        ORDER BY sku ASC, dia ASC, Hora ASC
+        """
+
+        logger.info("Consultando datos completos para %s SKUs", len(datos))
+
+        result = client.query(query, parameters={'skus': list(datos)},
+                              settings=settings_query_cache(QUERY_CACHE_TTL_SKU))
+
+        if result.row_count:
+            df = resultado_a_dataframe(result)
+
+            timestamps = df['dia'].to_numpy(dtype='datetime64[D]') + df['Hora'].to_numpy(dtype='timedelta64[h]')
+            df['timestamp'] = timestamps.astype('datetime64[ns]')
+
+            for sku, df_sku in df.groupby('sku', sort=False):
+                datos[sku] = df_sku.drop(columns='sku').reset_index(drop=True)
+
+            logger.info("%s registros cargados para %s SKUs", len(df), len(datos))
+
+        return datos
 
     except Exception as e:
-        print(f"ERROR al consultar datos completos para SKU {sku}: {e}")
-        import traceback
-        traceback.print_exc()
-        return pd.DataFrame()
+        logger.exception("Error al consultar datos completos para SKUs %s", list(datos))
+        descartar_conexion_si_caida(e)
+        return {sku: VACIO_DATOS_SKU.copy() for sku in datos}
+
+
+def cargar_dashboard(fecha_inicio=None, fecha_fin=None):
+    """
+    Ejecuta en paralelo las consultas independientes del tablero (resumen por
+    hora, SKUs disponibles y ventas por hora). Los hilos comparten el cliente
+    de ClickHouse y su pool de conexiones, así el tiempo total es el de la
+    consulta más lenta y no la suma de las tres.
+
+    Args:
+        fecha_inicio: Fecha de inicio del período, None para últimos 7 días
+        fecha_fin: Fecha fin del período, None para hoy
+
+    Returns:
+        dict: {'resumen': DataFrame, 'skus': tuple, 'ventas': DataFrame}
+              (cada valor con el mismo formato que su función de origen)
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        resumen = executor.submit(obtener_resumen_por_hora, fecha_inicio, fecha_fin)
+        skus = executor.submit(obtener_skus_disponibles)
+        ventas = executor.submit(obtener_ventas_por_hora, fecha_inicio, fecha_fin)
+
+        return {
+            'resumen': resumen.result(),
+            'skus': skus.result(),
+            'ventas': ventas.result(),
+        }